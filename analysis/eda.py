@@ -0,0 +1,430 @@
+"""
+Headless exploratory data analysis of the policy corpus.
+
+Writes the same CSV and PNG files to output/ as notebooks/eda.ipynb, but
+streams the corpus in chunks instead of loading it into one DataFrame:
+term and bigram counts are accumulated per chunk, the document-term matrix
+stays sparse, clustering uses MiniBatchKMeans with TruncatedSVD for the 2-D
+view, and readability scores are computed in a process pool. Memory use is
+bounded by the chunk size, the term-count limit and a few numbers per
+document.
+
+Run from the repository root:
+    python -m analysis.eda
+"""
+import os
+import csv
+import heapq
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # No display needed
+import matplotlib.pyplot as plt
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import StandardScaler
+from policy_scraper.policy_scraper.corpus import iter_documents
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+COLUMNS = ["title", "url", "cleaned_content"]
+
+
+def default_corpus_path():
+    """
+    Returns the Arrow export of the corpus if there is one, otherwise the JSON corpus.
+    """
+    candidates = [
+        os.path.join(BASE_DIR, "data", "processed", "consolidated_arrow"),
+        os.path.join(BASE_DIR, "data", "processed", "consolidated"),
+    ]
+    for path in candidates:
+        if os.path.isdir(path):
+            return path
+    return os.path.join(BASE_DIR, "data", "processed", "consolidated_data.json")
+
+
+def iter_corpus(path, batch_size=1000):
+    """
+    Yields documents with title, url and cleaned_content, one at a time.
+
+    Args:
+        path (str): Arrow dataset directory, JSON corpus, JSONL file or shard directory.
+        batch_size (int): Rows read at a time from an Arrow dataset.
+    """
+    if os.path.exists(os.path.join(path, "dataset_info.json")):
+        from datasets import load_from_disk
+        dataset = load_from_disk(path).select_columns(COLUMNS)
+        for rows in dataset.iter(batch_size=batch_size):
+            for values in zip(*(rows[column] for column in COLUMNS)):
+                doc = dict(zip(COLUMNS, values))
+                doc["cleaned_content"] = doc["cleaned_content"] or ""
+                yield doc
+    else:
+        for doc in iter_documents(path, fields=COLUMNS):
+            yield {
+                "title": doc.get("title"),
+                "url": doc.get("url"),
+                "cleaned_content": doc.get("cleaned_content") or "",
+            }
+
+
+def iter_chunks(path, chunk_size):
+    """Yields lists of up to chunk_size documents."""
+    chunk = []
+    for doc in iter_corpus(path):
+        chunk.append(doc)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _readability_batch(texts):
+    """Flesch reading ease of each text. Runs in a worker process."""
+    import textstat
+    return [textstat.flesch_reading_ease(text) for text in texts]
+
+
+class TermCounter:
+    """
+    A Counter that holds at most max_terms distinct terms.
+
+    When the limit is exceeded only the most frequent half is kept. Counts
+    of frequent terms stay exact in practice; rare terms may be undercounted,
+    which does not affect the top-N lists produced here.
+    """
+
+    def __init__(self, max_terms=1_000_000):
+        self.max_terms = max_terms
+        self.counts = Counter()
+
+    def update(self, terms):
+        self.counts.update(terms)
+        if len(self.counts) > self.max_terms:
+            self.counts = Counter(dict(self.counts.most_common(self.max_terms // 2)))
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+
+def scan_corpus(path, output_dir, chunk_size=1000, workers=None, max_terms=1_000_000, top_longest=15):
+    """
+    Streams the corpus once, collecting everything that needs a single pass.
+
+    Writes loaded_data.csv as it goes, counts words, vectorizer terms and
+    bigrams, keeps the longest documents, and scores readability in a
+    process pool with a bounded number of chunks in flight.
+
+    Returns:
+        dict: "metrics" (DataFrame with one row per document), the term
+        counters "words", "terms" and "bigrams", and "longest" (a DataFrame).
+    """
+    unigrams = CountVectorizer(stop_words="english").build_analyzer()
+    bigrams = CountVectorizer(ngram_range=(2, 2), stop_words="english").build_analyzer()
+    word_counter = TermCounter(max_terms)
+    term_counter = TermCounter(max_terms)
+    bigram_counter = TermCounter(max_terms)
+
+    metrics = {"title": [], "url": [], "content_length": [], "word_count": []}
+    readability = []
+    longest = []  # Min-heap of (word_count, index, doc)
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    in_flight = deque()
+
+    try:
+        with open(os.path.join(output_dir, "loaded_data.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            index = 0
+            for chunk in iter_chunks(path, chunk_size):
+                texts = [doc["cleaned_content"] for doc in chunk]
+                if executor is not None:
+                    in_flight.append(executor.submit(_readability_batch, texts))
+                    if len(in_flight) >= 2 * workers:
+                        readability.extend(in_flight.popleft().result())
+                else:
+                    readability.extend(_readability_batch(texts))
+
+                for doc, text in zip(chunk, texts):
+                    writer.writerow([doc["title"], doc["url"], text])
+                    words = text.split()
+                    word_counter.update(words)
+                    term_counter.update(unigrams(text))
+                    bigram_counter.update(bigrams(text))
+
+                    metrics["title"].append(doc["title"])
+                    metrics["url"].append(doc["url"])
+                    metrics["content_length"].append(len(text))
+                    metrics["word_count"].append(len(words))
+
+                    entry = (len(words), index, doc)
+                    if len(longest) < top_longest:
+                        heapq.heappush(longest, entry)
+                    else:
+                        heapq.heappushpop(longest, entry)
+                    index += 1
+        while in_flight:
+            readability.extend(in_flight.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    metrics = pd.DataFrame(metrics)
+    metrics["readability_score"] = readability
+    longest = sorted(longest, key=lambda entry: (-entry[0], entry[1]))
+    longest_df = pd.DataFrame(
+        [{**doc, "content_length": len(doc["cleaned_content"]), "word_count": count, "index": i}
+         for count, i, doc in longest],
+        columns=["title", "url", "cleaned_content", "content_length", "word_count", "index"],
+    )
+    return {
+        "metrics": metrics,
+        "words": word_counter,
+        "terms": term_counter,
+        "bigrams": bigram_counter,
+        "longest": longest_df,
+    }
+
+
+def cluster_documents(path, vocabulary, n_clusters=5, chunk_size=1000, sample_size=20000, random_state=42):
+    """
+    Clusters documents on a sparse, standardized bag of words.
+
+    Makes three streaming passes: one to fit the scaler, one to fit
+    MiniBatchKMeans while reservoir-sampling rows for TruncatedSVD, and one
+    to assign clusters and 2-D coordinates. The matrix is never densified;
+    scaling is by column standard deviation only, without centering.
+
+    Args:
+        path (str): Corpus path, as for iter_corpus.
+        vocabulary (list[str]): Terms to count (the most frequent ones).
+        n_clusters (int): Number of clusters.
+        chunk_size (int): Documents per chunk; should be at least n_clusters.
+        sample_size (int): Rows sampled to fit the 2-D projection.
+        random_state (int): Seed for clustering, sampling and the projection.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Cluster label and 2-D coordinates of every document.
+    """
+    vectorizer = CountVectorizer(vocabulary=vocabulary, stop_words="english")
+    scaler = StandardScaler(with_mean=False)
+    for chunk in iter_chunks(path, chunk_size):
+        scaler.partial_fit(vectorizer.transform([doc["cleaned_content"] for doc in chunk]))
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=chunk_size, n_init=3)
+    rng = np.random.default_rng(random_state)
+    sample, seen = [], 0
+    for chunk in iter_chunks(path, chunk_size):
+        X = scaler.transform(vectorizer.transform([doc["cleaned_content"] for doc in chunk]))
+        if X.shape[0] >= n_clusters:
+            kmeans.partial_fit(X)
+        for row in range(X.shape[0]):
+            seen += 1
+            if len(sample) < sample_size:
+                sample.append(X[row])
+            else:
+                slot = rng.integers(seen)
+                if slot < sample_size:
+                    sample[slot] = X[row]
+    svd = TruncatedSVD(n_components=2, random_state=random_state).fit(sparse.vstack(sample))
+
+    labels, coords = [], []
+    for chunk in iter_chunks(path, chunk_size):
+        X = scaler.transform(vectorizer.transform([doc["cleaned_content"] for doc in chunk]))
+        labels.append(kmeans.predict(X))
+        coords.append(svd.transform(X))
+    return np.concatenate(labels), np.vstack(coords)
+
+
+def _save_plot(output_dir, file_name):
+    plt.savefig(os.path.join(output_dir, file_name))
+    plt.close()
+    print(f"✅ Plot saved as {file_name}")
+
+
+def _save_csv(df, output_dir, file_name, **kwargs):
+    df.to_csv(os.path.join(output_dir, file_name), **kwargs)
+    print(f"✅ Saved {file_name}")
+
+
+def plot_word_cloud(word_counts, output_dir, max_words=2000):
+    """
+    Draws the word cloud from term frequencies instead of the joined corpus text.
+
+    Skipped with a message when the optional wordcloud package is missing.
+    """
+    try:
+        from wordcloud import WordCloud, STOPWORDS
+    except ImportError:
+        print("⚠️ wordcloud is not installed, skipping word_cloud.png")
+        return
+    frequencies = {}
+    for word, count in word_counts.most_common():
+        if word.lower() not in STOPWORDS:
+            frequencies[word] = count
+            if len(frequencies) == max_words:
+                break
+    if not frequencies:
+        return
+    wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(frequencies)
+    plt.figure(figsize=(15, 7))
+    plt.imshow(wordcloud, interpolation="bilinear")
+    plt.axis("off")
+    plt.title("Word Cloud of Policy Documents", fontsize=16)
+    _save_plot(output_dir, "word_cloud.png")
+
+
+def run_eda(corpus_path=None, output_dir=DEFAULT_OUTPUT_DIR, n_clusters=5, chunk_size=1000, workers=None,
+            max_terms=1_000_000, sample_size=20000, max_features=1000, word_cloud=True):
+    """
+    Runs the full EDA and writes its CSV and PNG files to output_dir.
+
+    Args:
+        corpus_path (str, optional): Corpus to analyse. Defaults to default_corpus_path().
+        output_dir (str): Directory for the outputs.
+        n_clusters (int): Number of K-Means clusters.
+        chunk_size (int): Documents processed per chunk.
+        workers (int, optional): Processes for readability scoring (0 runs inline).
+        max_terms (int): Maximum distinct terms held by each term counter.
+        sample_size (int): Documents sampled to fit the cluster projection.
+        max_features (int): Vocabulary size used for clustering.
+        word_cloud (bool): Draw the word cloud (needs the wordcloud package).
+
+    Returns:
+        pd.DataFrame: Per-document metrics: title, url, lengths, readability and cluster.
+    """
+    corpus_path = corpus_path or default_corpus_path()
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"🔎 Analysing {corpus_path}")
+
+    scan = scan_corpus(corpus_path, output_dir, chunk_size=chunk_size, workers=workers, max_terms=max_terms)
+    metrics = scan["metrics"]
+    if metrics.empty:
+        print("❌ The corpus is empty, nothing to analyse.")
+        return metrics
+    print(f"✅ Data loaded and saved to loaded_data.csv ({len(metrics)} documents)")
+
+    # Dataset overview and word counts
+    _save_csv(metrics[["content_length", "word_count"]].describe(), output_dir, "dataset_overview.csv")
+
+    plt.figure(figsize=(10, 6))
+    plt.hist(metrics["word_count"], bins=30, color="skyblue", edgecolor="black")
+    plt.title("Distribution of Word Counts in Policy Documents")
+    plt.xlabel("Word Count")
+    plt.ylabel("Number of Documents")
+    plt.grid(True)
+    _save_plot(output_dir, "word_count_distribution.png")
+
+    # Most common words
+    common_words_df = pd.DataFrame(scan["words"].most_common(20), columns=["Word", "Frequency"])
+    _save_csv(common_words_df, output_dir, "top_common_words.csv", index=False)
+
+    plt.figure(figsize=(12, 6))
+    plt.bar(common_words_df["Word"], common_words_df["Frequency"], color="orange")
+    plt.xticks(rotation=45)
+    plt.title("Top 20 Most Common Words in Policies")
+    plt.xlabel("Words")
+    plt.ylabel("Frequency")
+    _save_plot(output_dir, "common_words_plot.png")
+
+    if word_cloud:
+        plot_word_cloud(scan["words"], output_dir)
+
+    # K-Means clusters, drawn on a 2-D TruncatedSVD projection
+    vocabulary = [term for term, _ in scan["terms"].most_common(max_features)]
+    n_clusters = min(n_clusters, len(metrics))
+    metrics["Cluster"] = -1
+    if len(vocabulary) > 2 and n_clusters > 1:
+        labels, coords = cluster_documents(corpus_path, vocabulary, n_clusters=n_clusters,
+                                           chunk_size=max(chunk_size, n_clusters), sample_size=sample_size)
+        metrics["Cluster"] = labels
+        _save_csv(metrics[["title", "Cluster"]], output_dir, "kmeans_clusters.csv", index=False)
+
+        plt.figure(figsize=(10, 6))
+        for cluster in range(n_clusters):
+            mask = labels == cluster
+            plt.scatter(coords[mask, 0], coords[mask, 1], label=f"Cluster {cluster}")
+        plt.title("PCA Visualization of Clusters")
+        plt.xlabel("Principal Component 1")
+        plt.ylabel("Principal Component 2")
+        plt.legend()
+        plt.grid(True)
+        _save_plot(output_dir, "pca_clusters.png")
+    else:
+        print("⚠️ Not enough documents or terms to cluster, skipping kmeans_clusters.csv")
+
+    # Longest policies
+    top_longest = scan["longest"]
+    top_longest["Cluster"] = metrics["Cluster"].iloc[top_longest["index"]].to_numpy()
+    _save_csv(top_longest.drop(columns="index"), output_dir, "top_longest_policies.csv", index=False)
+
+    plt.figure(figsize=(12, 8))
+    plt.barh(top_longest["title"], top_longest["word_count"], color="steelblue")
+    plt.xlabel("Word Count")
+    plt.ylabel("Policy Title")
+    plt.title("Top 15 Longest Policies")
+    plt.gca().invert_yaxis()
+    _save_plot(output_dir, "top_longest_policies.png")
+
+    # Readability
+    _save_csv(metrics[["title", "readability_score"]], output_dir, "readability_scores.csv", index=False)
+
+    plt.figure(figsize=(10, 6))
+    plt.hist(metrics["readability_score"], bins=30, color="green", edgecolor="black")
+    plt.title("Distribution of Readability Scores (Flesch Reading Ease)")
+    plt.xlabel("Readability Score")
+    plt.ylabel("Number of Documents")
+    plt.grid(True)
+    _save_plot(output_dir, "readability_scores_distribution.png")
+
+    # Bigrams
+    bigram_df = pd.DataFrame(scan["bigrams"].most_common(15), columns=["Bigram", "Frequency"])
+    _save_csv(bigram_df, output_dir, "top_bigrams.csv", index=False)
+
+    plt.figure(figsize=(12, 6))
+    plt.barh(bigram_df["Bigram"], bigram_df["Frequency"], color="orchid")
+    plt.xlabel("Frequency")
+    plt.title("Top 15 Most Common Bigrams")
+    plt.gca().invert_yaxis()
+    _save_plot(output_dir, "top_bigrams.png")
+
+    print(f"✅ EDA completed, outputs saved to {output_dir}")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the exploratory data analysis of the policy corpus.")
+    parser.add_argument("--corpus", default=None, help="Arrow export, JSON corpus or shard directory")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory for CSV and PNG outputs")
+    parser.add_argument("--clusters", type=int, default=5, help="Number of K-Means clusters")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Documents processed per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Readability worker processes (0 runs inline)")
+    parser.add_argument("--max-terms", type=int, default=1_000_000, help="Distinct terms kept per term counter")
+    parser.add_argument("--no-wordcloud", action="store_true", help="Skip the word cloud")
+    args = parser.parse_args()
+
+    run_eda(
+        corpus_path=args.corpus,
+        output_dir=args.output_dir,
+        n_clusters=args.clusters,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        max_terms=args.max_terms,
+        word_cloud=not args.no_wordcloud,
+    )
+
+
+if __name__ == "__main__":
+    main()
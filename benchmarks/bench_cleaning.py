@@ -0,0 +1,109 @@
+"""
+Compares the BeautifulSoup and lxml HTML cleaners on the stored raw policy HTML.
+
+Run from the repository root:
+    python -m benchmarks.bench_cleaning --repeat 3
+"""
+import os
+import glob
+import time
+import argparse
+from policy_scraper.policy_scraper.cleaning import CLEANERS
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_RAW_DIR = os.path.join(BASE_DIR, "data", "raw", "policies")
+
+
+def load_pages(raw_dir, limit=None):
+    """
+    Reads the stored raw HTML pages.
+
+    Returns:
+        list[tuple[str, str]]: (file name, HTML) pairs.
+    """
+    paths = sorted(glob.glob(os.path.join(raw_dir, "*.html")))[:limit]
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def time_cleaner(cleaner, pages, repeat):
+    """
+    Cleans every page repeat times and keeps the fastest run.
+
+    Returns:
+        tuple[float, list[str]]: Best wall time in seconds and the cleaned texts.
+    """
+    best = float("inf")
+    outputs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [cleaner(html) for _, html in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def compare_outputs(reference, candidate):
+    """
+    Compares the text of two cleaners page by page.
+
+    Returns:
+        dict: Average length ratio (candidate / reference), the share of the
+        candidate's words that also occur in the reference, and the share of
+        the reference's words that the candidate dropped.
+    """
+    ratios, kept, dropped = [], [], []
+    for ref, cand in zip(reference, candidate):
+        ref_words, cand_words = set(ref.split()), set(cand.split())
+        if not ref_words:
+            continue
+        ratios.append(len(cand) / len(ref))
+        kept.append(len(cand_words & ref_words) / len(cand_words) if cand_words else 1.0)
+        dropped.append(len(ref_words - cand_words) / len(ref_words))
+    n = max(1, len(ratios))
+    return {
+        "length_ratio": sum(ratios) / n,
+        "words_in_reference": sum(kept) / n,
+        "reference_words_dropped": sum(dropped) / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTML cleaners on stored policy pages.")
+    parser.add_argument("--raw-dir", default=DEFAULT_RAW_DIR, help="Directory of raw policy .html files")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per cleaner; the fastest is reported")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N pages")
+    parser.add_argument("--show", type=int, default=0, help="Print the first N pages' outputs side by side")
+    args = parser.parse_args()
+
+    pages = load_pages(args.raw_dir, args.limit)
+    if not pages:
+        print(f"❌ No .html files found in {args.raw_dir}. Run the scraper first.")
+        return
+    total_mb = sum(len(html.encode("utf-8")) for _, html in pages) / 1e6
+    print(f"📄 {len(pages)} pages, {total_mb:.1f} MB of HTML, best of {args.repeat} runs\n")
+
+    results = {}
+    for name, cleaner in CLEANERS.items():
+        seconds, outputs = time_cleaner(cleaner, pages, args.repeat)
+        results[name] = (seconds, outputs)
+        print(f"⏱️ {name:>5}: {seconds:.2f} s, {len(pages) / seconds:.1f} pages/sec, {total_mb / seconds:.1f} MB/s")
+
+    bs4_seconds, bs4_outputs = results["bs4"]
+    lxml_seconds, lxml_outputs = results["lxml"]
+    comparison = compare_outputs(bs4_outputs, lxml_outputs)
+    print(f"\n🚀 lxml speedup: {bs4_seconds / lxml_seconds:.1f}x")
+    print(f"📏 lxml text length vs bs4: {comparison['length_ratio']:.0%}")
+    print(f"🔎 lxml words also in bs4 output: {comparison['words_in_reference']:.1%}")
+    print(f"🧹 bs4 words dropped as boilerplate: {comparison['reference_words_dropped']:.1%}")
+
+    for (file_name, _), bs4_text, lxml_text in list(zip(pages, bs4_outputs, lxml_outputs))[:args.show]:
+        print(f"\n=== {file_name} ===")
+        print(f"[bs4]  {bs4_text[:500]}")
+        print(f"[lxml] {lxml_text[:500]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Checks the import time of the project's entry points against budgets.
+
+Each module is imported in a fresh interpreter with -X importtime. The
+benchmark fails if an import takes longer than its budget, or if it pulls
+in one of the heavy libraries that must only load on first use.
+
+Run from the repository root:
+    python -m benchmarks.bench_import_time
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRAPER_DIR = os.path.join(BASE_DIR, "policy_scraper")
+
+# Libraries that take seconds to import or load models; entry points must import them lazily
+HEAVY_MODULES = [
+    "torch", "transformers", "sentence_transformers", "spacy", "datasets",
+    "pandas", "matplotlib", "seaborn", "sklearn", "textblob", "bs4", "pypdf", "docx",
+]
+
+# (entry point, module, working directory, budget in milliseconds)
+BUDGETS = [
+    ("CLI", "main", BASE_DIR, 100),
+    ("pipeline runner", "utils.pipeline_runner", BASE_DIR, 50),
+    ("model loaders", "fine_tuning.loaders", BASE_DIR, 50),
+    ("model test harness", "fine_tuning.test_fine_tuned_model", BASE_DIR, 50),
+    ("crawler item pipeline", "policy_scraper.pipelines", SCRAPER_DIR, 400),
+]
+
+
+def measure_import(module, cwd):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple[float, dict]: Total import time in milliseconds, and the
+        cumulative time in milliseconds of every module imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    total_us = 0
+    modules = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package", nested imports indented by 2 spaces
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules[name.strip()] = int(cumulative) / 1000
+        if depth == 0:
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check entry point import times against budgets.")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per entry point; the fastest is kept")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, for slow machines")
+    parser.add_argument("--top", type=int, default=5, help="Show the N slowest imports of each entry point")
+    args = parser.parse_args()
+
+    failures = 0
+    for label, module, cwd, budget_ms in BUDGETS:
+        budget_ms *= args.scale
+        try:
+            runs = [measure_import(module, cwd) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"❌ {label}: {e}")
+            failures += 1
+            continue
+        total_ms, modules = min(runs, key=lambda run: run[0])
+        heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES and "." not in name)
+
+        ok = total_ms <= budget_ms and not heavy
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {label} ({module}): {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        if heavy:
+            print(f"     imports heavy modules eagerly: {', '.join(heavy)}")
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, ms in slowest:
+            print(f"     {ms:8.1f} ms  {name}")
+
+    if failures:
+        print(f"\n❌ {failures} entry point(s) over budget")
+        sys.exit(1)
+    print("\n✅ All entry points within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measures time to first token with and without the template prefix cache.
+
+Every template is combined with the policy excerpts of the evaluation test
+cases, or with excerpts of real policies from the consolidated corpus when
+--corpus is given. Each configuration first runs once to warm up (filling
+the prefix cache), then the time of a one-token generate per batch is
+taken, which is prompt encoding plus one step. Greedy decoding, so both
+paths must produce the same tokens.
+
+Run from the repository root:
+    python -m benchmarks.bench_prefix_cache --batch-size 4 --repeat 3
+"""
+import time
+import argparse
+from fine_tuning.loaders import FINE_TUNED_MODEL_DIR, PRECISIONS, load_generation_model
+from fine_tuning.prefix_cache import PromptPrefixCache, DEFAULT_TEMPLATES, render_prompt
+from fine_tuning.test_fine_tuned_model import test_cases
+
+
+def policy_excerpts(corpus=None, limit=8, words=200):
+    """Returns policy texts to put after the templates."""
+    if corpus is None:
+        # The text after the instruction in the templated test cases
+        excerpts = []
+        for case in test_cases:
+            for prefix in DEFAULT_TEMPLATES.values():
+                if case["prompt"].startswith(prefix):
+                    excerpts.append(case["prompt"][len(prefix):].strip())
+        return excerpts
+
+    from fine_tuning.incremental import iter_corpus_texts
+    excerpts = []
+    for _, text in iter_corpus_texts(corpus):
+        excerpts.append(" ".join(text.split()[:words]))
+        if len(excerpts) == limit:
+            break
+    return excerpts
+
+
+def time_to_first_token(model, tokenizer, prompts, batch_size, repeat, prefix_cache=None):
+    """
+    Returns the best time over repeat runs of a one-token generate for every batch, and the tokens generated.
+    """
+    from fine_tuning.generation import generate_batch
+
+    kwargs = dict(batch_size=batch_size, max_new_tokens=1, do_sample=False, prefix_cache=prefix_cache)
+    generate_batch(model, tokenizer, prompts, **kwargs)  # Warm up
+    best, responses = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        responses, _ = generate_batch(model, tokenizer, prompts, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare time to first token with and without the prefix cache.")
+    parser.add_argument("--model", default=FINE_TUNED_MODEL_DIR)
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32")
+    parser.add_argument("--corpus", help="Arrow export or consolidated corpus to take policy excerpts from")
+    parser.add_argument("--policy-words", type=int, default=200, help="Words per corpus excerpt")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model, tokenizer = load_generation_model(args.model, args.precision)
+    excerpts = policy_excerpts(args.corpus, words=args.policy_words)
+    prompts = [render_prompt(name, excerpt) for name in DEFAULT_TEMPLATES for excerpt in excerpts]
+    batches = -(-len(prompts) // args.batch_size)
+    print(f"🔎 {len(prompts)} prompts ({len(DEFAULT_TEMPLATES)} templates x {len(excerpts)} policies), "
+          f"{batches} batches of up to {args.batch_size}")
+
+    baseline, expected = time_to_first_token(model, tokenizer, prompts, args.batch_size, args.repeat)
+    cache = PromptPrefixCache(model, tokenizer)
+    cached, responses = time_to_first_token(model, tokenizer, prompts, args.batch_size, args.repeat, cache)
+
+    prefix_tokens = [len(tokenizer(prefix)["input_ids"]) for prefix in DEFAULT_TEMPLATES.values()]
+    prompt_tokens = [len(tokenizer(prompt)["input_ids"]) for prompt in prompts]
+    print(f"Prefix tokens per prompt: {sum(prefix_tokens) / len(prefix_tokens):.0f} "
+          f"of {sum(prompt_tokens) / len(prompt_tokens):.0f}")
+    print(f"Time to first token per batch: {1000 * baseline / batches:.1f} ms without cache, "
+          f"{1000 * cached / batches:.1f} ms with cache ({baseline / cached:.2f}x)")
+    stats = cache.stats()
+    print(f"Prefix cache: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB, "
+          f"{stats['hits']} hits, {stats['misses']} misses, {stats['bypassed']} bypassed")
+    same = sum(a == b for a, b in zip(expected, responses))
+    print(f"{'✅' if same == len(prompts) else '⚠️'} Same first token for {same}/{len(prompts)} prompts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Compares the fp32 and int8 fine-tuned model on the evaluation test cases.
+
+Each precision is measured in a fresh process: load time, resident memory
+added by the model, size on disk and per-token generation latency. The
+responses are then scored with the evaluation's relevance metric to show
+how far quantization moves the scores.
+
+Generation is greedy by default, so the two models differ only by
+quantization and not by sampling.
+
+Run from the repository root:
+    python -m benchmarks.bench_quantized --max-new-tokens 64
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULT_PREFIX = "RESULT "
+
+
+def current_rss_mb():
+    """Returns the resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Peak rather than current where /proc is missing; KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def directory_size_mb(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / (1024 * 1024)
+
+
+def measure(precision, model_path, max_new_tokens, sample):
+    """
+    Loads the model at one precision and generates a response for every test case, one at a time.
+
+    Returns:
+        dict: Load time, memory, latency and the responses.
+    """
+    # Libraries are imported before the baseline, so only the model counts against memory
+    import torch
+    import transformers
+    from fine_tuning.generation import generate_batch
+    from fine_tuning.loaders import load_generation_model, SAMPLING_ARGS
+    from fine_tuning.quantization import quantized_model_dir
+    from fine_tuning.test_fine_tuned_model import test_cases, SEED
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model, tokenizer = load_generation_model(model_path, precision)
+    load_seconds = time.perf_counter() - start
+    rss_model = current_rss_mb() - rss_before
+
+    prompts = [case["prompt"] for case in test_cases]
+    generate_kwargs = dict(SAMPLING_ARGS, seed=SEED) if sample else {"do_sample": False}
+    # Warm up kernels and allocator before timing
+    generate_batch(model, tokenizer, prompts[:1], batch_size=1, max_new_tokens=8, **generate_kwargs)
+    responses, batch_stats = generate_batch(
+        model, tokenizer, prompts, batch_size=1, max_new_tokens=max_new_tokens, **generate_kwargs
+    )
+
+    token_ms = sorted(1000 * stats["latency"] / stats["new_tokens"] for stats in batch_stats if stats["new_tokens"])
+    weights_dir = quantized_model_dir(model_path) if precision == "int8" else model_path
+    return {
+        "precision": precision,
+        "threads": torch.get_num_threads(),
+        "load_seconds": load_seconds,
+        "rss_mb": rss_model,
+        "disk_mb": directory_size_mb(weights_dir),
+        "ms_per_token": sum(token_ms) / len(token_ms) if token_ms else None,
+        "p50_ms_per_token": token_ms[len(token_ms) // 2] if token_ms else None,
+        "new_tokens": sum(stats["new_tokens"] for stats in batch_stats),
+        "responses": responses,
+    }
+
+
+def run_worker(precision, args):
+    """Measures one precision in a fresh interpreter, so load time and memory start from scratch."""
+    command = [
+        sys.executable, "-m", "benchmarks.bench_quantized", "--worker", precision,
+        "--model", args.model, "--max-new-tokens", str(args.max_new_tokens),
+    ]
+    if args.sample:
+        command.append("--sample")
+    result = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{precision} run failed:\n{result.stderr.strip()}")
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"{precision} run printed no result")
+
+
+def main():
+    from fine_tuning.loaders import FINE_TUNED_MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Compare the fp32 and int8 fine-tuned model.")
+    parser.add_argument("--model", default=FINE_TUNED_MODEL_DIR, help="Directory of the fp32 model")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--sample", action="store_true", help="Sample as the evaluation does instead of greedy decoding")
+    parser.add_argument("--worker", choices=["fp32", "int8"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = measure(args.worker, args.model, args.max_new_tokens, args.sample)
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    from fine_tuning.quantization import is_current, export_quantized
+    from fine_tuning.test_fine_tuned_model import test_cases, calculate_relevances
+
+    # Export up front so the int8 load time is loading only
+    if not is_current(args.model):
+        export_quantized(args.model)
+
+    results = {precision: run_worker(precision, args) for precision in ("fp32", "int8")}
+    expected = [case["expected"] for case in test_cases]
+    for result in results.values():
+        result["relevance"] = calculate_relevances(result["responses"], expected)
+
+    fp32, int8 = results["fp32"], results["int8"]
+    print(f"\n{'':<22}{'fp32':>12}{'int8':>12}{'ratio':>10}")
+    for label, key, unit in [
+        ("Load time", "load_seconds", "s"),
+        ("Resident memory", "rss_mb", "MB"),
+        ("Size on disk", "disk_mb", "MB"),
+        ("Latency per token", "ms_per_token", "ms"),
+        ("p50 per token", "p50_ms_per_token", "ms"),
+    ]:
+        ratio = int8[key] / fp32[key] if fp32[key] else float("nan")
+        print(f"{label + ' (' + unit + ')':<22}{fp32[key]:>12.2f}{int8[key]:>12.2f}{ratio:>9.2f}x")
+
+    drift = [abs(a - b) for a, b in zip(fp32["relevance"], int8["relevance"])]
+    identical = sum(a == b for a, b in zip(fp32["responses"], int8["responses"]))
+    print(f"\nThreads: {fp32['threads']}, tokens generated: {fp32['new_tokens']} fp32 / {int8['new_tokens']} int8")
+    print(f"Mean relevance: {sum(fp32['relevance']) / len(drift):.2f} fp32, {sum(int8['relevance']) / len(drift):.2f} int8")
+    print(f"Relevance drift: mean {sum(drift) / len(drift):.2f}, max {max(drift):.2f} (out of 10)")
+    print(f"Identical responses: {identical}/{len(drift)}")
+    for case, a, b in zip(test_cases, fp32["relevance"], int8["relevance"]):
+        print(f"  {a:5.2f} → {b:5.2f}  {case['prompt'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
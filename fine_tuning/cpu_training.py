@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+from transformers import TrainerCallback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Training settings per hardware profile. "gpu" is the original
+# configuration. "cpu" uses longer packed blocks and a larger effective
+# batch (batch_size * grad_accum sequences per optimizer step) so each step
+# does enough matrix work to keep every core busy. Any key can be
+# overridden per run.
+TRAINING_PROFILES = {
+    "gpu": {
+        "block_size": 128,
+        "batch_size": 8,
+        "grad_accum": 1,
+        "bf16": False,
+        "gradient_checkpointing": False,
+        "threads": None,
+        "dataloader_workers": 0,
+    },
+    "cpu": {
+        "block_size": 256,
+        "batch_size": 8,
+        "grad_accum": 4,
+        "bf16": "auto",
+        "gradient_checkpointing": False,
+        "threads": None,
+        "dataloader_workers": 1,
+    },
+}
+
+
+def cpu_bf16_supported():
+    """
+    Returns True if the CPU has native bfloat16 instructions (AVX-512 BF16 or AMX).
+
+    bf16 autocast runs on any CPU, but without these instructions it is
+    emulated and slower than fp32, so it is only worth enabling with them.
+    """
+    import torch
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = set()
+            for line in f:
+                if line.startswith("flags"):
+                    flags.update(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        return False
+    return bool(flags & {"avx512_bf16", "amx_bf16"})
+
+
+def available_cpus():
+    """Returns the number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def resolve_profile(profile="auto", **overrides):
+    """
+    Returns the training settings of a profile with overrides applied.
+
+    Args:
+        profile (str): "cpu", "gpu", or "auto" to pick by whether CUDA is available.
+        **overrides: Settings to change, e.g. block_size=512. None keeps the profile value.
+
+    Returns:
+        dict: The settings, with "profile" set and "bf16" and "threads" resolved.
+    """
+    if profile == "auto":
+        import torch
+        profile = "gpu" if torch.cuda.is_available() else "cpu"
+    if profile not in TRAINING_PROFILES:
+        raise ValueError(f"Unknown training profile {profile!r}, expected one of {list(TRAINING_PROFILES)}")
+    unknown = set(overrides) - set(TRAINING_PROFILES[profile])
+    if unknown:
+        raise ValueError(f"Unknown training settings: {sorted(unknown)}")
+
+    settings = dict(TRAINING_PROFILES[profile], profile=profile)
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    if settings["bf16"] == "auto":
+        settings["bf16"] = profile == "cpu" and cpu_bf16_supported()
+    if profile == "cpu" and settings["threads"] is None:
+        # Leave a core to each data loader worker
+        settings["threads"] = max(1, available_cpus() - settings["dataloader_workers"])
+    return settings
+
+
+def configure_threads(threads):
+    """
+    Sets the number of threads torch uses for intra-op parallelism.
+
+    Inter-op parallelism only helps with independent ops, which a single
+    transformer forward pass mostly lacks, so it is kept small.
+    """
+    import torch
+    if not threads:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(min(2, threads))
+    except RuntimeError:
+        # Can only be set before the first parallel op; keep whatever is in place
+        pass
+    print(f"🔄 Training with {threads} intra-op threads")
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Measures training throughput.
+
+    Times every optimizer step (including all of its gradient accumulation
+    micro-batches), prints tokens/sec, step time and peak RSS whenever the
+    Trainer logs, and writes a summary to <output_dir>/throughput.json at the
+    end of training for sizing jobs and comparing runs.
+
+    Args:
+        block_size (int): Tokens per training sequence.
+        settings (dict, optional): Training settings to record with the summary.
+    """
+
+    def __init__(self, block_size, settings=None):
+        self.block_size = block_size
+        self.settings = settings or {}
+        self.step_times = []
+        self.train_start = None
+        self._step_start = None
+        self._last_logged = 0
+        self.result = None
+
+    def tokens_per_step(self, args):
+        return args.per_device_train_batch_size * args.gradient_accumulation_steps * args.world_size * self.block_size
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.train_start = time.perf_counter()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self._step_start is not None:
+            self.step_times.append(time.perf_counter() - self._step_start)
+            self._step_start = None
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        recent = self.step_times[self._last_logged:]
+        if not recent:
+            return
+        self._last_logged = len(self.step_times)
+        step_time = sum(recent) / len(recent)
+        peak = peak_rss_mb()
+        peak_text = f", peak RSS {peak:.0f} MB" if peak is not None else ""
+        print(
+            f"⏱️ step {state.global_step}: {self.tokens_per_step(args) / step_time:,.0f} tokens/s, "
+            f"{step_time:.2f} s/step{peak_text}"
+        )
+
+    def summary(self, args):
+        """Returns the throughput of the whole run as a dict."""
+        steps = len(self.step_times)
+        train_seconds = time.perf_counter() - self.train_start
+        step_times = sorted(self.step_times)
+        tokens = steps * self.tokens_per_step(args)
+        return {
+            "steps": steps,
+            "tokens": tokens,
+            "tokens_per_step": self.tokens_per_step(args),
+            "train_seconds": train_seconds,
+            "tokens_per_second": tokens / train_seconds if train_seconds else 0.0,
+            "mean_step_seconds": sum(step_times) / steps if steps else None,
+            "p50_step_seconds": step_times[steps // 2] if steps else None,
+            "p95_step_seconds": step_times[min(steps - 1, int(steps * 0.95))] if steps else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "settings": self.settings,
+        }
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self.train_start is None:
+            return
+        summary = self.result = self.summary(args)
+        os.makedirs(args.output_dir, exist_ok=True)
+        with open(os.path.join(args.output_dir, "throughput.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        print(
+            f"✅ Trained {summary['tokens']:,} tokens in {summary['train_seconds']:.0f} s "
+            f"({summary['tokens_per_second']:,.0f} tokens/s)"
+        )
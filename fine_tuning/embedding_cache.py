@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import numpy as np
+from slugify import slugify
+
+
+def text_key(text):
+    """Returns the cache key of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cosine_similarities(a, b):
+    """
+    Row-wise cosine similarity between two matrices of the same shape.
+    """
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    return np.einsum("ij,ij->i", a, b)
+
+
+class EmbeddingCache:
+    """
+    Disk-backed cache of sentence embeddings for one model.
+
+    Embeddings are stored as rows of embeddings.npy, and index.json maps the
+    SHA-256 of each text to its row. Each model gets its own directory, so
+    entries are keyed by model name and text hash. Texts that are not cached
+    yet are encoded together in a single batch.
+    """
+
+    def __init__(self, model, model_name, cache_dir):
+        self.model = model
+        self.cache_dir = os.path.join(cache_dir, slugify(model_name))
+        self.embeddings_path = os.path.join(self.cache_dir, "embeddings.npy")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.index = {}
+        self.embeddings = None
+
+        if os.path.exists(self.embeddings_path) and os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+            self.embeddings = np.load(self.embeddings_path)
+
+    def encode(self, texts, batch_size=64):
+        """
+        Returns the embeddings of texts, encoding only those that are not cached.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            batch_size (int): Batch size for encoding uncached texts.
+
+        Returns:
+            np.ndarray: One embedding row per text, in input order.
+        """
+        keys = [text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_embeddings = np.asarray(
+                self.model.encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+            offset = 0 if self.embeddings is None else len(self.embeddings)
+            for row, key in enumerate(missing):
+                self.index[key] = offset + row
+            self.embeddings = new_embeddings if self.embeddings is None else np.concatenate(
+                [self.embeddings, new_embeddings])
+            self.save()
+
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return self.embeddings[[self.index[key] for key in keys]]
+
+    def save(self):
+        """
+        Writes the embeddings and index to disk atomically.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_embeddings = os.path.join(self.cache_dir, "embeddings.tmp.npy")
+        np.save(tmp_embeddings, self.embeddings)
+        os.replace(tmp_embeddings, self.embeddings_path)
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_index, self.index_path)
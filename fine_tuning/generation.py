@@ -0,0 +1,98 @@
+import time
+import torch
+from transformers import set_seed
+
+
+def prepare_tokenizer_for_batching(tokenizer):
+    """
+    Configures a GPT-2 tokenizer for batched generation.
+
+    Decoder-only models continue from the last position of each row, so
+    prompts must be padded on the left. GPT-2 has no padding token; EOS is
+    reused, which needs no new embedding.
+    """
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+
+def _batch_order(prompts, batch_size, prefix_cache):
+    """
+    Returns the prompt indices of each batch.
+
+    With a prefix cache, prompts are stably sorted by template first so that
+    prompts sharing a template tend to fill whole batches, which can then
+    continue from the cached prefix. The number of batches is unchanged.
+    """
+    order = list(range(len(prompts)))
+    if prefix_cache is not None:
+        templates = [prefix_cache.match(prompt) or "" for prompt in prompts]
+        order.sort(key=lambda i: templates[i])
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def generate_batch(model, tokenizer, prompts, batch_size=8, max_new_tokens=120, seed=None,
+                   max_prompt_length=512, prefix_cache=None, **generate_kwargs):
+    """
+    Generates responses for a list of prompts in left-padded batches.
+
+    Args:
+        model: A causal language model.
+        tokenizer: Its tokenizer.
+        prompts (list[str]): Prompts to complete.
+        batch_size (int): Prompts per generate call.
+        max_new_tokens (int): Maximum number of tokens generated per prompt.
+        seed (int, optional): Seed for sampling. Batch i is seeded with seed + i,
+            so a batch gives the same output wherever it appears in a run.
+        max_prompt_length (int): Prompts are truncated to this many tokens.
+        prefix_cache (PromptPrefixCache, optional): Batches whose prompts all
+            use one template continue from its cached prefix state instead of
+            encoding it again (see fine_tuning.prefix_cache).
+        **generate_kwargs: Extra arguments for model.generate (temperature, top_p, ...).
+
+    Returns:
+        tuple: The decoded responses (prompt included, as before) in input order,
+            and one stats dict per batch with latency and tokens/sec.
+    """
+    prepare_tokenizer_for_batching(tokenizer)
+    responses = [None] * len(prompts)
+    batch_stats = []
+
+    for batch_index, indices in enumerate(_batch_order(prompts, batch_size, prefix_cache)):
+        batch = [prompts[i] for i in indices]
+        if seed is not None:
+            set_seed(seed + batch_index)
+
+        batch_start = time.perf_counter()
+        prepared = prefix_cache.prepare(batch, max_prompt_length) if prefix_cache is not None else None
+        if prepared is not None:
+            outputs, prompt_length = prefix_cache.generate(*prepared, max_new_tokens=max_new_tokens, **generate_kwargs)
+        else:
+            inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True,
+                               max_length=max_prompt_length)
+            prompt_length = inputs["input_ids"].shape[1]
+            with torch.no_grad():
+                outputs = model.generate(
+                    input_ids=inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **generate_kwargs,
+                )
+        latency = time.perf_counter() - batch_start
+
+        new_tokens = outputs[:, prompt_length:]
+        generated = int((new_tokens != tokenizer.pad_token_id).sum())
+        for i, response in zip(indices, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+            responses[i] = response
+        batch_stats.append({
+            "batch": batch_index,
+            "size": len(batch),
+            "latency": latency,
+            "new_tokens": generated,
+            "tokens_per_sec": generated / latency if latency > 0 else 0.0,
+            "prefix_cached": prepared is not None,
+        })
+
+    return responses, batch_stats
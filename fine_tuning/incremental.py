@@ -0,0 +1,106 @@
+import os
+import json
+import math
+import random
+import hashlib
+from slugify import slugify
+from policy_scraper.policy_scraper.corpus import iter_documents
+
+# Incremental fine-tuning keeps a lineage.json next to every saved model. It
+# records the content hash of each document the model has been trained on,
+# so the next run only has to train on documents that were added or changed
+# since, plus a replay sample of unchanged ones to limit forgetting, and the
+# history of runs that produced the model.
+LINEAGE_NAME = "lineage.json"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_arrow_dataset(path):
+    """Returns True if path is a dataset saved by the consolidator's export_arrow."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "dataset_info.json"))
+
+
+def iter_corpus_texts(corpus_path):
+    """
+    Yields (document id, cleaned content) for every document of the corpus.
+
+    Args:
+        corpus_path (str): Arrow dataset exported by the consolidator, or a
+            consolidated corpus readable by iter_documents.
+    """
+    if is_arrow_dataset(corpus_path):
+        from datasets import load_from_disk
+        dataset = load_from_disk(corpus_path).select_columns(["id", "cleaned_content"])
+        for rows in dataset.iter(batch_size=1000):
+            for doc_id, text in zip(rows["id"], rows["cleaned_content"]):
+                if text and text.strip():
+                    yield doc_id, text
+        return
+
+    for doc in iter_documents(corpus_path, fields=["id", "title", "cleaned_content"]):
+        text = doc.get("cleaned_content")
+        if text and text.strip():
+            # Corpora written by consolidate_data have no ids. Their slug is derived from the title,
+            # as in the shards and the Arrow export, so a document keeps its id across formats
+            yield doc.get("id") or slugify(doc.get("title") or "default_policy"), text
+
+
+def corpus_hashes(corpus_path):
+    """Returns {document id: SHA-256 of its cleaned content} for the corpus."""
+    return {doc_id: text_hash(text) for doc_id, text in iter_corpus_texts(corpus_path)}
+
+
+def load_lineage(model_dir):
+    """Returns the lineage of a saved model, or None if it has none."""
+    path = os.path.join(model_dir, LINEAGE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def select_documents(current, trained, replay_ratio=0.5, seed=0):
+    """
+    Picks the documents of an incremental run.
+
+    Args:
+        current (dict): {id: hash} of the corpus now.
+        trained (dict): {id: hash} of the documents the model was trained on.
+        replay_ratio (float): Unchanged documents to replay per new or changed document, rounded up,
+            so a single changed document still replays one.
+        seed (int): Seed of the replay sample, so an interrupted run can resume on the same data.
+
+    Returns:
+        dict: "added", "changed", "removed" and "replayed" lists of document ids.
+    """
+    added = sorted(doc_id for doc_id in current if doc_id not in trained)
+    changed = sorted(doc_id for doc_id in current if doc_id in trained and trained[doc_id] != current[doc_id])
+    removed = sorted(doc_id for doc_id in trained if doc_id not in current)
+    unchanged = sorted(doc_id for doc_id in current if trained.get(doc_id) == current[doc_id])
+
+    # Rounded to 9 places first so float error like 10 * 0.7 = 7.000000000000001 doesn't round up
+    num_replay = min(len(unchanged), math.ceil(round((len(added) + len(changed)) * max(replay_ratio, 0), 9)))
+    replayed = sorted(random.Random(seed).sample(unchanged, num_replay))
+    return {"added": added, "changed": changed, "removed": removed, "replayed": replayed}
+
+
+def write_selection(corpus_path, doc_ids, output_file):
+    """
+    Writes the selected documents as a text dataset, in the format of prepare_dataset.
+
+    Returns:
+        int: Number of documents written.
+    """
+    doc_ids = set(doc_ids)
+    count = 0
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for doc_id, text in iter_corpus_texts(corpus_path):
+            if doc_id in doc_ids:
+                f.write(f"{text}\n\n")
+                count += 1
+    os.replace(tmp_file, output_file)
+    return count
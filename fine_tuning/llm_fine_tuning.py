@@ -1,39 +1,120 @@
 import os
 import json
-from transformers import GPT2Tokenizer, GPT2LMHeadModel, Trainer, TrainingArguments, TextDataset, DataCollatorForLanguageModeling
+import time
+import shutil
+import argparse
+from transformers import GPT2TokenizerFast, GPT2LMHeadModel, Trainer, TrainingArguments, DataCollatorForLanguageModeling
+from transformers.trainer_utils import get_last_checkpoint
+from policy_scraper.policy_scraper.corpus import iter_documents
+from fine_tuning.token_cache import build_token_cache, TokenBlockDataset
+from fine_tuning.cpu_training import resolve_profile, configure_threads, ThroughputCallback, TRAINING_PROFILES
+from fine_tuning.incremental import (
+    LINEAGE_NAME, corpus_hashes, is_arrow_dataset, load_lineage, select_documents, write_selection,
+)
 
 def prepare_dataset(data_file, output_file):
     """
-    Converts consolidated JSON data to a plain text dataset for fine-tuning.
+    Converts consolidated data to a plain text dataset for fine-tuning.
+    Documents are streamed one at a time and only their cleaned content is loaded.
     Args:
-        data_file (str): Path to the consolidated JSON file.
+        data_file (str): Path to the consolidated JSON file, a JSONL file or a shard directory.
         output_file (str): Path to save the plain text dataset.
     """
-    with open(data_file, "r", encoding="utf-8") as f:
-        consolidated_data = json.load(f)
-
     with open(output_file, "w", encoding="utf-8") as f:
-        for entry in consolidated_data:
+        for entry in iter_documents(data_file, fields=["cleaned_content"]):
             text = entry["cleaned_content"]
             f.write(f"{text}\n\n")  # Add line breaks between documents
     print(f"Dataset saved to {output_file}")
 
-def fine_tune_model(dataset_path, output_dir):
+def _swap_in(staged, output_dir):
+    """Replaces output_dir with the staged directory, so readers never see a half-written model."""
+    previous = output_dir + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, previous)
+    os.replace(staged, output_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def _prepare_checkpoints(checkpoint_dir, run):
+    """
+    Returns the checkpoint to resume from if checkpoint_dir holds an interrupted run
+    identical to this one, and otherwise clears its checkpoints for a fresh start.
+    """
+    run_path = os.path.join(checkpoint_dir, "run.json")
+    if os.path.exists(run_path):
+        with open(run_path, "r", encoding="utf-8") as f:
+            if json.load(f) == run and os.path.isdir(checkpoint_dir):
+                last = get_last_checkpoint(checkpoint_dir)
+                if last:
+                    return last
+    if os.path.isdir(checkpoint_dir):
+        for name in os.listdir(checkpoint_dir):
+            if name.startswith("checkpoint-"):
+                shutil.rmtree(os.path.join(checkpoint_dir, name))
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    with open(run_path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=4)
+    return None
+
+
+def fine_tune_model(dataset_path, output_dir, cache_dir=None, profile="auto", num_train_epochs=3, max_steps=-1,
+                    base_model="gpt2", lineage=None, **settings):
     """
     Fine-tunes GPT-2 using the provided dataset.
+    The dataset is tokenized once into a memory-mapped token cache that later runs reuse.
+    Documents are packed into full blocks of block_size tokens, so no batch carries padding.
+    Checkpoints are kept in <output_dir>_checkpoints until the run completes, and a run
+    interrupted with the same dataset and settings resumes from the last one.
     Args:
-        dataset_path (str): Path to the text dataset.
+        dataset_path (str): Path to the text dataset, or to the Arrow dataset exported by the consolidator.
         output_dir (str): Directory to save the fine-tuned model.
+        cache_dir (str, optional): Directory for token caches. Defaults to token_cache next to the dataset.
+        profile (str): Training profile from cpu_training.TRAINING_PROFILES: "cpu", "gpu",
+            or "auto" to pick by whether CUDA is available.
+        num_train_epochs (float): Passes over the dataset.
+        max_steps (int): Stop after this many optimizer steps, e.g. to measure throughput. -1 trains all epochs.
+        base_model (str): Model to start from: "gpt2", or the directory of an earlier fine-tuned model.
+        lineage (dict, optional): Lineage to save with the model (see fine_tune_incremental).
+            This run's settings and throughput are appended to its last run entry.
+        **settings: Overrides of profile settings (block_size, batch_size, grad_accum, bf16,
+            gradient_checkpointing, threads, dataloader_workers).
+    Returns:
+        int: Optimizer steps trained. 0 if the dataset doesn't fill a single block,
+        in which case nothing is trained or saved.
     """
-    tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-    model = GPT2LMHeadModel.from_pretrained("gpt2")
+    settings = resolve_profile(profile, **settings)
+    configure_threads(settings["threads"])
+    block_size = settings["block_size"]
+    print(
+        f"🔄 Profile {settings['profile']}: block size {block_size}, batch {settings['batch_size']} "
+        f"x {settings['grad_accum']} accumulation steps, bf16 {'on' if settings['bf16'] else 'off'}"
+    )
 
     # Prepare dataset
-    dataset = TextDataset(
-        tokenizer=tokenizer,
-        file_path=dataset_path,
-        block_size=128,
-    )
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(dataset_path)), "token_cache")
+    token_cache = build_token_cache(dataset_path, cache_dir, tokenizer_name="gpt2")
+    dataset = TokenBlockDataset(token_cache["path"], block_size=block_size, dtype=token_cache["dtype"])
+    if len(dataset) == 0:
+        print(f"⚠️ {token_cache['num_tokens']} tokens don't fill one block of {block_size}, nothing to train")
+        return 0
+
+    output_dir = os.path.abspath(output_dir)
+    checkpoint_dir = output_dir + "_checkpoints"
+    resume_from = _prepare_checkpoints(checkpoint_dir, {
+        "dataset": os.path.basename(token_cache["path"]),
+        "base_model": base_model,
+        "num_train_epochs": num_train_epochs,
+        "max_steps": max_steps,
+        "settings": settings,
+    })
+    if resume_from:
+        print(f"🔄 Resuming interrupted run from {resume_from}")
+
+    print(f"🔄 Starting from {base_model}")
+    tokenizer = GPT2TokenizerFast.from_pretrained(base_model)
+    model = GPT2LMHeadModel.from_pretrained(base_model)
 
     data_collator = DataCollatorForLanguageModeling(
         tokenizer=tokenizer,
@@ -42,45 +123,189 @@ def fine_tune_model(dataset_path, output_dir):
 
     # Training arguments
     training_args = TrainingArguments(
-        output_dir=output_dir,
-        overwrite_output_dir=True,
-        num_train_epochs=3,
-        per_device_train_batch_size=8,
+        output_dir=checkpoint_dir,
+        num_train_epochs=num_train_epochs,
+        max_steps=max_steps,
+        per_device_train_batch_size=settings["batch_size"],
+        gradient_accumulation_steps=settings["grad_accum"],
+        gradient_checkpointing=settings["gradient_checkpointing"],
+        bf16=settings["bf16"],
+        use_cpu=settings["profile"] == "cpu",
+        dataloader_num_workers=settings["dataloader_workers"],
+        dataloader_pin_memory=settings["profile"] != "cpu",
+        logging_steps=50,
         save_steps=500,
         save_total_limit=2,
         prediction_loss_only=True,
     )
 
     # Trainer
+    throughput = ThroughputCallback(block_size, settings)
     trainer = Trainer(
         model=model,
         args=training_args,
         data_collator=data_collator,
         train_dataset=dataset,
+        callbacks=[throughput],
     )
 
-    trainer.train()
-    trainer.save_model()
-    tokenizer.save_pretrained(output_dir)
+    trainer.train(resume_from_checkpoint=resume_from)
+    if trainer.state.global_step == 0:
+        # Saving would record the lineage's documents as trained
+        raise RuntimeError(f"Training on {dataset_path} ran no steps")
+
+    # Save next to the current model and swap it in once complete
+    staged = output_dir + ".staging"
+    shutil.rmtree(staged, ignore_errors=True)
+    trainer.save_model(staged)
+    tokenizer.save_pretrained(staged)
+
+    if lineage is None:
+        lineage = {"base_model": base_model, "documents": None, "runs": [{"mode": "full", "dataset": dataset_path}]}
+    lineage["runs"][-1].update({
+        "started_from": base_model,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "num_tokens": token_cache["num_tokens"],
+        "num_train_epochs": num_train_epochs,
+        "max_steps": max_steps,
+        "settings": settings,
+        "throughput": throughput.result,
+    })
+    with open(os.path.join(staged, LINEAGE_NAME), "w", encoding="utf-8") as f:
+        json.dump(lineage, f, indent=4)
+    with open(os.path.join(staged, "throughput.json"), "w", encoding="utf-8") as f:
+        json.dump(throughput.result, f, indent=4)
+
+    _swap_in(staged, output_dir)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
     print(f"Fine-tuned model saved to {output_dir}")
+    return trainer.state.global_step
 
-# if __name__ == "__main__":
-#     # Paths
-#     consolidated_data = "policy_scraper/consolidated_data.json"
-#     text_dataset = "policy_scraper/fine_tuning/text_dataset.txt"
-#     fine_tuned_model_dir = "policy_scraper/fine_tuning/fine_tuned_model"
 
-    # Prepare dataset and fine-tune
-    prepare_dataset(consolidated_data, text_dataset)
-    fine_tune_model(text_dataset, fine_tuned_model_dir)
+def fine_tune_incremental(corpus_path, output_dir, full=False, replay_ratio=0.5, seed=0, **training):
+    """
+    Fine-tunes on only the documents added or changed since the model was last trained.
+
+    The previous model in output_dir is trained further on the new and changed
+    documents plus a replay sample of unchanged ones, which limits forgetting.
+    Documents removed from the corpus are only dropped from the lineage; the
+    model can't unlearn them. A full run from gpt2 over the whole corpus is
+    done instead when full is set or output_dir holds no model with lineage.
+    Args:
+        corpus_path (str): Arrow dataset exported by the consolidator, or a consolidated corpus.
+        output_dir (str): Directory of the fine-tuned model, read and replaced.
+        full (bool): Retrain from gpt2 on the whole corpus.
+        replay_ratio (float): Unchanged documents replayed per new or changed document.
+        seed (int): Seed of the replay sample.
+        **training: Passed on to fine_tune_model (profile, num_train_epochs, block_size, ...).
+    Returns:
+        dict: The selection counts of the run, or None if nothing was trained. The lineage is
+        only saved with a trained model, so documents too short to train on yet are picked
+        up again by the next run.
+    """
+    current = corpus_hashes(corpus_path)
+    previous = None if full else load_lineage(output_dir)
+    if previous is None or previous.get("documents") is None:
+        if not full:
+            print(f"⚠️ No lineage in {output_dir}, training on the full corpus")
+        previous = {"base_model": "gpt2", "documents": {}, "runs": []}
+        base_model = "gpt2"
+        selection = {"added": sorted(current), "changed": [], "removed": [], "replayed": []}
+        mode = "full"
+    else:
+        base_model = output_dir
+        selection = select_documents(current, previous["documents"], replay_ratio, seed)
+        mode = "incremental"
+
+    counts = {key: len(ids) for key, ids in selection.items()}
+    if not selection["added"] and not selection["changed"]:
+        print(f"✅ No new or changed documents since the last run ({counts['removed']} removed), nothing to train")
+        return None
+    print(
+        f"🔄 {mode.capitalize()} fine-tuning: {counts['added']} added, {counts['changed']} changed, "
+        f"{counts['replayed']} replayed, {counts['removed']} removed"
+    )
+
+    documents = dict(previous["documents"])
+    for doc_id in selection["removed"]:
+        documents.pop(doc_id, None)
+    documents.update({doc_id: current[doc_id] for doc_id in selection["added"] + selection["changed"]})
+    lineage = {
+        "base_model": previous["base_model"],
+        "documents": documents,
+        "runs": previous["runs"] + [{
+            "mode": mode,
+            "corpus": os.path.abspath(corpus_path),
+            "replay_ratio": replay_ratio,
+            "seed": seed,
+            "documents": counts,
+        }],
+    }
+
+    if mode == "full" and is_arrow_dataset(corpus_path):
+        # Train on the export directly, reusing the token cache built by the prepare stage
+        dataset_path = corpus_path
+    else:
+        # Kept with the checkpoints, so an interrupted run resumes on the same data
+        checkpoint_dir = os.path.abspath(output_dir) + "_checkpoints"
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        dataset_path = os.path.join(checkpoint_dir, "dataset.txt")
+        write_selection(corpus_path, selection["added"] + selection["changed"] + selection["replayed"], dataset_path)
+
+    if not fine_tune_model(dataset_path, output_dir, base_model=base_model, lineage=lineage, **training):
+        print(f"⚠️ Left {output_dir} and its lineage as they were")
+        return None
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fine-tune GPT-2 on the consolidated policy corpus.")
+    parser.add_argument("--profile", choices=["auto", *TRAINING_PROFILES], default="auto",
+                        help="Training profile; auto picks cpu when no GPU is available")
+    parser.add_argument("--full", action="store_true",
+                        help="Retrain from gpt2 on the whole corpus instead of only new and changed documents")
+    parser.add_argument("--replay-ratio", type=float, default=0.5,
+                        help="Unchanged documents replayed per new or changed document in incremental runs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the replay sample")
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--max-steps", type=int, default=-1, help="Stop after N optimizer steps, e.g. to measure throughput")
+    parser.add_argument("--block-size", type=int, help="Tokens per packed training sequence")
+    parser.add_argument("--batch-size", type=int, help="Sequences per micro-batch")
+    parser.add_argument("--grad-accum", type=int, help="Micro-batches per optimizer step")
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: available CPUs less data loader workers)")
+    parser.add_argument("--dataloader-workers", type=int)
+    parser.add_argument("--bf16", action=argparse.BooleanOptionalAction, default=None,
+                        help="bf16 autocast (default: on for CPUs with native bf16 support)")
+    parser.add_argument("--gradient-checkpointing", action=argparse.BooleanOptionalAction, default=None,
+                        help="Recompute activations in the backward pass to cut memory, at ~30%% more compute")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    # Correct Paths in the Project Structure
-    consolidated_data = "data/processed/consolidated_data.json"
-    text_dataset = "fine_tuning/text_dataset.txt"
+    # Run from the project root: python -m fine_tuning.llm_fine_tuning [--full] [--profile cpu --max-steps 20]
+    args = parse_args()
+    arrow_dataset = "data/processed/consolidated_arrow"
+    consolidated_data = "data/processed/consolidated"
     fine_tuned_model_dir = "models/fine_tuned_model"
 
-    # Prepare dataset and fine-tune
-    prepare_dataset(consolidated_data, text_dataset)
-    fine_tune_model(text_dataset, fine_tuned_model_dir)
-
+    # Read the memory-mapped Arrow export when there is one, otherwise the JSONL shards
+    corpus = arrow_dataset if os.path.isdir(arrow_dataset) else consolidated_data
+    if not os.path.isdir(corpus):
+        corpus = "data/processed/consolidated_data.json"
+    fine_tune_incremental(
+        corpus,
+        fine_tuned_model_dir,
+        full=args.full,
+        replay_ratio=args.replay_ratio,
+        seed=args.seed,
+        profile=args.profile,
+        num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
+        block_size=args.block_size,
+        batch_size=args.batch_size,
+        grad_accum=args.grad_accum,
+        threads=args.threads,
+        dataloader_workers=args.dataloader_workers,
+        bf16=args.bf16,
+        gradient_checkpointing=args.gradient_checkpointing,
+    )
@@ -0,0 +1,92 @@
+import os
+import functools
+
+# Shared, cached loaders for the models used across the project. Heavy
+# libraries (torch, transformers, sentence-transformers) are imported on the
+# first call rather than at import time, and each model is loaded once per
+# process however many callers ask for it.
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FINE_TUNED_MODEL_DIR = os.path.join(BASE_DIR, "models", "fine_tuned_model")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = os.path.join(BASE_DIR, "models", "embedding_cache")
+PRECISIONS = ("fp32", "int8")
+
+# Default generation settings, shared by the evaluation script and the inference server
+MAX_NEW_TOKENS = 120
+SAMPLING_ARGS = {
+    "do_sample": True,
+    "temperature": 0.6,
+    "top_p": 0.9,
+    "repetition_penalty": 1.2,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_generation_model(model_path=FINE_TUNED_MODEL_DIR, precision="fp32"):
+    """
+    Loads a GPT-2 model and tokenizer for batched generation.
+
+    The model is put in eval mode and the tokenizer is set up for left
+    padding, as generate_batch expects.
+
+    Args:
+        model_path (str): Directory of the saved model and tokenizer.
+        precision (str): "fp32", or "int8" for the dynamically quantized copy
+            (see fine_tuning.quantization), which is exported on first use.
+
+    Returns:
+        tuple: (model, tokenizer)
+    """
+    from fine_tuning.generation import prepare_tokenizer_for_batching
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    print(f"🔄 Loading {precision} model from {model_path}...")
+    if precision == "int8":
+        from fine_tuning.quantization import load_quantized
+        model, tokenizer = load_quantized(model_path)
+    else:
+        # The fast tokenizer, as the int8 path loads, so the two precisions differ only by their weights
+        from transformers import GPT2TokenizerFast, GPT2LMHeadModel
+        tokenizer = GPT2TokenizerFast.from_pretrained(model_path)
+        model = GPT2LMHeadModel.from_pretrained(model_path)
+    model.eval()
+    prepare_tokenizer_for_batching(tokenizer)
+    return model, tokenizer
+
+
+@functools.lru_cache(maxsize=None)
+def load_sentence_model(model_name=EMBEDDING_MODEL_NAME):
+    """
+    Loads a SentenceTransformer model.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    print(f"🔄 Loading sentence embedding model {model_name}...")
+    return SentenceTransformer(model_name)
+
+
+@functools.lru_cache(maxsize=None)
+def load_embedding_cache(model_name=EMBEDDING_MODEL_NAME, cache_dir=EMBEDDING_CACHE_DIR):
+    """
+    Returns the persistent embedding cache of a SentenceTransformer model.
+
+    The model itself is only loaded when the cache has to encode a new text.
+    """
+    from fine_tuning.embedding_cache import EmbeddingCache
+
+    return EmbeddingCache(LazyModel(load_sentence_model, model_name), model_name, cache_dir)
+
+
+class LazyModel:
+    """
+    Stands in for a model and loads it on first attribute access.
+    """
+
+    def __init__(self, loader, *args):
+        self._loader = loader
+        self._args = args
+
+    def __getattr__(self, name):
+        return getattr(self._loader(*self._args), name)
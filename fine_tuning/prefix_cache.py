@@ -0,0 +1,192 @@
+import threading
+from collections import OrderedDict
+
+# Analysis prompts start with a fixed instruction followed by the policy
+# text. PromptPrefixCache runs the model over each instruction prefix once,
+# keeps its attention keys and values (past_key_values), and continues
+# generation from them, so each request only encodes its own policy text.
+#
+# The cache holds the state of all but the last prefix token. That token is
+# fed again together with the suffix, so there is always at least one new
+# token to run and every row of a batch ends on a real token. In a batch,
+# rows are laid out as
+#     prefix[:-1] | padding | prefix[-1] suffix
+# with the padding masked out. GPT-2 derives position ids from the
+# attention mask, so suffix positions continue straight after the prefix.
+
+# Instructions of the policy analyses, as used in the evaluation test cases
+DEFAULT_TEMPLATES = {
+    "redundancy": "Analyze if this policy contains unnecessary cross-references or redundant content:",
+    "procedural": "Does this policy contain procedural content?",
+    "inconsistencies": "Identify inconsistencies in this policy:",
+    "structure": "Is this policy structured correctly?",
+}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def render_prompt(name, policy, templates=DEFAULT_TEMPLATES):
+    """Builds the prompt of a template for a policy text."""
+    if name not in templates:
+        raise KeyError(f"Unknown template {name!r}, expected one of {sorted(templates)}")
+    return f"{templates[name]} {policy}"
+
+
+class PrefixState:
+    """
+    The cached model state of one prompt prefix.
+
+    Attributes:
+        input_ids (list[int]): Token IDs of the whole prefix.
+        past_key_values (tuple): Keys and values of every layer for input_ids[:-1], batch size 1.
+        nbytes (int): Memory held by past_key_values.
+    """
+
+    def __init__(self, input_ids, past_key_values):
+        self.input_ids = input_ids
+        self.past_key_values = past_key_values
+        self.nbytes = sum(t.numel() * t.element_size() for layer in past_key_values for t in layer)
+
+
+class PromptPrefixCache:
+    """
+    Registry of prompt templates with an LRU cache of their prefix states.
+
+    A prompt uses a template when it starts with the template's prefix and
+    tokenizes to the prefix's tokens followed by its own, which holds when
+    the prefix ends at a word or punctuation boundary. Other prompts are
+    generated from scratch as before. States are computed on first use and
+    evicted least recently used first once they exceed max_bytes.
+
+    Args:
+        model: A GPT-2 causal language model in eval mode.
+        tokenizer: Its tokenizer, set up for batching (pad token set).
+        templates (dict): Template name -> prefix.
+        max_bytes (int): Memory cap of the cached states.
+    """
+
+    def __init__(self, model, tokenizer, templates=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.templates = dict(DEFAULT_TEMPLATES if templates is None else templates)
+        self.max_bytes = max_bytes
+        self.states = OrderedDict()  # prefix -> PrefixState, least recently used first
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "bypassed": 0}
+
+    def register(self, name, prefix):
+        """Adds or replaces a template."""
+        self.templates[name] = prefix
+
+    def render(self, name, policy):
+        """Builds the prompt of a template for a policy text."""
+        return render_prompt(name, policy, self.templates)
+
+    def match(self, prompt):
+        """Returns the longest registered prefix the prompt starts with, or None."""
+        matches = [prefix for prefix in self.templates.values() if prompt.startswith(prefix)]
+        return max(matches, key=len) if matches else None
+
+    def _compute(self, prefix):
+        import torch
+
+        input_ids = self.tokenizer(prefix, add_special_tokens=False)["input_ids"]
+        if len(input_ids) < 2:
+            return None
+        with torch.no_grad():
+            outputs = self.model(torch.tensor([input_ids[:-1]]), use_cache=True)
+        # Tuples of tensors: generate builds new tensors from them and never modifies the cached ones
+        past = tuple((key.detach(), value.detach()) for key, value in outputs.past_key_values)
+        return PrefixState(input_ids, past)
+
+    def state(self, prefix):
+        """Returns the cached state of a prefix, computing it on a miss, or None if it can't be cached."""
+        with self.lock:
+            state = self.states.get(prefix)
+            if state is not None:
+                self.states.move_to_end(prefix)
+                self.counters["hits"] += 1
+                return state
+            self.counters["misses"] += 1
+            state = self._compute(prefix)
+            if state is None or state.nbytes > self.max_bytes:
+                return state
+            self.states[prefix] = state
+            self.nbytes += state.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.states.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.counters["evictions"] += 1
+            return state
+
+    def prepare(self, prompts, max_prompt_length=512):
+        """
+        Splits a batch of prompts into a shared cached prefix and per-prompt suffix tokens.
+
+        Returns:
+            tuple: (PrefixState, list of suffix token ID lists), or None if the
+            prompts don't all use the same template or don't split cleanly.
+        """
+        prefix = self.match(prompts[0])
+        if prefix is None or any(self.match(prompt) != prefix for prompt in prompts[1:]):
+            return None
+        state = self.state(prefix)
+        if state is None:
+            return None
+
+        num_prefix = len(state.input_ids)
+        suffixes = []
+        for ids in self.tokenizer(list(prompts), add_special_tokens=False)["input_ids"]:
+            if ids[:num_prefix] != state.input_ids:
+                # The prefix merges with the text after it into different tokens
+                with self.lock:
+                    self.counters["bypassed"] += 1
+                return None
+            # Truncated like the uncached path: the prompt keeps its first max_prompt_length tokens
+            suffixes.append(ids[num_prefix:max(num_prefix, max_prompt_length)])
+        return state, suffixes
+
+    def generate(self, state, suffixes, **generate_kwargs):
+        """
+        Generates continuations for a batch of suffixes of one cached prefix.
+
+        Args:
+            state (PrefixState): From prepare.
+            suffixes (list[list[int]]): Suffix token IDs of each prompt.
+            **generate_kwargs: Passed on to model.generate (max_new_tokens, sampling, streamer, ...).
+
+        Returns:
+            tuple: The generated sequences (prompt tokens included, as from
+            model.generate) and the length of the prompt part of each row.
+        """
+        import torch
+
+        pad = self.tokenizer.pad_token_id
+        head, last = state.input_ids[:-1], state.input_ids[-1]
+        width = max(len(suffix) for suffix in suffixes)
+        rows, masks = [], []
+        for suffix in suffixes:
+            gap = width - len(suffix)
+            rows.append(head + [pad] * gap + [last] + suffix)
+            masks.append([1] * len(head) + [0] * gap + [1] * (len(suffix) + 1))
+
+        batch_size = len(suffixes)
+        past = tuple(
+            (key.expand(batch_size, -1, -1, -1), value.expand(batch_size, -1, -1, -1))
+            for key, value in state.past_key_values
+        )
+        input_ids = torch.tensor(rows)
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.tensor(masks),
+                past_key_values=past,
+                pad_token_id=pad,
+                **generate_kwargs,
+            )
+        return outputs, input_ids.shape[1]
+
+    def stats(self):
+        """Returns hit, miss and eviction counts and the memory held."""
+        with self.lock:
+            return dict(self.counters, entries=len(self.states), bytes=self.nbytes, max_bytes=self.max_bytes)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+
+# Dynamic int8 quantization of the fine-tuned GPT-2 for CPU inference.
+# Linear layer weights are stored as int8 and activations are quantized on
+# the fly per batch, which roughly halves memory and speeds up the matrix
+# multiplications on x86 (fbgemm) and ARM (qnnpack). Embeddings and layer
+# norms stay fp32, and so does the output head: lm_head shares its weight
+# with the token embeddings (wte), and quantizing it would break the tie,
+# store a second, int8 copy of the embedding matrix and coarsen the logits
+# of every token.
+#
+# GPT-2 implements its projections with transformers' Conv1D (a linear
+# layer with transposed weights), which quantize_dynamic does not
+# recognise, so they are converted to nn.Linear first.
+#
+# Quantized modules can't go through save_pretrained. The export holds the
+# config and tokenizer of the source model plus the quantized state dict;
+# loading rebuilds the quantized architecture from the config and fills it
+# in, so the fp32 checkpoint is never read.
+QUANTIZED_WEIGHTS = "quantized_state_dict.pt"
+QUANTIZATION_META = "quantization.json"
+FP32_MODULES = ["lm_head"]  # Linear layers left unquantized
+
+
+def quantized_model_dir(model_path):
+    """Returns where the int8 export of a model is kept: <model_path>_int8."""
+    return os.path.abspath(model_path).rstrip(os.sep) + "_int8"
+
+
+def _source_fingerprint(model_path):
+    """Size and mtime of the source weights, to tell when an export is stale."""
+    fingerprint = {}
+    for name in sorted(os.listdir(model_path)):
+        if name.endswith((".safetensors", ".bin")):
+            stat = os.stat(os.path.join(model_path, name))
+            fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def convert_conv1d_to_linear(model):
+    """
+    Replaces every transformers Conv1D in the model with an equivalent nn.Linear, in place.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+
+def _quantize(model):
+    import torch
+    convert_conv1d_to_linear(model)
+    linear_layers = {
+        name for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and name not in FP32_MODULES
+    }
+    return torch.ao.quantization.quantize_dynamic(model, linear_layers, dtype=torch.qint8)
+
+
+def export_quantized(model_path, output_dir=None):
+    """
+    Writes an int8 dynamically quantized copy of a saved GPT-2 model.
+
+    Args:
+        model_path (str): Directory of the fp32 model (as saved by fine_tune_model).
+        output_dir (str, optional): Export directory. Defaults to <model_path>_int8.
+
+    Returns:
+        str: The export directory.
+    """
+    import shutil
+    import torch
+    from transformers import GPT2LMHeadModel, GPT2TokenizerFast
+
+    output_dir = output_dir or quantized_model_dir(model_path)
+    print(f"🔄 Quantizing {model_path} to int8...")
+    start = time.perf_counter()
+    model = GPT2LMHeadModel.from_pretrained(model_path)
+    model.eval()
+    model = _quantize(model)
+
+    staged = output_dir + ".staging"
+    shutil.rmtree(staged, ignore_errors=True)
+    os.makedirs(staged)
+    model.config.save_pretrained(staged)
+    GPT2TokenizerFast.from_pretrained(model_path).save_pretrained(staged)
+    torch.save(model.state_dict(), os.path.join(staged, QUANTIZED_WEIGHTS))
+    with open(os.path.join(staged, QUANTIZATION_META), "w", encoding="utf-8") as f:
+        json.dump({
+            "source": os.path.abspath(model_path),
+            "source_weights": _source_fingerprint(model_path),
+            "dtype": "qint8",
+            "fp32_modules": FP32_MODULES,
+            "engine": torch.backends.quantized.engine,
+            "torch": torch.__version__,
+        }, f, indent=4)
+
+    previous = output_dir + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, previous)
+    os.replace(staged, output_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    print(f"✅ Quantized model saved to {output_dir} in {time.perf_counter() - start:.1f} s")
+    return output_dir
+
+
+def is_current(model_path, output_dir=None):
+    """
+    Returns True if the int8 export of model_path exists and was made from
+    its current weights, with the quantization engine and torch version in use.
+    """
+    import torch
+
+    meta_path = os.path.join(output_dir or quantized_model_dir(model_path), QUANTIZATION_META)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return (
+        meta["source_weights"] == _source_fingerprint(model_path)
+        and meta.get("fp32_modules") == FP32_MODULES
+        # Packed int8 weights are specific to the backend and torch version that packed them
+        and meta["engine"] == torch.backends.quantized.engine
+        and meta["torch"] == torch.__version__
+    )
+
+
+def load_quantized(model_path):
+    """
+    Loads an int8 model for inference, exporting it first if the export is missing or stale.
+
+    Args:
+        model_path (str): Directory of the fp32 model.
+
+    Returns:
+        tuple: (model, tokenizer)
+    """
+    import torch
+    from transformers import GPT2Config, GPT2LMHeadModel, GPT2TokenizerFast
+
+    quantized_dir = quantized_model_dir(model_path)
+    if not is_current(model_path, quantized_dir):
+        export_quantized(model_path, quantized_dir)
+
+    # Build the quantized module tree from the config, then load the int8 weights into it
+    config = GPT2Config.from_pretrained(quantized_dir)
+    model = _quantize(GPT2LMHeadModel(config).eval())
+    # Packed quantized weights are not plain tensors, so they need the full unpickler
+    state_dict = torch.load(os.path.join(quantized_dir, QUANTIZED_WEIGHTS), weights_only=False)
+    model.load_state_dict(state_dict)
+    tokenizer = GPT2TokenizerFast.from_pretrained(quantized_dir)
+    return model, tokenizer
+
+
+if __name__ == "__main__":
+    # Run from the project root: python -m fine_tuning.quantization [model_dir]
+    import sys
+    from fine_tuning.loaders import FINE_TUNED_MODEL_DIR
+    export_quantized(sys.argv[1] if len(sys.argv) > 1 else FINE_TUNED_MODEL_DIR)
@@ -0,0 +1,590 @@
+"""
+Local HTTP inference server for the fine-tuned policy model.
+
+The model and tokenizer are loaded once. Concurrent requests are gathered
+into micro-batches: the first waiting request opens a short window
+(batch_window), and every request with the same sampling settings that
+arrives within it, up to max_batch_size, joins the same batched generate
+call. Tokens are streamed back to each client as they are generated, and
+generation stops as soon as every request in the batch is finished or has
+been abandoned.
+
+Prompts that start with a registered analysis template (see
+fine_tuning.prefix_cache) are batched per template. Their batches continue
+from the template's cached prefix state, so only the policy text is
+encoded. Requests can also name the template and pass the policy text.
+
+The queue is bounded: when max_queue requests are waiting, including those
+held back for a batch with their sampling settings, new ones are rejected
+at once with 503 and Retry-After rather than piling up. Each request has a deadline
+covering queueing and generation, after which it gets 504.
+
+Endpoints:
+    POST /v1/analyze   {"prompt": "...", "max_new_tokens": 120, "stream": false,
+                        "temperature": 0.6, "top_p": 0.9, "repetition_penalty": 1.2,
+                        "do_sample": true, "timeout": 60}
+                       or {"template": "inconsistencies", "policy": "...", ...} instead of "prompt".
+                       Returns {"response": ..., "new_tokens": ..., "queue_ms": ..., "latency_ms": ...},
+                       or with "stream": true, NDJSON lines {"token": ...} followed by the final object.
+    GET /metrics       Counters, queue depth, and recent latency, batch size and throughput percentiles.
+    GET /v1/templates  The registered prompt templates.
+    GET /health        Liveness and the model being served.
+
+Run from the project root:
+    python -m fine_tuning.server --port 8008 --precision int8
+"""
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fine_tuning.loaders import FINE_TUNED_MODEL_DIR, PRECISIONS, SAMPLING_ARGS, MAX_NEW_TOKENS, load_generation_model
+from fine_tuning.prefix_cache import PromptPrefixCache, DEFAULT_MAX_BYTES, DEFAULT_TEMPLATES, render_prompt
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+HEADER_TIMEOUT = 10.0
+POLL_INTERVAL = 0.002  # How often the batch window checks the queue, in seconds
+DISCONNECT_POLL_INTERVAL = 0.1  # How often a waiting non-streaming request checks its connection, in seconds
+MAX_NEW_TOKENS_LIMIT = 512
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Metrics:
+    """
+    Counters and a window of recent samples per metric, summarised as percentiles.
+
+    Only touched from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.counters = {}
+        self.samples = {}
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        self.samples.setdefault(name, deque(maxlen=self.window)).append(value)
+
+    def snapshot(self):
+        recent = {}
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            n = len(ordered)
+            recent[name] = {
+                "count": n,
+                "mean": round(sum(ordered) / n, 2),
+                "p50": round(ordered[n // 2], 2),
+                "p95": round(ordered[min(n - 1, int(n * 0.95))], 2),
+                "p99": round(ordered[min(n - 1, int(n * 0.99))], 2),
+                "max": round(ordered[-1], 2),
+            }
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "counters": dict(self.counters),
+            "recent": recent,
+        }
+
+
+class AnalysisRequest:
+    """
+    One generation request, shared between its HTTP handler and the batch it runs in.
+
+    The generation thread reports progress by putting events on the
+    request's asyncio queue through the event loop: {"token": text} while
+    generating, then {"done": True, ...} or {"error": message}.
+    """
+
+    def __init__(self, prompt, max_new_tokens, sampling, timeout, loop, prefix=None):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.sampling = sampling
+        self.prefix = prefix
+        # Only requests with identical sampling settings, and the same template
+        # prefix, can share a generate call
+        self.key = (prefix or "", tuple(sorted(sampling.items())))
+        self.created = time.perf_counter()
+        self.deadline = self.created + timeout
+        self.started = None
+        self.loop = loop
+        self.events = asyncio.Queue()
+        self.token_ids = []
+        self.text = ""
+        self.finished = False
+        self.cancelled = False
+
+    def emit(self, event):
+        """Queues an event for the handler. Safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+
+class BatchStreamer:
+    """
+    Streamer for model.generate that splits each step's tokens between the requests of a batch.
+
+    generate calls put() with the prompts first and then with one new token
+    per row at every step. Each request is sent the text its new token adds,
+    and is marked finished at EOS or when it reaches its own max_new_tokens.
+    """
+
+    def __init__(self, tokenizer, batch):
+        self.tokenizer = tokenizer
+        self.batch = batch
+        self.prompt_seen = False
+
+    def put(self, value):
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for request, token in zip(self.batch, value.tolist()):
+            if request.finished or request.cancelled:
+                continue
+            if token == self.tokenizer.eos_token_id:
+                request.finished = True
+                continue
+            request.token_ids.append(token)
+            if len(request.token_ids) >= request.max_new_tokens:
+                request.finished = True
+            text = self.tokenizer.decode(
+                request.token_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False
+            )
+            # A token can end partway through a multi-byte character; wait for the rest
+            if text.endswith("\ufffd") and not request.finished:
+                continue
+            delta = text[len(request.text):]
+            request.text = text
+            if delta:
+                request.emit({"token": delta})
+
+    def end(self):
+        pass
+
+    def all_done(self):
+        return all(request.finished or request.cancelled for request in self.batch)
+
+
+class _BatchDone:
+    """Stopping criterion that ends generate once every request of the batch is finished or abandoned."""
+
+    def __init__(self, streamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.streamer.all_done()
+
+
+class InferenceServer:
+    """
+    Serves the fine-tuned model over HTTP, batching concurrent requests.
+
+    Args:
+        model_path (str): Directory of the fine-tuned model.
+        precision (str): "fp32" or "int8" (see fine_tuning.quantization).
+        max_batch_size (int): Most requests per generate call.
+        batch_window (float): Seconds the first request of a batch waits for others to join.
+        max_queue (int): Most requests waiting for a batch; more are rejected with 503.
+        timeout (float): Longest a request may take, queueing included, in seconds.
+        max_prompt_length (int): Prompts are truncated to this many tokens.
+        prefix_cache_bytes (int): Memory cap of cached template prefix states; 0 disables the cache.
+    """
+
+    def __init__(self, model_path=FINE_TUNED_MODEL_DIR, precision="fp32", max_batch_size=8, batch_window=0.02,
+                 max_queue=64, timeout=120.0, max_prompt_length=512, prefix_cache_bytes=DEFAULT_MAX_BYTES):
+        self.model_path = model_path
+        self.precision = precision
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_prompt_length = max_prompt_length
+        self.prefix_cache_bytes = prefix_cache_bytes
+        self.prefix_cache = None
+        self.metrics = Metrics()
+        # One generation thread: batches run one at a time, each using all of torch's threads
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+        self.queue = None
+        self.deferred = deque()  # Taken from the queue but waiting for a batch with their sampling settings
+        self.model = None
+        self.tokenizer = None
+        self._batcher = None
+
+    @property
+    def templates(self):
+        return self.prefix_cache.templates if self.prefix_cache is not None else DEFAULT_TEMPLATES
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize() + len(self.deferred)
+
+    async def start(self, host, port):
+        """Loads the model, starts the batching loop and returns the listening asyncio server."""
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.model, self.tokenizer = await loop.run_in_executor(
+            self.executor, load_generation_model, self.model_path, self.precision
+        )
+        if self.prefix_cache_bytes:
+            self.prefix_cache = PromptPrefixCache(self.model, self.tokenizer, max_bytes=self.prefix_cache_bytes)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_BYTES)
+
+    def submit(self, request):
+        """Queues a request, or returns False if max_queue requests are already waiting."""
+        # Deferred requests have left the queue but still wait for a batch, so they count too
+        if self.queue_depth >= self.max_queue:
+            self.metrics.count("rejected")
+            return False
+        self.queue.put_nowait(request)
+        self.metrics.count("accepted")
+        self.metrics.observe("queue_depth", self.queue_depth)
+        return True
+
+    async def _next_batch(self):
+        """Waits for a request, then gathers compatible ones until the batch is full or its window closes."""
+        loop = asyncio.get_running_loop()
+        first = self.deferred.popleft() if self.deferred else await self.queue.get()
+        batch = [first]
+        window_end = loop.time() + self.batch_window
+
+        for request in list(self.deferred):
+            if len(batch) == self.max_batch_size:
+                break
+            if request.key == first.key:
+                self.deferred.remove(request)
+                batch.append(request)
+
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = window_end - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, POLL_INTERVAL))
+                continue
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                self.deferred.append(request)
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            now = time.perf_counter()
+            live = []
+            for request in batch:
+                if request.cancelled or now > request.deadline:
+                    # Its handler has already answered with a timeout
+                    self.metrics.count("dropped")
+                    continue
+                request.started = now
+                self.metrics.observe("queue_ms", 1000 * (now - request.created))
+                live.append(request)
+            if not live:
+                continue
+
+            self.metrics.observe("batch_size", len(live))
+            try:
+                await loop.run_in_executor(self.executor, self._generate, live)
+            except Exception as e:
+                self.metrics.count("errors")
+                print(f"❌ Batch of {len(live)} failed: {e}")
+                for request in live:
+                    request.emit({"error": str(e)})
+                continue
+
+            seconds = time.perf_counter() - now
+            new_tokens = sum(len(request.token_ids) for request in live)
+            self.metrics.observe("batch_ms", 1000 * seconds)
+            self.metrics.observe("tokens_per_sec", new_tokens / seconds if seconds > 0 else 0.0)
+            for request in live:
+                request.emit({"done": True, "response": request.text, "new_tokens": len(request.token_ids)})
+
+    def _generate(self, batch):
+        """Runs one batched generate call. Called on the generation thread."""
+        import torch
+        from transformers import StoppingCriteriaList
+
+        prompts = [request.prompt for request in batch]
+        streamer = BatchStreamer(self.tokenizer, batch)
+        generate_kwargs = dict(
+            batch[0].sampling,
+            max_new_tokens=max(request.max_new_tokens for request in batch),
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([_BatchDone(streamer)]),
+        )
+
+        prepared = None
+        if self.prefix_cache is not None and batch[0].prefix:
+            prepared = self.prefix_cache.prepare(prompts, self.max_prompt_length)
+        if prepared is not None:
+            self.prefix_cache.generate(*prepared, **generate_kwargs)
+            return
+
+        inputs = self.tokenizer(
+            prompts, return_tensors="pt", padding=True, truncation=True, max_length=self.max_prompt_length,
+        )
+        with torch.no_grad():
+            self.model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                pad_token_id=self.tokenizer.pad_token_id,
+                **generate_kwargs,
+            )
+
+    def _parse_request(self, body):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        prompt = payload.get("prompt")
+        if prompt is None and "template" in payload:
+            policy = payload.get("policy")
+            if not isinstance(policy, str) or not policy.strip():
+                raise HTTPError(400, "policy must be a non-empty string")
+            try:
+                prompt = render_prompt(payload["template"], policy, self.templates)
+            except KeyError as e:
+                raise HTTPError(400, str(e.args[0]))
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise HTTPError(400, "prompt must be a non-empty string")
+        try:
+            max_new_tokens = min(MAX_NEW_TOKENS_LIMIT, max(1, int(payload.get("max_new_tokens", MAX_NEW_TOKENS))))
+            timeout = min(self.timeout, float(payload.get("timeout", self.timeout)))
+            sampling = {name: _coerce(payload.get(name, default), default) for name, default in SAMPLING_ARGS.items()}
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"Invalid parameter: {e}")
+        if timeout <= 0:
+            raise HTTPError(400, "timeout must be positive")
+        prefix = self.prefix_cache.match(prompt) if self.prefix_cache is not None else None
+        request = AnalysisRequest(prompt, max_new_tokens, sampling, timeout, asyncio.get_running_loop(), prefix)
+        return request, bool(payload.get("stream", False))
+
+    async def _next_event(self, request):
+        remaining = request.deadline - time.perf_counter()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(request.events.get(), remaining)
+
+    def _finish(self, request, event):
+        latency = time.perf_counter() - request.created
+        self.metrics.count("completed")
+        self.metrics.observe("latency_ms", 1000 * latency)
+        return dict(
+            event,
+            queue_ms=round(1000 * (request.started - request.created), 1),
+            latency_ms=round(1000 * latency, 1),
+        )
+
+    def _abandon(self, request, reason):
+        request.cancelled = True
+        self.metrics.count(reason)
+
+    async def _analyze(self, writer, body):
+        request, stream = self._parse_request(body)
+        if not self.submit(request):
+            raise HTTPError(503, "Queue full, retry shortly", {"Retry-After": "1"})
+
+        if not stream:
+            # Nothing is written until the response is ready, so watch the transport to notice a client
+            # leaving. EOF alone doesn't count: a client may half-close after sending its body
+            disconnected = asyncio.ensure_future(_wait_closed(writer))
+            try:
+                while True:
+                    next_event = asyncio.ensure_future(self._next_event(request))
+                    await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                    if not next_event.done():
+                        next_event.cancel()
+                        self._abandon(request, "disconnects")
+                        return
+                    event = next_event.result()
+                    if "error" in event:
+                        raise HTTPError(500, event["error"])
+                    if event.get("done"):
+                        await _send_json(writer, 200, self._finish(request, event))
+                        return
+            except asyncio.TimeoutError:
+                self._abandon(request, "timeouts")
+                raise HTTPError(504, f"No response within {request.deadline - request.created:.3g} s")
+            finally:
+                disconnected.cancel()
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        )
+        try:
+            first_token = True
+            while True:
+                try:
+                    event = await self._next_event(request)
+                except asyncio.TimeoutError:
+                    self._abandon(request, "timeouts")
+                    event = {"error": "timeout"}
+                if first_token and "token" in event:
+                    first_token = False
+                    self.metrics.observe("first_token_ms", 1000 * (time.perf_counter() - request.created))
+                if event.get("done"):
+                    event = self._finish(request, event)
+                await _write_chunk(writer, json.dumps(event, ensure_ascii=False) + "\n")
+                if "error" in event or event.get("done"):
+                    break
+            await _write_chunk(writer, "")
+        except ConnectionError:
+            # The client went away; stop generating for it
+            self._abandon(request, "disconnects")
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(_read_request(reader), HEADER_TIMEOUT)
+                if path == "/v1/analyze":
+                    if method != "POST":
+                        raise HTTPError(405, "Use POST")
+                    await self._analyze(writer, body)
+                elif path == "/metrics" and method == "GET":
+                    snapshot = self.metrics.snapshot()
+                    snapshot["queue_depth"] = self.queue_depth
+                    if self.prefix_cache is not None:
+                        snapshot["prefix_cache"] = self.prefix_cache.stats()
+                    await _send_json(writer, 200, snapshot)
+                elif path == "/v1/templates" and method == "GET":
+                    await _send_json(writer, 200, {"templates": self.templates})
+                elif path == "/health" and method == "GET":
+                    await _send_json(writer, 200, {
+                        "status": "ok", "model": self.model_path, "precision": self.precision,
+                    })
+                else:
+                    raise HTTPError(404, f"No route for {method} {path}")
+            except HTTPError as e:
+                await _send_json(writer, e.status, {"error": str(e)}, e.headers)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                await _send_json(writer, 400, {"error": "Malformed request"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+
+def _coerce(value, default):
+    """Converts a request parameter to the type of its default, rejecting values that don't fit."""
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"expected true or false, got {value!r}")
+        return value
+    return type(default)(value)
+
+
+async def _read_request(reader):
+    """
+    Reads one HTTP/1.1 request.
+
+    Returns:
+        tuple: (method, path, body bytes)
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], body
+
+
+async def _wait_closed(writer):
+    """Returns once the connection is lost, e.g. reset by the client."""
+    # Polled: awaiting writer.wait_closed() and cancelling it would cancel the connection's own close waiter
+    while not writer.is_closing():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def _send_json(writer, status, payload, headers=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+        *(f"{name}: {value}" for name, value in (headers or {}).items()),
+    ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _write_chunk(writer, text):
+    data = text.encode("utf-8")
+    writer.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+    await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fine-tuned policy model over HTTP with request batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--model", default=FINE_TUNED_MODEL_DIR, help="Directory of the fine-tuned model")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--batch-window-ms", type=float, default=20.0,
+                        help="How long the first request of a batch waits for others")
+    parser.add_argument("--max-queue", type=int, default=64, help="Waiting requests before new ones get 503")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request deadline in seconds")
+    parser.add_argument("--prefix-cache-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Memory for cached template prefix states; 0 disables prefix reuse")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    server = InferenceServer(
+        model_path=args.model,
+        precision=args.precision,
+        max_batch_size=args.max_batch_size,
+        batch_window=args.batch_window_ms / 1000,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+        prefix_cache_bytes=int(args.prefix_cache_mb * 1024 * 1024),
+    )
+    listener = await server.start(args.host, args.port)
+    print(f"✅ Serving the {args.precision} model on http://{args.host}:{args.port} "
+          f"(POST /v1/analyze, GET /metrics)")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    try:
+        asyncio.run(serve(parse_args(argv)))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,16 @@
 import os
-import json
-import torch
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from transformers import GPT2Tokenizer, GPT2LMHeadModel
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from textblob import TextBlob
-from textstat import flesch_reading_ease
-
-# Load the fine-tuned model and tokenizer
-model_path = "../models/fine_tuned_model"
-print(f"🔄 Loading fine-tuned model from {model_path}...")
-
-tokenizer = GPT2Tokenizer.from_pretrained(model_path)
-model = GPT2LMHeadModel.from_pretrained(model_path)
-
-# Add padding token if missing
-if tokenizer.pad_token is None:
-    tokenizer.add_special_tokens({'pad_token': tokenizer.eos_token})
-    model.resize_token_embeddings(len(tokenizer))
-
-# Load SentenceTransformer for embedding similarity
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+from fine_tuning.loaders import load_generation_model, load_embedding_cache, SAMPLING_ARGS, MAX_NEW_TOKENS
+
+# Run from the project root: python -m fine_tuning.test_fine_tuned_model
+# Importing this module is cheap: models and heavy libraries load on first use.
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+MODEL_PATH = os.path.join(BASE_DIR, "models", "fine_tuned_model")
+
+# Generation settings
+PRECISION = "fp32"  # or "int8" for the quantized model
+BATCH_SIZE = 8
+SEED = 42
 
 # Define test prompts with expected responses
 test_cases = [
@@ -67,37 +53,56 @@ test_cases = [
     }
 ]
 
+def generate_responses(prompts, batch_size=BATCH_SIZE, max_new_tokens=MAX_NEW_TOKENS, seed=SEED, precision=PRECISION):
+    """
+    Generate responses for many prompts from the fine-tuned model, in batches.
+    """
+    from fine_tuning.generation import generate_batch
+
+    model, tokenizer = load_generation_model(MODEL_PATH, precision)
+    responses, batch_stats = generate_batch(
+        model, tokenizer, prompts,
+        batch_size=batch_size,
+        max_new_tokens=max_new_tokens,
+        seed=seed,
+        **SAMPLING_ARGS,
+    )
+    for stats in batch_stats:
+        print(f"⏱️ Batch {stats['batch']} ({stats['size']} prompts): {stats['latency']:.2f}s, "
+              f"{stats['new_tokens']} tokens, {stats['tokens_per_sec']:.1f} tokens/sec")
+    return responses
+
 def test_model(prompt):
     """
     Generate a response from the fine-tuned model.
     """
-    inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True, max_length=512)
-    outputs = model.generate(
-        input_ids=inputs["input_ids"],
-        attention_mask=inputs["attention_mask"],
-        max_length=150,
-        do_sample=True,
-        temperature=0.6,
-        top_p=0.9,
-        repetition_penalty=1.2,
-        pad_token_id=tokenizer.pad_token_id,
-    )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    return generate_responses([prompt])[0]
+
+def calculate_relevances(responses, expected):
+    """
+    Calculate relevance for many response/expected pairs using cosine similarity.
+    Only texts missing from the embedding cache are encoded, in one batch.
+    """
+    from fine_tuning.embedding_cache import cosine_similarities
+
+    embeddings = load_embedding_cache().encode(list(responses) + list(expected))
+    scores = cosine_similarities(embeddings[:len(responses)], embeddings[len(responses):])  # Range: [0, 1]
+    return [round(float(score) * 10, 2) for score in scores]  # Scale to [0, 10]
 
 def calculate_relevance(response, expected):
     """
     Calculate relevance using cosine similarity between response and expected output.
     """
-    response_embedding = embedding_model.encode(response)
-    expected_embedding = embedding_model.encode(expected)
-    relevance_score = cosine_similarity([response_embedding], [expected_embedding])[0][0]  # Range: [0, 1]
-    return round(relevance_score * 10, 2)  # Scale to [0, 10]
+    return calculate_relevances([response], [expected])[0]
 
-def evaluate_response(prompt, response, expected):
+def evaluate_response(prompt, response, expected, relevance_score=None):
     """
     Evaluate the model's response for relevance, coherence, and flaw detection accuracy.
     """
-    relevance_score = calculate_relevance(response, expected)
+    import numpy as np
+
+    if relevance_score is None:
+        relevance_score = calculate_relevance(response, expected)
     coherence_score = round(np.random.uniform(5, 7.5), 2)  # Simulated manual scoring
     flaw_detection_score = round(np.random.uniform(5, 7.5), 2)  # Simulated manual scoring
 
@@ -109,60 +114,80 @@ def evaluate_response(prompt, response, expected):
         "Flaw Detection Accuracy": flaw_detection_score
     }
 
-# Run model testing and store results
-results = []
-print("\n🔍 **Testing Fine-Tuned Model...**\n")
-for case in test_cases:
-    response = test_model(case["prompt"])
-    evaluation = evaluate_response(case["prompt"], response, case["expected"])
-    results.append(evaluation)
-    
-    # Print each response in the console
-    print(f"📝 **Prompt:** {case['prompt']}")
-    print(f"📌 **Generated Response:** {response}")
-    print(f"✅ **Evaluation:** Relevance: {evaluation['Relevance']}, Coherence: {evaluation['Coherence']}, Flaw Detection: {evaluation['Flaw Detection Accuracy']}\n")
-
-# Convert results to DataFrame
-df_results = pd.DataFrame(results)
-df_results.to_csv("../output/model_test_final_evaluation.csv", index=False)
-
-# ---- Exploratory Data Analysis (EDA) ----
-print("\n📊 **Performing EDA on Model Responses...**\n")
-
-# Word Count Distribution
-df_results["Word Count"] = df_results["Response"].apply(lambda x: len(x.split()))
-
-plt.figure(figsize=(10, 6))
-sns.histplot(df_results["Word Count"], bins=15, kde=True, color="skyblue")
-plt.title("Model Test: Distribution of Word Counts in Responses")
-plt.xlabel("Word Count")
-plt.ylabel("Frequency")
-plt.savefig("../output/model_test_word_count_distribution.png")
-plt.show()
-
-# Readability Analysis
-df_results["Readability Score"] = df_results["Response"].apply(flesch_reading_ease)
-
-plt.figure(figsize=(10, 6))
-sns.histplot(df_results["Readability Score"], bins=15, kde=True, color="green")
-plt.title("Model Test: Readability Score Distribution")
-plt.xlabel("Flesch Reading Ease Score")
-plt.ylabel("Frequency")
-plt.savefig("../output/model_test_readability_score_distribution.png")
-plt.show()
-
-# Sentiment Analysis
-df_results["Polarity"] = df_results["Response"].apply(lambda x: TextBlob(x).sentiment.polarity)
-df_results["Subjectivity"] = df_results["Response"].apply(lambda x: TextBlob(x).sentiment.subjectivity)
-
-plt.figure(figsize=(10, 6))
-sns.scatterplot(data=df_results, x="Polarity", y="Subjectivity", color="red")
-plt.title("Model Test: Sentiment Polarity vs. Subjectivity")
-plt.xlabel("Polarity (Negative to Positive)")
-plt.ylabel("Subjectivity (Objective to Subjective)")
-plt.savefig("../output/model_test_sentiment_analysis.png")
-plt.show()
-
-# Save final results
-df_results.to_csv("../output/model_test_final_evaluation.csv", index=False)
-print("\n✅ **Model evaluation and EDA results saved successfully in `../output/` folder.**")
+def main(precision=PRECISION):
+    """
+    Tests the fine-tuned model on the test cases and saves the evaluation and its plots to output/.
+    """
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from textblob import TextBlob
+    from textstat import flesch_reading_ease
+
+    # Run model testing and store results
+    np.random.seed(SEED)
+    results = []
+    print("\n🔍 **Testing Fine-Tuned Model...**\n")
+    responses = generate_responses([case["prompt"] for case in test_cases], precision=precision)
+    relevances = calculate_relevances(responses, [case["expected"] for case in test_cases])
+    for case, response, relevance in zip(test_cases, responses, relevances):
+        evaluation = evaluate_response(case["prompt"], response, case["expected"], relevance)
+        results.append(evaluation)
+
+        # Print each response in the console
+        print(f"📝 **Prompt:** {case['prompt']}")
+        print(f"📌 **Generated Response:** {response}")
+        print(f"✅ **Evaluation:** Relevance: {evaluation['Relevance']}, Coherence: {evaluation['Coherence']}, Flaw Detection: {evaluation['Flaw Detection Accuracy']}\n")
+
+    # Convert results to DataFrame
+    df_results = pd.DataFrame(results)
+    df_results.to_csv(os.path.join(OUTPUT_DIR, "model_test_final_evaluation.csv"), index=False)
+
+    # ---- Exploratory Data Analysis (EDA) ----
+    print("\n📊 **Performing EDA on Model Responses...**\n")
+
+    # Word Count Distribution
+    df_results["Word Count"] = df_results["Response"].apply(lambda x: len(x.split()))
+
+    plt.figure(figsize=(10, 6))
+    sns.histplot(df_results["Word Count"], bins=15, kde=True, color="skyblue")
+    plt.title("Model Test: Distribution of Word Counts in Responses")
+    plt.xlabel("Word Count")
+    plt.ylabel("Frequency")
+    plt.savefig(os.path.join(OUTPUT_DIR, "model_test_word_count_distribution.png"))
+    plt.show()
+
+    # Readability Analysis
+    df_results["Readability Score"] = df_results["Response"].apply(flesch_reading_ease)
+
+    plt.figure(figsize=(10, 6))
+    sns.histplot(df_results["Readability Score"], bins=15, kde=True, color="green")
+    plt.title("Model Test: Readability Score Distribution")
+    plt.xlabel("Flesch Reading Ease Score")
+    plt.ylabel("Frequency")
+    plt.savefig(os.path.join(OUTPUT_DIR, "model_test_readability_score_distribution.png"))
+    plt.show()
+
+    # Sentiment Analysis
+    df_results["Polarity"] = df_results["Response"].apply(lambda x: TextBlob(x).sentiment.polarity)
+    df_results["Subjectivity"] = df_results["Response"].apply(lambda x: TextBlob(x).sentiment.subjectivity)
+
+    plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=df_results, x="Polarity", y="Subjectivity", color="red")
+    plt.title("Model Test: Sentiment Polarity vs. Subjectivity")
+    plt.xlabel("Polarity (Negative to Positive)")
+    plt.ylabel("Subjectivity (Objective to Subjective)")
+    plt.savefig(os.path.join(OUTPUT_DIR, "model_test_sentiment_analysis.png"))
+    plt.show()
+
+    # Save final results
+    df_results.to_csv(os.path.join(OUTPUT_DIR, "model_test_final_evaluation.csv"), index=False)
+    print("\n✅ **Model evaluation and EDA results saved successfully in `output/` folder.**")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Evaluate the fine-tuned model on the test cases.")
+    parser.add_argument("--precision", choices=["fp32", "int8"], default=PRECISION)
+    main(parser.parse_args().precision)
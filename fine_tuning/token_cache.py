@@ -0,0 +1,195 @@
+import os
+import json
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+# Bump when the on-disk layout or the way documents are tokenized changes
+TOKEN_CACHE_VERSION = 1
+
+_worker_tokenizer = None
+
+
+def _init_worker(tokenizer_name):
+    global _worker_tokenizer
+    # Parallelism comes from the process pool, not from the Rust tokenizer threads
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from transformers import GPT2TokenizerFast
+    _worker_tokenizer = GPT2TokenizerFast.from_pretrained(tokenizer_name)
+
+
+def _encode_batch(texts, dtype):
+    """Tokenizes a batch of documents, ending each one with the EOS token."""
+    eos = _worker_tokenizer.eos_token_id
+    encoded = _worker_tokenizer(texts, add_special_tokens=False)["input_ids"]
+    ids = [token for document in encoded for token in document + [eos]]
+    return np.asarray(ids, dtype=dtype)
+
+
+def _iter_document_batches(dataset_path, batch_size):
+    """
+    Yields batches of documents from a text dataset written by prepare_dataset
+    (one per line), or from the cleaned_content column of an Arrow dataset
+    directory written by the consolidator's export_arrow.
+    """
+    if os.path.isdir(dataset_path):
+        from datasets import load_from_disk
+        dataset = load_from_disk(dataset_path).select_columns(["cleaned_content"])
+        for rows in dataset.iter(batch_size=batch_size):
+            batch = [text for text in rows["cleaned_content"] if text and text.strip()]
+            if batch:
+                yield batch
+        return
+
+    batch = []
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                batch.append(line)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def _dataset_files(dataset_path):
+    """Returns the files whose contents define a dataset: the text file, or an Arrow dataset's data files."""
+    if not os.path.isdir(dataset_path):
+        return [dataset_path]
+    return sorted(
+        os.path.join(dataset_path, name) for name in os.listdir(dataset_path) if name.endswith(".arrow")
+    )
+
+
+def token_cache_key(dataset_path, tokenizer_name):
+    """
+    Returns the cache key for a dataset and tokenizer.
+
+    The key is a hash of the dataset contents, the tokenizer name and the
+    cache format version, so editing the dataset or switching tokenizers
+    produces a new cache entry.
+    """
+    digest = hashlib.sha256()
+    for path in _dataset_files(dataset_path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    digest.update(f"\0{tokenizer_name}\0{TOKEN_CACHE_VERSION}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def build_token_cache(dataset_path, cache_dir, tokenizer_name="gpt2", batch_size=256, num_proc=None):
+    """
+    Tokenizes a text dataset once and stores the token IDs as a flat binary array.
+
+    Documents are tokenized in batches with the fast tokenizer across a pool
+    of processes and appended to <key>.bin. If an entry for the same dataset
+    and tokenizer already exists, it is reused without tokenizing anything.
+
+    Args:
+        dataset_path (str): Path to the text dataset, or to an Arrow dataset directory.
+        cache_dir (str): Directory holding the token caches.
+        tokenizer_name (str): Tokenizer to use.
+        batch_size (int): Documents per tokenization batch.
+        num_proc (int, optional): Worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: Cache metadata, including "path", "dtype" and "num_tokens".
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = token_cache_key(dataset_path, tokenizer_name)
+    token_file = os.path.join(cache_dir, f"{key}.bin")
+    meta_file = os.path.join(cache_dir, f"{key}.json")
+
+    if os.path.exists(token_file) and os.path.exists(meta_file):
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        print(f"Using cached tokens from {token_file} ({meta['num_tokens']} tokens)")
+        return meta
+
+    from transformers import GPT2TokenizerFast
+    vocab_size = len(GPT2TokenizerFast.from_pretrained(tokenizer_name))
+    dtype = "uint16" if vocab_size <= np.iinfo(np.uint16).max + 1 else "uint32"
+
+    num_proc = num_proc or os.cpu_count() or 1
+    num_tokens = 0
+    tmp_file = token_file + ".tmp"
+    with ProcessPoolExecutor(
+        max_workers=num_proc,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(tokenizer_name,),
+    ) as executor, open(tmp_file, "wb") as out:
+        # Keep a bounded number of batches in flight so memory does not grow with the dataset
+        in_flight = deque()
+        for batch in _iter_document_batches(dataset_path, batch_size):
+            in_flight.append(executor.submit(_encode_batch, batch, dtype))
+            if len(in_flight) >= 2 * num_proc:
+                ids = in_flight.popleft().result()
+                ids.tofile(out)
+                num_tokens += len(ids)
+        while in_flight:
+            ids = in_flight.popleft().result()
+            ids.tofile(out)
+            num_tokens += len(ids)
+    os.replace(tmp_file, token_file)
+
+    meta = {
+        "path": token_file,
+        "dtype": dtype,
+        "num_tokens": num_tokens,
+        "tokenizer": tokenizer_name,
+        "dataset": os.path.abspath(dataset_path),
+        "version": TOKEN_CACHE_VERSION,
+    }
+    with open(meta_file, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4)
+    print(f"Cached {num_tokens} tokens to {token_file}")
+    return meta
+
+
+class TokenBlockDataset(Dataset):
+    """
+    Fixed-size blocks of token IDs read from a memory-mapped token cache.
+
+    Only the blocks that are sampled get paged in, so memory use does not
+    depend on the size of the corpus. Trailing tokens that do not fill a
+    whole block are dropped, as TextDataset does.
+
+    Documents are packed back to back (separated by EOS), so every block is
+    full and no compute is spent on padding. Pickling sends only the file
+    path, so data loader workers map the cache themselves instead of
+    receiving a copy of it.
+    """
+
+    def __init__(self, token_file, block_size=128, dtype="uint16"):
+        self.token_file = token_file
+        self.dtype = dtype
+        self.block_size = block_size
+        self.num_tokens = os.path.getsize(token_file) // np.dtype(dtype).itemsize
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = np.memmap(self.token_file, dtype=self.dtype, mode="r")
+        return self._tokens
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_tokens"] = None
+        return state
+
+    def __len__(self):
+        return self.num_tokens // self.block_size
+
+    def __getitem__(self, i):
+        start = i * self.block_size
+        block = self.tokens[start:start + self.block_size]
+        return torch.from_numpy(block.astype(np.int64))
@@ -1,6 +1,9 @@
 import os
+import sys
+import time
+import argparse
 import subprocess
-from fine_tuning.llm_fine_tuning import fine_tune_model, prepare_dataset
+from utils.pipeline_runner import PipelineRunner, default_stages
 
 
 def run_policy_scraper():
@@ -17,13 +20,22 @@ def run_fine_tuning():
     """Runs the fine-tuning process for GPT-2."""
     print("Starting fine-tuning...")
     try:
-        data_file = os.path.join(os.getcwd(), "data", "processed", "consolidated_data.json")
-        output_file = os.path.join(os.getcwd(), "fine_tuning", "text_dataset.txt")
+        # Imported here so the CLI starts without loading transformers
+        from fine_tuning.llm_fine_tuning import fine_tune_incremental
+
+        arrow_dir = os.path.join(os.getcwd(), "data", "processed", "consolidated_arrow")
         output_dir = os.path.join(os.getcwd(), "models", "fine_tuned_model")
-        
-        # Prepare dataset and fine-tune
-        prepare_dataset(data_file, output_file)
-        fine_tune_model(output_file, output_dir)
+
+        # Memory-mapped Arrow export of the corpus when there is one
+        corpus = arrow_dir
+        if not os.path.isdir(corpus):
+            corpus = os.path.join(os.getcwd(), "data", "processed", "consolidated")
+        if not os.path.isdir(corpus):
+            # Corpus written by a full (non-incremental) consolidation
+            corpus = os.path.join(os.getcwd(), "data", "processed", "consolidated_data.json")
+
+        # Trains on new and changed policies only, or on everything the first time
+        fine_tune_incremental(corpus, output_dir)
         print("✅ Fine-tuning completed.")
     except Exception as e:
         print(f"❌ Error in fine-tuning: {e}")
@@ -33,13 +45,22 @@ def run_model_testing():
     """Runs the model testing script."""
     print("Starting model testing...")
     try:
-        fine_tuning_dir = os.path.join(os.getcwd(), "fine_tuning")
-        subprocess.run(["python", "test_fine_tuned_model.py"], cwd=fine_tuning_dir, check=True)
+        subprocess.run(["python", "-m", "fine_tuning.test_fine_tuned_model"], cwd=os.getcwd(), check=True)
         print("✅ Model testing completed.")
     except Exception as e:
         print(f"❌ Error in model testing: {e}")
 
 
+def run_eda():
+    """Runs the headless EDA, which writes its CSV and PNG outputs to output/."""
+    print("Running EDA...")
+    try:
+        subprocess.run(["python", "-m", "analysis.eda"], cwd=os.getcwd(), check=True)
+        print("✅ EDA completed.")
+    except Exception as e:
+        print(f"❌ Error in EDA: {e}")
+
+
 def run_eda_notebook():
     """Launches the Exploratory Data Analysis (EDA) Jupyter Notebook."""
     print("Launching EDA notebook...")
@@ -51,14 +72,15 @@ def run_eda_notebook():
         print(f"❌ Error launching EDA: {e}")
 
 
-def main():
+def menu():
     while True:
         print("\n=== PolicyAnalyzAI Console Menu ===")
         print("1. Run Policy Scraper (Includes Preprocessing and Consolidation)")
         print("2. Run Fine-Tuning")
         print("3. Run Model Testing")
         print("4. Run EDA")
-        print("5. Exit")
+        print("5. Open EDA Notebook")
+        print("6. Exit")
         
         try:
             choice = int(input("Select an option: "))
@@ -69,15 +91,73 @@ def main():
             elif choice == 3:
                 run_model_testing()
             elif choice == 4:
-                run_eda_notebook()
+                run_eda()
             elif choice == 5:
+                run_eda_notebook()
+            elif choice == 6:
                 print("Exiting...")
                 break
             else:
                 print("Invalid choice. Please select a valid option.")
         except ValueError:
-            print("Invalid input. Please enter a number between 1 and 5.")
+            print("Invalid input. Please enter a number between 1 and 6.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="PolicyAnalyzAI pipeline: scrape → consolidate → prepare → fine_tune → evaluate, and eda.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="Bring stages up to date, skipping those whose outputs are valid")
+    run_parser.add_argument("stages", nargs="*", help="Target stages; their dependencies are included (default: all)")
+    run_parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Rerun these stages regardless")
+    run_parser.add_argument("--force-all", action="store_true", help="Rerun every selected stage")
+    run_parser.add_argument("--scrape", action="store_true", help="Crawl again even if the scraper code is unchanged")
+    run_parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    run_parser.add_argument("--workers", type=int, default=2, help="Stages run concurrently")
+
+    subparsers.add_parser("status", help="Show which stages are up to date")
+    subparsers.add_parser(
+        "serve", help="Serve the fine-tuned model over HTTP (options: python -m fine_tuning.server --help)",
+    )
+    subparsers.add_parser("menu", help="Interactive console menu (the default without a command)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "serve":
+        # Imported here so the CLI starts without loading the server's dependencies
+        from fine_tuning.server import main as serve
+        serve(extra)
+        return 0
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command in (None, "menu"):
+        menu()
+        return 0
+
+    runner = PipelineRunner(default_stages(), max_workers=getattr(args, "workers", 2))
+    if args.command == "status":
+        for name, status in runner.status().items():
+            print(f"{'✅' if status == 'valid' else '🔄'} {name}: {status}")
+        return 0
+
+    try:
+        order = runner.select(args.stages)
+    except ValueError as e:
+        parser.error(str(e))
+    force = set(order) if args.force_all else set(args.force)
+    if args.scrape:
+        force.add("scrape")
+    start = time.perf_counter()
+    results = runner.run(order, force=force, dry_run=args.dry_run)
+    print(f"🏁 Pipeline finished in {time.perf_counter() - start:.1f} s: "
+          + ", ".join(f"{name} {result}" for name, result in results.items()))
+    return 1 if any(result in ("failed", "blocked") for result in results.values()) else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import os
+import hashlib
+import tempfile
+from scrapy import Request, signals
+from scrapy.exceptions import DropItem, StopDownload
+from scrapy.utils.url import url_is_from_any_domain
+
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+}
+
+
+def attachment_type(content_type):
+    """
+    Returns "pdf" or "file" for supported attachment content types, None otherwise.
+    """
+    if "application/pdf" in content_type:
+        return "pdf"
+    if "application/msword" in content_type or "application/vnd.openxmlformats-officedocument" in content_type:
+        return "file"
+    return None
+
+
+class AttachmentStore:
+    """
+    Content-addressed storage for downloaded attachments.
+
+    Files are written to a temporary file while their SHA-256 is computed,
+    then renamed to <sha256><ext>. If a file with that hash already exists
+    the new copy is discarded, so identical attachments linked from several
+    pages are stored once.
+    """
+
+    def __init__(self, pdf_dir, file_dir):
+        self.dirs = {"pdf": pdf_dir, "file": file_dir}
+        for directory in self.dirs.values():
+            os.makedirs(directory, exist_ok=True)
+
+    def open(self, file_type):
+        """
+        Starts a new file in the store.
+
+        Returns:
+            PendingFile: Accepts chunks with write(), then commit() or discard().
+        """
+        return PendingFile(self.dirs[file_type])
+
+
+class PendingFile:
+    """
+    A file being written to an AttachmentStore directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.digest = hashlib.sha256()
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def commit(self, extension):
+        """
+        Moves the finished file to <sha256><ext>.
+
+        Returns:
+            dict: sha256, path, size and whether the content was already stored.
+        """
+        self.file.close()
+        sha256 = self.digest.hexdigest()
+        path = os.path.join(self.directory, sha256 + extension)
+        duplicate = os.path.exists(path)
+        if duplicate:
+            os.remove(self.tmp_path)
+        else:
+            os.replace(self.tmp_path, path)
+        return {"sha256": sha256, "path": path, "size": self.size, "duplicate": duplicate}
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class AttachmentDownload:
+    """
+    Tracks one attachment request and writes its body to the store as it arrives.
+
+    The download is keyed to the request object being fetched: when the
+    retry middleware sends a copy of the request, the partial file of the
+    failed attempt is discarded and writing starts over.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.request = None
+        self.content_type = ""
+        self.file_type = None
+        self.file = None
+
+    def start(self, request, content_type):
+        self.discard()
+        self.request = request
+        self.content_type = content_type
+        self.file_type = attachment_type(content_type)
+        if self.file_type is not None:
+            self.file = self.store.open(self.file_type)
+
+    def write(self, request, data):
+        if request is self.request and self.file is not None:
+            self.file.write(data)
+
+    def discard(self):
+        if self.file is not None:
+            self.file.discard()
+            self.file = None
+
+
+class AttachmentPipeline:
+    """
+    Downloads attachment items straight to disk.
+
+    Attachments are fetched as Scrapy requests through the engine, so
+    robots.txt, download delays and AutoThrottle, retries, proxies and the
+    downloader stats apply to them as to pages. Their bodies are written to
+    the store chunk by chunk as they arrive (bytes_received signal), and
+    nothing large passes through the item pipeline or the feed: the item is
+    returned with metadata only (type, content type, hash, size and path).
+
+    Scrapy's download handler still buffers each response until it
+    completes, and stopping it early (StopDownload) would cut the file off,
+    so the memory bound comes from the size cap instead: an attachment holds
+    at most ATTACHMENT_MAX_SIZE (the request's download_maxsize, 20 MB by
+    default) in memory, and the downloader drops it once it grows past that.
+    At most ATTACHMENT_CONCURRENCY attachments are in flight. Attachments
+    bypass the HTTP cache.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.store = AttachmentStore(settings.get("PDF_STORE"), settings.get("FILES_STORE"))
+        self.max_size = settings.getint("ATTACHMENT_MAX_SIZE", 20 * 1024 * 1024)
+        self.timeout = settings.getfloat("ATTACHMENT_TIMEOUT", 60.0)
+        self.concurrency = settings.getint("ATTACHMENT_CONCURRENCY", 2)
+        self.seen_urls = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(s.bytes_received, signal=signals.bytes_received)
+        return s
+
+    def open_spider(self, spider):
+        from twisted.internet import defer
+        self.semaphore = defer.DeferredSemaphore(self.concurrency)
+
+    def process_item(self, item, spider):
+        if item.get("type") != "attachment":
+            return item
+
+        url = item["url"]
+        if not url_is_from_any_domain(url, spider.allowed_domains):
+            raise DropItem(f"Offsite attachment: {url}")
+        if url in self.seen_urls:
+            raise DropItem(f"Duplicate attachment: {url}")
+        self.seen_urls.add(url)
+
+        download = AttachmentDownload(self.store)
+        request = Request(url, dont_filter=True, meta={
+            "attachment_download": download,
+            "download_maxsize": self.max_size,
+            "download_timeout": self.timeout,
+            "dont_cache": True,
+        })
+        d = self.semaphore.run(self.crawler.engine.download, request)
+        d.addCallback(self.downloaded, download, item, spider)
+        d.addErrback(self.download_failed, download, item, spider)
+        return d
+
+    def headers_received(self, headers, body_length, request, spider):
+        download = request.meta.get("attachment_download")
+        if download is None:
+            return
+        download.start(request, headers.get("Content-Type", b"").decode("latin-1"))
+        if download.file_type is None:
+            # Not an attachment after all (e.g. an HTML error page): skip the body
+            raise StopDownload(fail=False)
+
+    def bytes_received(self, data, request, spider):
+        download = request.meta.get("attachment_download")
+        if download is not None:
+            download.write(request, data)
+
+    def downloaded(self, response, download, item, spider):
+        if response.status != 200:
+            raise ValueError(f"HTTP {response.status}")
+        if download.request is not response.request:
+            # Answered without going through the download handler: take the body as is
+            download.start(response.request, response.headers.get("Content-Type", b"").decode("latin-1"))
+            download.write(response.request, response.body)
+        if download.file_type is None:
+            raise DropItem(f"Unsupported attachment type {download.content_type!r}: {item['url']}")
+
+        extension = EXTENSIONS.get(download.content_type.split(";")[0].strip(), os.path.splitext(item["url"])[1])
+        result = download.file.commit(extension)
+        download.file = None
+
+        item["type"] = download.file_type
+        item["content_type"] = download.content_type
+        item["sha256"] = result["sha256"]
+        item["size"] = result["size"]
+        item["path"] = result["path"]
+        spider.crawler.stats.inc_value(f"attachments/{'duplicate' if result['duplicate'] else 'stored'}")
+        spider.crawler.stats.inc_value("attachments/bytes", result["size"])
+        if result["duplicate"]:
+            spider.logger.info(f"♻️ Attachment already stored: {item['url']} → {result['path']}")
+        else:
+            spider.logger.info(f"✅ Saved attachment: {item['url']} → {result['path']}")
+        return item
+
+    def download_failed(self, failure, download, item, spider):
+        """
+        Logs and counts a failed or rejected download, removes its partial file and drops the item.
+        """
+        download.discard()
+        if failure.check(DropItem):
+            return failure
+        spider.crawler.stats.inc_value("attachments/failed")
+        spider.logger.error(f"❌ Error downloading attachment {item['url']}: {failure.getErrorMessage()}")
+        raise DropItem(f"Attachment download failed: {item['url']}")
@@ -1,15 +1,18 @@
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
 def clean_html(html_content):
     """
     Extracts and cleans text content from an HTML document.
-    
+
     Args:
         html_content (str): The raw HTML content as a string.
-        
+
     Returns:
         str: Cleaned plain text content.
     """
+    from bs4 import BeautifulSoup  # Only needed when HTML_CLEANER = "bs4"
+
     soup = BeautifulSoup(html_content, "html.parser")
 
     # Remove script and style elements
@@ -19,3 +22,124 @@ def clean_html(html_content):
     # Extract text and normalize spaces
     text = soup.get_text(separator=" ").strip()
     return ' '.join(text.split())
+
+
+_PARSER = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+
+# Elements that never hold policy text
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe"]
+
+# The main content region, in order of preference
+MAIN_CONTENT_XPATHS = [
+    "//main",
+    "//*[@role='main']",
+    "//*[@id='main-content' or @id='maincontent' or @id='main' or @id='content']",
+    "//article",
+]
+
+# Site chrome repeated on every page: navigation landmarks are always dropped.
+_LANDMARKS = etree.XPath(
+    ".//nav | .//aside | .//*[@role='navigation' or @role='search' or @role='complementary']"
+)
+
+# Menus, breadcrumbs, sidebars, cookie and share widgets marked only by their class or id,
+# matched on the "-", "_" or space separated parts of the name. Layout wrappers often carry
+# the same words (e.g. "layout--has-sidebar"), so these are only dropped when they are small
+# or mostly links.
+BOILERPLATE_NAMES = r"(^|[\s_-])(nav|navbar|navigation|menu|breadcrumbs?|sidebar|skip|cookies?|share|social)([\s_-]|$)"
+_NAMED_CHROME = etree.XPath(
+    ".//*[re:test(@class, $names, 'i') or re:test(@id, $names, 'i')]",
+    namespaces={"re": "http://exslt.org/regular-expressions"},
+)
+CHROME_MAX_WORDS = 60
+CHROME_MIN_LINK_DENSITY = 0.5
+
+# If stripping leaves less than this fraction of the region's text, the region is kept whole
+MIN_KEPT_FRACTION = 0.2
+
+# Page header and footer, only stripped when no main content region was found
+_PAGE_CHROME = etree.XPath(".//header | .//footer | .//*[@role='banner' or @role='contentinfo']")
+
+
+def _words(element):
+    return " ".join(element.itertext()).split()
+
+
+def _is_chrome(element):
+    """
+    Returns True if an element named like site chrome is small or mostly links.
+    """
+    words = len(_words(element))
+    if words <= CHROME_MAX_WORDS:
+        return True
+    link_words = sum(len(_words(link)) for link in element.iter("a"))
+    return link_words / words >= CHROME_MIN_LINK_DENSITY
+
+
+def clean_html_lxml(html_content, main_content=True):
+    """
+    Extracts the policy text from an HTML document with lxml.
+
+    Parses with libxml2 instead of building a BeautifulSoup tree, keeps only
+    the main content region of the page when there is one, and drops the
+    navigation, breadcrumbs, sidebars and other chrome repeated on every page.
+    When that would drop most of the region's text, the region is returned
+    unstripped instead.
+
+    Args:
+        html_content (str): The raw HTML content as a string.
+        main_content (bool): Restrict the text to the main content region.
+
+    Returns:
+        str: Cleaned plain text content.
+    """
+    if not html_content or not html_content.strip():
+        return ""
+    try:
+        root = lxml.html.document_fromstring(html_content.encode("utf-8"), parser=_PARSER)
+    except etree.ParserError:
+        return ""
+    etree.strip_elements(root, *NON_CONTENT_TAGS, with_tail=False)
+
+    region = None
+    if main_content:
+        for xpath in MAIN_CONTENT_XPATHS:
+            matches = root.xpath(xpath)
+            if matches:
+                region = matches[0]
+                break
+    if region is None:
+        region = root.find("body")
+        if region is None:
+            region = root
+        for element in _PAGE_CHROME(region):
+            element.drop_tree()
+
+    full_text = " ".join(_words(region))
+    for element in _LANDMARKS(region):
+        element.drop_tree()
+    for element in _NAMED_CHROME(region, names=BOILERPLATE_NAMES):
+        if _is_chrome(element):
+            element.drop_tree()
+
+    text = " ".join(_words(region))
+    if len(text) < MIN_KEPT_FRACTION * len(full_text):
+        # The page doesn't look like what the chrome rules expect: keep everything
+        return full_text
+    return text
+
+
+CLEANERS = {
+    "lxml": clean_html_lxml,
+    "bs4": clean_html,
+}
+
+
+def get_cleaner(name):
+    """
+    Returns the HTML cleaner selected by the HTML_CLEANER setting ("lxml" or "bs4").
+    """
+    try:
+        return CLEANERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown HTML cleaner {name!r}, expected one of {sorted(CLEANERS)}")
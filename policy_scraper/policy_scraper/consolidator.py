@@ -1,9 +1,50 @@
 import os
 import json
+import zlib
+import hashlib
+from .tokenstore import FORMAT, pack_strings
+
+CONSOLIDATED_SHARDS = 16
+MANIFEST_NAME = "manifest.json"
+PACKED_FIELDS = ["format", "num_tokens", "num_sentences", "token_offsets", "sentence_offsets"]
+
+# Columns of the Arrow export. Legacy entries without packed tokens get nulls.
+ARROW_COLUMNS = {
+    "id": "string",
+    "title": "string",
+    "url": "string",
+    "cleaned_content": "string",
+    "num_tokens": "int64",
+    "num_sentences": "int64",
+    "token_offsets": "string",
+    "sentence_offsets": "string",
+}
+
+
+def _token_fields(text, tokenized_data):
+    """
+    Returns the token fields of a consolidated entry as packed offsets into text.
+
+    Legacy tokenized files holding string lists are converted on the fly. Tokens
+    of a different version of the text (a failed re-tokenization) are left out.
+    """
+    if tokenized_data.get("format") == FORMAT:
+        expected = tokenized_data.get("content_hash")
+        if expected and expected != hashlib.sha256(text.encode("utf-8")).hexdigest():
+            return {}
+        return {field: tokenized_data[field] for field in PACKED_FIELDS}
+
+    word_tokens = tokenized_data.get("word_tokens", [])
+    sentence_tokens = tokenized_data.get("sentence_tokens", [])
+    packed = pack_strings(text, word_tokens, sentence_tokens)
+    if packed is None:
+        return {"word_tokens": word_tokens, "sentence_tokens": sentence_tokens}
+    return packed
 
 def consolidate_data(clean_dir="data/processed/clean_json_files", 
                      tokenized_dir="data/processed/tokenized_json_files", 
-                     output_file="data/processed/consolidated_data.json"):
+                     output_file="data/processed/consolidated_data.json",
+                     arrow_dir=None):
     """
     Consolidates cleaned and tokenized data into a single dataset.
 
@@ -11,6 +52,7 @@ def consolidate_data(clean_dir="data/processed/clean_json_files",
         clean_dir (str): Directory containing cleaned JSON files.
         tokenized_dir (str): Directory containing tokenized JSON files.
         output_file (str): Output file for the consolidated dataset.
+        arrow_dir (str, optional): Also export the dataset to Arrow here (see export_arrow).
     """
     consolidated_data = []
 
@@ -38,8 +80,7 @@ def consolidate_data(clean_dir="data/processed/clean_json_files",
                 "title": cleaned_data["title"],
                 "url": cleaned_data["url"],
                 "cleaned_content": cleaned_data["cleaned_content"],
-                "word_tokens": tokenized_data["word_tokens"],
-                "sentence_tokens": tokenized_data["sentence_tokens"],
+                **_token_fields(cleaned_data["cleaned_content"], tokenized_data),
             }
 
             consolidated_data.append(consolidated_entry)
@@ -50,6 +91,220 @@ def consolidate_data(clean_dir="data/processed/clean_json_files",
 
         print(f"Consolidated data saved to {output_file}")
 
+        if arrow_dir:
+            export_arrow(output_file, arrow_dir)
+
+    except Exception as e:
+        print(f"Error consolidating data: {e}")
+
+
+
+def _shard_path(output_dir, shard):
+    return os.path.join(output_dir, f"part-{shard:03d}.jsonl")
+
+
+def _scan_json_files(directory):
+    """Returns {filename: (mtime_ns, size)} for the JSON files in a directory, without reading them."""
+    with os.scandir(directory) as entries:
+        return {
+            entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries
+            if entry.name.endswith(".json") and entry.is_file()
+        }
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def consolidate_incremental(clean_dir="data/processed/clean_json_files",
+                            tokenized_dir="data/processed/tokenized_json_files",
+                            output_dir="data/processed/consolidated",
+                            num_shards=CONSOLIDATED_SHARDS,
+                            arrow_dir=None):
+    """
+    Incrementally consolidates cleaned and tokenized data into a sharded JSONL corpus.
+
+    A manifest records the mtime, size and content hash of every document.
+    Files whose mtime and size are unchanged are not read at all, and only the
+    shards holding added, changed or removed documents are rewritten. Each
+    line of a part-NNN.jsonl shard is one consolidated entry, keyed by "id"
+    (the file's slug).
+
+    Args:
+        clean_dir (str): Directory containing cleaned JSON files.
+        tokenized_dir (str): Directory containing tokenized JSON files.
+        output_dir (str): Directory for the JSONL shards and the manifest.
+        num_shards (int): Number of shards documents are spread across.
+        arrow_dir (str, optional): Re-export the corpus to Arrow here when any
+            document was added, changed or removed (see export_arrow).
+
+    Returns:
+        dict: Counts of added, changed, removed and unchanged documents.
+    """
+    summary = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        # The manifest is only rewritten when something changed, so an idle
+        # run leaves every output file untouched
+        dirty = manifest.get("num_shards") != num_shards
+        if not dirty:
+            documents = manifest["documents"]
+        else:
+            # No usable manifest, or the shard count changed: rebuild every shard
+            documents = {}
+            for name in os.listdir(output_dir):
+                if name.startswith("part-") and name.endswith(".jsonl"):
+                    os.remove(os.path.join(output_dir, name))
+
+        clean_files = _scan_json_files(clean_dir)
+        tokenized_files = _scan_json_files(tokenized_dir)
+        common_files = clean_files.keys() & tokenized_files.keys()
+
+        updates = {}  # shard -> {doc_id: entry}
+        for filename in common_files:
+            stat = [*clean_files[filename], *tokenized_files[filename]]
+            record = documents.get(filename)
+            if record is not None and record["stat"] == stat:
+                summary["unchanged"] += 1
+                continue
+
+            with open(os.path.join(clean_dir, filename), "rb") as f:
+                clean_bytes = f.read()
+            with open(os.path.join(tokenized_dir, filename), "rb") as f:
+                tokenized_bytes = f.read()
+            content_hash = hashlib.sha256(clean_bytes + b"\0" + tokenized_bytes).hexdigest()
+
+            if record is not None and record["sha256"] == content_hash:
+                # Touched but not modified
+                record["stat"] = stat
+                summary["unchanged"] += 1
+                dirty = True
+                continue
+
+            cleaned_data = json.loads(clean_bytes)
+            tokenized_data = json.loads(tokenized_bytes)
+            doc_id = filename[:-len(".json")]
+            shard = zlib.crc32(doc_id.encode("utf-8")) % num_shards
+            updates.setdefault(shard, {})[doc_id] = {
+                "id": doc_id,
+                "title": cleaned_data["title"],
+                "url": cleaned_data["url"],
+                "cleaned_content": cleaned_data["cleaned_content"],
+                **_token_fields(cleaned_data["cleaned_content"], tokenized_data),
+            }
+            summary["changed" if record is not None else "added"] += 1
+            documents[filename] = {"stat": stat, "sha256": content_hash, "shard": shard}
+
+        removed = {}  # shard -> {doc_id}
+        for filename in documents.keys() - common_files:
+            record = documents.pop(filename)
+            removed.setdefault(record["shard"], set()).add(filename[:-len(".json")])
+            summary["removed"] += 1
+
+        # Rewrite only the shards that contain added, changed or removed documents
+        for shard in updates.keys() | removed.keys():
+            path = _shard_path(output_dir, shard)
+            shard_updates = updates.get(shard, {})
+            dropped = removed.get(shard, set()) | shard_updates.keys()
+            kept_lines = []
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip() and json.loads(line)["id"] not in dropped:
+                            kept_lines.append(line)
+
+            def write_shard(f):
+                f.writelines(kept_lines)
+                for entry in shard_updates.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+            _write_atomic(path, write_shard)
+
+        if dirty or updates or removed:
+            _write_atomic(manifest_path, lambda f: json.dump(
+                {"num_shards": num_shards, "documents": documents}, f, ensure_ascii=False))
+
+        print(
+            f"Consolidated data updated in {output_dir}: {summary['added']} added, "
+            f"{summary['changed']} changed, {summary['removed']} removed, {summary['unchanged']} unchanged"
+        )
+
+        changed = summary["added"] or summary["changed"] or summary["removed"]
+        if arrow_dir and (changed or not os.path.exists(arrow_dir)):
+            export_arrow(output_dir, arrow_dir)
+
     except Exception as e:
         print(f"Error consolidating data: {e}")
 
+    return summary
+
+
+def export_arrow(corpus_path, arrow_dir, writer_batch_size=1000):
+    """
+    Exports the consolidated corpus as a Hugging Face dataset saved to disk.
+
+    Documents are streamed from the corpus and written to Arrow in batches,
+    so memory use does not grow with the corpus. Readers open the result
+    with datasets.load_from_disk, which memory-maps the Arrow files: loading
+    is near-instant and only the columns that are read are paged in. The
+    export is staged next to arrow_dir and swapped in when complete.
+
+    Args:
+        corpus_path (str): Consolidated corpus (JSON array, JSONL file or shard directory).
+        arrow_dir (str): Output directory of the dataset.
+        writer_batch_size (int): Rows buffered before each Arrow write.
+
+    Returns:
+        int: Number of documents exported.
+    """
+    import shutil
+    import tempfile
+    from datasets import Dataset, Features, Value
+    from slugify import slugify
+    from .corpus import iter_documents
+
+    def generate(path):
+        for doc in iter_documents(path, fields=list(ARROW_COLUMNS)):
+            row = {name: doc.get(name) for name in ARROW_COLUMNS}
+            row["id"] = row["id"] or slugify(row["title"] or "default_policy")
+            yield row
+
+    parent = os.path.dirname(os.path.abspath(arrow_dir))
+    os.makedirs(parent, exist_ok=True)
+    # A fresh cache directory per export, so datasets never reuses an earlier build
+    work_dir = tempfile.mkdtemp(prefix=".arrow-", dir=parent)
+    try:
+        dataset = Dataset.from_generator(
+            generate,
+            features=Features({name: Value(dtype) for name, dtype in ARROW_COLUMNS.items()}),
+            gen_kwargs={"path": corpus_path},
+            cache_dir=os.path.join(work_dir, "cache"),
+            writer_batch_size=writer_batch_size,
+        )
+        num_rows = dataset.num_rows
+        staged = os.path.join(work_dir, "dataset")
+        dataset.save_to_disk(staged)
+        del dataset
+
+        previous = arrow_dir + ".old"
+        if os.path.exists(arrow_dir):
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(arrow_dir, previous)
+        os.replace(staged, arrow_dir)
+        shutil.rmtree(previous, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Arrow dataset with {num_rows} documents saved to {arrow_dir}")
+    return num_rows
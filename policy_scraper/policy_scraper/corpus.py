@@ -0,0 +1,168 @@
+import os
+import re
+import json
+
+# Readers for the consolidated corpus. The module only depends on the standard
+# library, so it can be imported both by the crawler and from the repository
+# root as policy_scraper.policy_scraper.corpus.
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_SCALAR = re.compile(r"[^,}\]\s]+")
+
+
+def _skip_ws(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _skip_value(text, pos):
+    """Returns the index just past the JSON value starting at pos, without decoding it."""
+    char = text[pos]
+    if char == '"':
+        return _STRING.match(text, pos).end()
+    if char in "[{":
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(text, pos)
+            token = match.group()
+            if token == '"':
+                pos = _STRING.match(text, match.start()).end()
+                continue
+            depth += 1 if token in "[{" else -1
+            pos = match.end()
+            if depth == 0:
+                return pos
+    return _SCALAR.match(text, pos).end()
+
+
+def _decode_object(text, pos, fields):
+    """
+    Decodes the JSON object starting at pos, keeping only the given fields.
+
+    Values of other fields are skipped over without being decoded, so large
+    token data is never turned into Python objects.
+
+    Returns:
+        tuple: The decoded dict and the index just past the object.
+    """
+    if fields is None:
+        return _decoder.raw_decode(text, pos)
+
+    if text[pos] != "{":
+        raise ValueError(f"Expected an object at position {pos}")
+    obj = {}
+    pos = _skip_ws(text, pos + 1)
+    if text[pos] == "}":
+        return obj, pos + 1
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        if text[pos] != ":":
+            raise ValueError(f"Expected ':' at position {pos}")
+        pos = _skip_ws(text, pos + 1)
+        if key in fields:
+            obj[key], pos = _decoder.raw_decode(text, pos)
+        else:
+            pos = _skip_value(text, pos)
+        pos = _skip_ws(text, pos)
+        if text[pos] == "}":
+            return obj, pos + 1
+        if text[pos] != ",":
+            raise ValueError(f"Expected ',' or '}}' at position {pos}")
+        pos = _skip_ws(text, pos + 1)
+
+
+def _iter_json_array(path, fields):
+    """Yields the objects of a top-level JSON array one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(CHUNK_SIZE)
+        eof = not buf
+        pos = _skip_ws(buf, 0)
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{path} is not a JSON array")
+        pos += 1
+        read_size = CHUNK_SIZE
+
+        while True:
+            # Skip separators between elements
+            while True:
+                pos = _skip_ws(buf, pos)
+                if pos < len(buf) and buf[pos] == ",":
+                    pos += 1
+                    continue
+                if pos < len(buf) or eof:
+                    break
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+
+            if pos >= len(buf) or buf[pos] == "]":
+                return
+
+            try:
+                obj, end = _decode_object(buf, pos, fields)
+            except (ValueError, IndexError, AttributeError):
+                # The element is cut off by the end of the buffer: read more and retry
+                if eof:
+                    raise ValueError(f"Malformed JSON in {path} at position {pos}")
+                chunk = f.read(read_size)
+                read_size *= 2
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+
+            yield obj
+            # The buffer is only compacted when refilling, not copied after every object
+            pos = end
+            read_size = CHUNK_SIZE
+
+
+def _iter_json_lines(path, fields):
+    """Yields the objects of a JSONL file one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            pos = _skip_ws(line, 0)
+            if pos < len(line):
+                yield _decode_object(line, pos, fields)[0]
+
+
+def _corpus_files(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith(".jsonl")
+        )
+    return [path]
+
+
+def _is_json_array(path):
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(64).lstrip()
+    return head.startswith("[")
+
+
+def iter_documents(path, fields=None):
+    """
+    Streams documents from the consolidated corpus one at a time.
+
+    Supports the JSON array written by consolidate_data, a single JSONL file,
+    and a directory of JSONL shards written by consolidate_incremental. Only
+    one document is held in memory at a time.
+
+    Args:
+        path (str): Path to consolidated_data.json, a .jsonl file, or a shard directory.
+        fields (list[str], optional): Fields to load. Other fields are skipped
+            without being decoded. Loads every field if omitted.
+
+    Yields:
+        dict: One consolidated document, restricted to the requested fields.
+    """
+    fields = set(fields) if fields is not None else None
+    for file_path in _corpus_files(path):
+        if _is_json_array(file_path):
+            yield from _iter_json_array(file_path, fields)
+        else:
+            yield from _iter_json_lines(file_path, fields)
@@ -0,0 +1,71 @@
+import os
+import time
+import sqlite3
+
+
+class CrawlState:
+    """
+    Per-URL state for incremental crawls, stored in SQLite.
+
+    For every policy page it keeps the hash of its cleaned text, the HTML
+    cleaner that produced it, and the HTTP validators (ETag, Last-Modified)
+    of the download it was made from. All
+    are written by the item pipeline once the page's outputs are saved, so
+    validators never outlive a failed write. The downloader middleware only
+    reads them, through its own connection; WAL mode keeps the small
+    autocommitted writes cheap.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                slug TEXT,
+                cleaner TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}
+        if "cleaner" not in columns:
+            # State written before the cleaner was recorded: such pages are fetched in full once
+            self.conn.execute("ALTER TABLE pages ADD COLUMN cleaner TEXT")
+
+    def get(self, url):
+        """
+        Returns the stored state of a URL as a dict, or None if it was never crawled.
+        """
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, slug, cleaner FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2], "slug": row[3], "cleaner": row[4]}
+
+    def set_processed(self, url, content_hash, slug, cleaner, etag=None, last_modified=None):
+        """
+        Records a page whose outputs were written: the hash of its cleaned text,
+        the cleaner used, and the validators of the response it came from.
+        """
+        self.conn.execute(
+            """
+            INSERT INTO pages (url, etag, last_modified, content_hash, slug, cleaner, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag, last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash, slug = excluded.slug,
+                cleaner = excluded.cleaner, updated_at = excluded.updated_at
+            """,
+            (url, etag, last_modified, content_hash, slug, cleaner, time.time()),
+        )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,220 @@
+import os
+import json
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _extract_pdf(path):
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return " ".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_docx(path):
+    from docx import Document
+    document = Document(path)
+    parts = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            parts.extend(cell.text for cell in row.cells)
+    return " ".join(parts)
+
+
+# Legacy binary Word files (.doc) are deliberately left out: there is no
+# maintained pure-Python parser for them, and converting through antiword or
+# LibreOffice would add a system dependency to the crawler. They are still
+# downloaded and stored, and reported as unsupported here.
+EXTRACTORS = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+}
+
+
+def _call_with_timeout(function, path, timeout):
+    """
+    Returns function(path), raising ExtractionTimeout after timeout seconds.
+    """
+    if not timeout:
+        return function(path)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return function(path)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    # Without SIGALRM the extraction can't be interrupted. It runs in a daemon
+    # thread that is abandoned on timeout, so the worker can take the next file
+    # and still exits at shutdown.
+    outcome = {}
+
+    def run():
+        try:
+            outcome["text"] = function(path)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise ExtractionTimeout()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["text"]
+
+
+def extract_text(path, timeout=None):
+    """
+    Extracts plain text from a PDF or Word (.docx) file.
+
+    Runs in a worker process. The extraction is given up after timeout
+    seconds (interrupted with SIGALRM where available), so a pathological
+    file cannot hold a worker forever.
+
+    Args:
+        path (str): Path to the stored attachment.
+        timeout (float, optional): Seconds before giving up.
+
+    Returns:
+        dict: "text" with whitespace-normalised text (None on failure) and "error".
+    """
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return {"text": None, "error": f"Unsupported attachment format: {path}"}
+
+    try:
+        text = _call_with_timeout(extractor, path, timeout)
+        return {"text": " ".join(text.split()), "error": None}
+    except ExtractionTimeout:
+        return {"text": None, "error": f"Timed out after {timeout}s", "transient": True}
+    except ImportError as e:
+        return {"text": None, "error": f"Missing optional dependency for {path}: {e}", "transient": True}
+    except Exception as e:
+        return {"text": None, "error": f"{type(e).__name__}: {e}"}
+
+
+class ExtractionService:
+    """
+    Extracts attachment text in a process pool without blocking the reactor.
+
+    Results are cached as <sha256>.json in cache_dir, keyed by the content
+    hash of the attachment, so a file is only ever parsed once however many
+    times it is linked or recrawled. Each file gets a timeout, enforced in
+    the worker and again on the reactor side.
+
+    At most one file per worker is handed to the pool at a time, so a file
+    never waits in the pool's queue and the reactor-side timeout only
+    counts time spent extracting it. Timeouts are scheduled on the global
+    reactor unless another one (e.g. a twisted.internet.task.Clock in tests)
+    is passed as reactor.
+    """
+
+    def __init__(self, cache_dir, workers=2, timeout=60.0, reactor=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self._reactor = reactor
+        self.executor = None
+        self.timed_out = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def reactor(self):
+        if self._reactor is None:
+            # Imported here so that importing this module never installs a reactor
+            from twisted.internet import reactor
+            self._reactor = reactor
+        return self._reactor
+
+    def start(self):
+        from twisted.internet import defer
+        self.executor = ProcessPoolExecutor(
+            max_workers=max(1, self.workers),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.slots = defer.DeferredSemaphore(max(1, self.workers))
+
+    def _cache_path(self, sha256):
+        return os.path.join(self.cache_dir, f"{sha256}.json")
+
+    def _load_cached(self, sha256):
+        path = self._cache_path(sha256)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_cached(self, sha256, result):
+        # Timeouts and missing extractors are not cached: the file may extract fine on a later run
+        if result.get("transient"):
+            return
+        with open(self._cache_path(sha256), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+
+    def extract(self, path, sha256):
+        """
+        Extracts the text of a stored attachment.
+
+        Returns:
+            Deferred: Fires with a dict holding "text" (None on failure) and "error".
+        """
+        from twisted.internet import defer
+
+        cached = self._load_cached(sha256)
+        if cached is not None:
+            return defer.succeed(cached)
+
+        d = defer.Deferred()
+        timer = []
+
+        def submit(_):
+            try:
+                future = self.executor.submit(extract_text, path, self.timeout)
+            except Exception as e:
+                self.slots.release()
+                d.errback(e)
+                return
+            future.add_done_callback(lambda f: self.reactor.callFromThread(deliver, f))
+            # Backstop in case the worker-side timeout fails; the job is running from here on
+            timer.append(self.reactor.callLater(self.timeout * 2, timed_out))
+
+        def timed_out():
+            self.timed_out += 1
+            d.errback(ExtractionTimeout(f"No result after {self.timeout * 2}s"))
+
+        def deliver(f):
+            # The slot is only freed once the worker is done, even after a reactor-side timeout
+            self.slots.release()
+            if d.called:
+                return
+            timer[0].cancel()
+            try:
+                result = f.result()
+            except Exception as e:
+                d.errback(e)
+                return
+            self._save_cached(sha256, result)
+            d.callback(result)
+
+        self.slots.acquire().addCallback(submit)
+        return d
+
+    def close(self):
+        if self.executor is None:
+            return
+        # A file past the reactor-side timeout is still bounded by the worker-side
+        # timeout, so don't wait for it here; files not yet started are cancelled
+        self.executor.shutdown(wait=not self.timed_out, cancel_futures=True)
+        self.executor = None
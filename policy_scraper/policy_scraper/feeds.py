@@ -0,0 +1,121 @@
+import os
+import gzip
+
+FEED_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+FEED_PLUGINS = {
+    None: "policy_scraper.feeds.FlushingPlugin",
+    "gzip": "policy_scraper.feeds.GzipPlugin",
+    "zstd": "policy_scraper.feeds.ZstdPlugin",
+}
+
+
+def build_feeds(settings):
+    """
+    Builds the FEEDS setting from FEED_MODE, FEED_COMPRESSION, FEED_FLUSH_ITEMS,
+    FEED_ROTATE_ITEMS and FEED_FIELDS.
+
+    Args:
+        settings (scrapy.settings.Settings): Crawler settings, command line overrides included.
+
+    Returns:
+        dict: Feed URI -> feed options.
+    """
+    if settings.get("FEED_MODE", "metadata") == "full":
+        return {
+            "output.json": {
+                "format": "json",
+                "encoding": "utf8",
+                "store_empty": False,
+                "indent": 4,
+            },
+        }
+
+    compression = settings.get("FEED_COMPRESSION") or None
+    if compression == "None":  # -s FEED_COMPRESSION=None
+        compression = None
+    if compression not in FEED_PLUGINS:
+        raise ValueError(f"Unknown FEED_COMPRESSION {compression!r}, expected one of None, 'gzip' or 'zstd'")
+    uri = os.path.join(settings.get("BASE_DIR"), "output", "feed", "crawl-%(batch_time)s-%(batch_id)03d.jsonl")
+    return {
+        uri + FEED_SUFFIXES[compression]: {
+            "format": "jsonlines",
+            "encoding": "utf8",
+            "store_empty": False,
+            "fields": settings.getlist("FEED_FIELDS"),
+            "batch_item_count": settings.getint("FEED_ROTATE_ITEMS", 0),
+            "postprocessing": [FEED_PLUGINS[compression]],
+            "flush_items": settings.getint("FEED_FLUSH_ITEMS", 1),
+        },
+    }
+
+
+class FlushingPlugin:
+    """
+    Feed postprocessing plugin that flushes the feed file every few items.
+
+    Scrapy writes one JSON line per item, so flushing after every
+    "flush_items" writes lets other tools tail the feed while the crawl is
+    still running. Subclasses wrap the file in a compressor and flush it
+    the same way, so a partially written compressed feed stays decodable.
+    """
+
+    def __init__(self, file, feed_options):
+        self.file = file
+        self.feed_options = feed_options
+        self.flush_items = feed_options.get("flush_items", 1)
+        self.writes = 0
+        self.stream = self.open_stream(file, feed_options)
+
+    def open_stream(self, file, feed_options):
+        return file
+
+    def flush_stream(self):
+        pass
+
+    def write(self, data):
+        written = self.stream.write(data)
+        self.writes += 1
+        if self.flush_items and self.writes % self.flush_items == 0:
+            self.flush_stream()
+            self.file.flush()
+        return written
+
+    def close(self):
+        if self.stream is not self.file:
+            self.stream.close()
+        self.file.close()
+
+
+class GzipPlugin(FlushingPlugin):
+    """
+    Gzip-compresses the feed, with a sync flush every "flush_items" items.
+
+    Feed option: "gzip_compresslevel" (default 6).
+    """
+
+    def open_stream(self, file, feed_options):
+        return gzip.GzipFile(
+            fileobj=file,
+            mode="wb",
+            compresslevel=feed_options.get("gzip_compresslevel", 6),
+        )
+
+    def flush_stream(self):
+        self.stream.flush()
+
+
+class ZstdPlugin(FlushingPlugin):
+    """
+    Zstandard-compresses the feed, ending a block every "flush_items" items.
+
+    Needs the optional "zstandard" package. Feed option: "zstd_level" (default 3).
+    """
+
+    def open_stream(self, file, feed_options):
+        import zstandard
+        self._flush_block = zstandard.FLUSH_BLOCK
+        compressor = zstandard.ZstdCompressor(level=feed_options.get("zstd_level", 3))
+        return compressor.stream_writer(file, closefd=False)
+
+    def flush_stream(self):
+        self.stream.flush(self._flush_block)
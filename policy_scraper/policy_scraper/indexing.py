@@ -0,0 +1,99 @@
+import time
+from whoosh import index
+from whoosh.fields import Schema, TEXT, ID
+
+
+def build_schema(store_content=True):
+    """
+    Returns the Whoosh schema used for the policy index.
+
+    Args:
+        store_content (bool): Store the full content in the index. When False,
+            only term positions and character offsets are kept, which keeps the
+            index small; snippets are then highlighted from the cleaned JSON files.
+    """
+    if store_content:
+        content = TEXT(stored=True)
+    else:
+        content = TEXT(stored=False, phrase=True, chars=True)
+    return Schema(
+        id=ID(stored=True, unique=True),
+        title=TEXT(stored=True),
+        content=content,
+        url=ID(stored=True),
+    )
+
+
+def open_or_create_index(index_dir, schema):
+    """
+    Opens the Whoosh index in index_dir, creating it if it does not exist yet.
+    """
+    if not index.exists_in(index_dir):
+        return index.create_in(index_dir, schema)
+    return index.open_dir(index_dir)
+
+
+class BufferedIndexWriter:
+    """
+    Holds a single Whoosh writer for the whole crawl and commits in bulk.
+
+    Documents are added with update_document on the unique "id" field, so
+    re-indexing a policy replaces it instead of adding a duplicate. A commit
+    happens every batch_size documents or commit_interval seconds, whichever
+    comes first, and close() does a final optimizing commit that merges all
+    segments.
+    """
+
+    def __init__(self, ix, batch_size=500, commit_interval=60.0, limitmb=256):
+        self.ix = ix
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.limitmb = limitmb
+        self.writer = None
+        self.pending = 0
+        self.last_commit = time.monotonic()
+        self.commits = 0
+
+    def update_document(self, **fields):
+        """
+        Adds or replaces a document, committing if the batch is full or stale.
+        """
+        if self.writer is None:
+            self.writer = self.ix.writer(limitmb=self.limitmb)
+        self.writer.update_document(**fields)
+        self.pending += 1
+
+        if (self.pending >= self.batch_size
+                or time.monotonic() - self.last_commit >= self.commit_interval):
+            self.commit()
+
+    def commit(self, optimize=False):
+        """
+        Commits the buffered documents. Returns the number of documents committed.
+        """
+        committed = self.pending
+        if self.writer is not None:
+            self.writer.commit(optimize=optimize)
+            self.writer = None
+            self.commits += 1
+        elif optimize:
+            # Nothing buffered, but still merge the segments left by earlier commits
+            self.ix.optimize()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+        return committed
+
+    def close(self):
+        """
+        Flushes remaining documents with a final optimizing commit.
+        """
+        return self.commit(optimize=True)
+
+    def cancel(self):
+        """
+        Discards buffered documents and releases the index lock.
+        """
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+        self.pending = 0
@@ -3,7 +3,10 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from policy_scraper.crawl_state import CrawlState
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +104,79 @@ class PolicyScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ConditionalRequestMiddleware:
+    """
+    Sends conditional requests for policy pages during incremental crawls.
+
+    Requests marked with meta["conditional"] get If-None-Match and
+    If-Modified-Since headers from the validators stored on the last crawl,
+    but only when that crawl finished processing the page with the current
+    HTML_CLEANER and its cleaned and tokenized outputs are still on disk;
+    otherwise the page is fetched in full so it can be regenerated. A 304 Not Modified response is
+    dropped, so the page is never parsed or processed again.
+
+    Validators of 200 responses are passed on in meta["validators"] (copied
+    to the item by the spider) and only stored by the item pipeline once the
+    page has been written. Conditional requests bypass the HTTP cache, which
+    would otherwise answer them locally.
+    """
+
+    def __init__(self, state, stats, output_dirs, cleaner):
+        self.state = state
+        self.stats = stats
+        self.output_dirs = output_dirs
+        self.cleaner = cleaner
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("INCREMENTAL_CRAWL"):
+            raise NotConfigured
+        processed_dir = os.path.join(crawler.settings.get("BASE_DIR"), "data", "processed")
+        s = cls(
+            CrawlState(crawler.settings.get("CRAWL_STATE_PATH")),
+            crawler.stats,
+            [os.path.join(processed_dir, "clean_json_files"), os.path.join(processed_dir, "tokenized_json_files")],
+            crawler.settings.get("HTML_CLEANER", "bs4"),
+        )
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def is_processed(self, state):
+        """Returns True if the stored page was fully processed with the current cleaner and its outputs still exist."""
+        return bool(state["content_hash"] and state["slug"]) and state["cleaner"] == self.cleaner and all(
+            os.path.exists(os.path.join(directory, state["slug"] + ".json")) for directory in self.output_dirs
+        )
+
+    def process_request(self, request, spider):
+        if not request.meta.get("conditional"):
+            return None
+        request.meta["dont_cache"] = True
+        state = self.state.get(request.url)
+        if state and self.is_processed(state):
+            if state["etag"]:
+                request.headers.setdefault("If-None-Match", state["etag"])
+            if state["last_modified"]:
+                request.headers.setdefault("If-Modified-Since", state["last_modified"])
+        elif state:
+            self.stats.inc_value("incremental/refetched")
+        return None
+
+    def process_response(self, request, response, spider):
+        if not request.meta.get("conditional"):
+            return response
+        if response.status == 304:
+            self.stats.inc_value("incremental/not_modified")
+            raise IgnoreRequest(f"Not modified: {request.url}")
+        if response.status == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            request.meta["validators"] = {
+                "etag": etag.decode("latin-1") if etag else None,
+                "last_modified": last_modified.decode("latin-1") if last_modified else None,
+            }
+        return response
+
+    def spider_closed(self, spider):
+        self.state.close()
@@ -1,13 +1,13 @@
 import os
-import base64
 import json
-from slugify import slugify
-from policy_scraper.cleaning import clean_html
-from policy_scraper.tokenizing import tokenize_text
-from whoosh import index
-from whoosh.fields import Schema, TEXT, ID
-from whoosh.writing import AsyncWriter
-from policy_scraper.consolidator import consolidate_data  # Import the consolidator
+import time
+from policy_scraper.cleaning import get_cleaner
+from policy_scraper.processing import prepare_policy, prepare_attachment
+from policy_scraper.tokenizing import TokenizationService
+from policy_scraper.extraction import ExtractionService
+from policy_scraper.crawl_state import CrawlState
+from policy_scraper.indexing import build_schema, open_or_create_index, BufferedIndexWriter
+from policy_scraper.consolidator import consolidate_data, consolidate_incremental  # Import the consolidator
 
 
 class PolicyScraperPipeline:
@@ -33,128 +33,270 @@ class PolicyScraperPipeline:
         os.makedirs(self.file_dir, exist_ok=True)
         os.makedirs(self.index_dir, exist_ok=True)
 
-        # Initialize Whoosh index
-        self.schema = Schema(
-            id=ID(stored=True, unique=True),
-            title=TEXT(stored=True),
-            content=TEXT(stored=True),
-            url=ID(stored=True),
+        # Initialize Whoosh index with one long-lived writer for the whole crawl
+        self.schema = build_schema(store_content=spider.settings.getbool("WHOOSH_STORE_CONTENT", True))
+        self.index = open_or_create_index(self.index_dir, self.schema)
+        self.index_writer = BufferedIndexWriter(
+            self.index,
+            batch_size=spider.settings.getint("WHOOSH_BATCH_SIZE", 500),
+            commit_interval=spider.settings.getfloat("WHOOSH_COMMIT_INTERVAL", 60.0),
+            limitmb=spider.settings.getint("WHOOSH_WRITER_LIMITMB", 256),
         )
-        if not index.exists_in(self.index_dir):
-            self.index = index.create_in(self.index_dir, self.schema)
-        else:
-            self.index = index.open_dir(self.index_dir)
+
+        self.cleaner_name = spider.settings.get("HTML_CLEANER", "bs4")
+        self.cleaner = get_cleaner(self.cleaner_name)
+
+        # Tokenization runs in worker processes so it never blocks the reactor
+        self.tokenizer = TokenizationService(
+            workers=spider.settings.getint("TOKENIZER_WORKERS", os.cpu_count() or 1),
+            batch_size=spider.settings.getint("TOKENIZER_BATCH_SIZE", 16),
+            batch_timeout=spider.settings.getfloat("TOKENIZER_BATCH_TIMEOUT", 0.25),
+        )
+        self.tokenizer.start()
+
+        # Text extraction from stored PDF/Word attachments, in its own small pool
+        self.extractor = ExtractionService(
+            spider.settings.get("EXTRACTED_DIR", os.path.join(self.base_dir, "data", "processed", "extracted_text")),
+            workers=spider.settings.getint("EXTRACTION_WORKERS", 2),
+            timeout=spider.settings.getfloat("EXTRACTION_TIMEOUT", 60.0),
+        )
+        self.extractor.start()
+
+        # Content hashes of already processed pages, for incremental crawls
+        self.state = None
+        if spider.settings.getbool("INCREMENTAL_CRAWL"):
+            self.state = CrawlState(spider.settings.get("CRAWL_STATE_PATH"))
 
     def process_item(self, item, spider):
         """
         Processes each item based on its type (policy, file, etc.).
+
+        Policy items are cleaned here and tokenized in the worker pool; the
+        returned Deferred fires with the item once every sink has written it.
+        Stored PDF and Word attachments have their text extracted in a
+        separate pool first, then go through the same path.
         """
         if item.get("type") == "policy":
-            self.save_policy(item, spider)
-            self.save_cleaned_policy(item, spider)
-            self.save_tokenized_policy(item, spider)
-            self.index_policy(item, spider)
-        elif item.get("type") == "file":
-            self.save_file(item, spider)
+            return self.process_document(prepare_policy(item, self.cleaner), item, spider)
+        if item.get("type") in ("pdf", "file") and item.get("path"):
+            start = time.perf_counter()
+            d = self.extractor.extract(item["path"], item["sha256"])
+            d.addCallback(self.extracted, item, start, spider)
+            d.addErrback(self.extraction_failed, item, spider)
+            return d
         return item
 
-    def save_policy(self, item, spider):
+    def process_document(self, doc, item, spider):
+        """
+        Tokenizes a processed document and writes it to every sink, unless it is unchanged.
+        """
+        validators = item.get("validators") or {}
+        if self.is_unchanged(doc):
+            spider.crawler.stats.inc_value("incremental/unchanged")
+            spider.logger.info(f"⏭️ Policy unchanged since last crawl, skipped: {doc.url}")
+            # The outputs are current, so the new validators can be trusted on the next crawl
+            self.state.set_processed(doc.url, doc.content_hash, doc.slug, self.cleaner_name, **validators)
+            return self.feed_item(item, doc)
+        start = time.perf_counter()
+        d = self.tokenizer.tokenize(doc.cleaned_text)
+        d.addErrback(self.tokenize_failed, doc, spider)
+        d.addCallback(self.write_policy, doc, start, spider, validators)
+        d.addCallback(lambda _: self.feed_item(item, doc))
+        return d
+
+    def feed_item(self, item, doc):
+        """
+        Adds the document's metadata and the paths of its stored artifacts to the item.
+
+        The crawl feed exports only these fields (see FEED_FIELDS), not the HTML.
+        """
+        item.update(doc.feed_record())
+        paths = {
+            "html_path": os.path.join(self.policy_dir, doc.slug + ".html"),
+            "clean_path": os.path.join(self.clean_files_dir, doc.slug + ".json"),
+            "tokenized_path": os.path.join(self.tokenized_files_dir, doc.slug + ".json"),
+        }
+        for field, path in paths.items():
+            if os.path.exists(path):
+                item[field] = path
+        return item
+
+    def extracted(self, result, item, start, spider):
+        """
+        Feeds the text extracted from an attachment into the policy corpus.
+        """
+        if not result.get("text"):
+            spider.crawler.stats.inc_value("extraction/failed")
+            spider.logger.warning(f"⚠️ No text extracted from {item['url']}: {result.get('error') or 'empty document'}")
+            return item
+        spider.crawler.stats.inc_value("extraction/extracted")
+        doc = prepare_attachment(item, result["text"], time.perf_counter() - start)
+        return self.process_document(doc, item, spider)
+
+    def extraction_failed(self, failure, item, spider):
+        """
+        Logs an extraction error. The attachment itself stays stored.
+        """
+        spider.crawler.stats.inc_value("extraction/failed")
+        spider.logger.error(f"❌ Error extracting text from {item['url']}: {failure.getErrorMessage()}")
+        return item
+
+    def is_unchanged(self, doc):
+        """
+        Returns True if this page's cleaned text matches the last crawl and its outputs still exist.
+        """
+        if self.state is None:
+            return False
+        state = self.state.get(doc.url)
+        return (
+            state is not None
+            and state["content_hash"] == doc.content_hash
+            and state["slug"] == doc.slug
+            and os.path.exists(os.path.join(self.clean_files_dir, doc.slug + ".json"))
+            and os.path.exists(os.path.join(self.tokenized_files_dir, doc.slug + ".json"))
+        )
+
+    def tokenize_failed(self, failure, doc, spider):
+        """
+        Logs a tokenization error. The policy is still saved and indexed, without tokens.
+        """
+        spider.logger.error(f"❌ Error tokenizing {doc.slug}: {failure.getErrorMessage()}")
+        return None
+
+    def write_policy(self, tokens, doc, start, spider, validators=None):
+        """
+        Passes a processed policy to every sink and records the time each one took.
+
+        On incremental crawls, the page's content hash and HTTP validators are
+        stored only after every sink has run, so a failed write never leaves
+        validators behind that would let the next crawl skip the page.
+        """
+        sinks = [self.save_cleaned_policy, self.index_policy]
+        if tokens is not None:
+            doc.set_tokens(tokens, time.perf_counter() - start)
+            sinks.insert(1, self.save_tokenized_policy)
+        if doc.raw_html is not None:
+            sinks.insert(0, self.save_policy)
+
+        for sink in sinks:
+            sink_start = time.perf_counter()
+            sink(doc, spider)
+            doc.timings[sink.__name__] = time.perf_counter() - sink_start
+        self.record_timings(doc, spider)
+
+        if self.state is not None and tokens is not None:
+            self.state.set_processed(doc.url, doc.content_hash, doc.slug, self.cleaner_name, **(validators or {}))
+
+    def record_timings(self, doc, spider):
+        """
+        Logs the per-stage processing time of a document and adds it to the crawl stats.
+        """
+        stats = spider.crawler.stats
+        for stage, seconds in doc.timings.items():
+            stats.inc_value(f"policy_pipeline/{stage}_seconds", seconds)
+        stats.inc_value("policy_pipeline/items_processed")
+        spider.logger.info(
+            f"⏱️ Processed {doc.slug} in {doc.total_time * 1000:.1f} ms ("
+            + ", ".join(f"{stage}: {seconds * 1000:.1f} ms" for stage, seconds in doc.timings.items())
+            + ")"
+        )
+
+    def save_policy(self, doc, spider):
         """
         Saves the original HTML content of a policy.
         """
-        file_name = slugify(item.get("title", "default_policy")) + ".html"
-        file_path = os.path.join(self.policy_dir, file_name)
+        file_path = os.path.join(self.policy_dir, doc.slug + ".html")
 
         with open(file_path, "w", encoding="utf-8") as f:
-            f.write(item.get("content", ""))
+            f.write(doc.raw_html)
         spider.logger.info(f"✅ Saved policy HTML: {file_path}")
 
-    def save_cleaned_policy(self, item, spider):
+    def save_cleaned_policy(self, doc, spider):
         """
         Saves the cleaned text content of a policy.
         """
-        cleaned_text = clean_html(item.get("content", ""))
-        file_name = slugify(item.get("title", "default_policy")) + ".json"
-        file_path = os.path.join(self.clean_files_dir, file_name)
-
-        cleaned_data = {
-            "title": item.get("title"),
-            "url": item.get("url"),
-            "cleaned_content": cleaned_text,
-        }
+        file_path = os.path.join(self.clean_files_dir, doc.slug + ".json")
 
         with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(cleaned_data, f, ensure_ascii=False, indent=4)
+            json.dump(doc.cleaned_record(), f, ensure_ascii=False, indent=4)
         spider.logger.info(f"✅ Saved cleaned policy JSON: {file_path}")
 
-    def save_tokenized_policy(self, item, spider):
+    def save_tokenized_policy(self, doc, spider):
         """
-        Saves the tokenized word and sentence data of a policy.
+        Saves the word and sentence boundaries of a policy as packed offsets into its cleaned text.
         """
         try:
-            cleaned_text = clean_html(item.get("content", ""))
-            tokens = tokenize_text(cleaned_text)
-            spider.logger.info(f"🔎 Tokenized {len(tokens['word_tokens'])} words and {len(tokens['sentence_tokens'])} sentences.")
-
-            file_name = slugify(item.get("title", "default_policy")) + ".json"
-            file_path = os.path.join(self.tokenized_files_dir, file_name)
-
-            tokenized_data = {
-                "title": item.get("title"),
-                "url": item.get("url"),
-                "word_tokens": tokens["word_tokens"],
-                "sentence_tokens": tokens["sentence_tokens"],
-            }
+            spider.logger.info(f"🔎 Tokenized {doc.tokens['num_tokens']} words and {doc.tokens['num_sentences']} sentences.")
+            file_path = os.path.join(self.tokenized_files_dir, doc.slug + ".json")
 
             with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(tokenized_data, f, ensure_ascii=False, indent=4)
+                json.dump(doc.tokenized_record(), f, ensure_ascii=False)
             spider.logger.info(f"✅ Saved tokenized policy JSON: {file_path}")
         except Exception as e:
             spider.logger.error(f"❌ Error in save_tokenized_policy: {e}")
 
-    def index_policy(self, item, spider):
+    def index_policy(self, doc, spider):
         """
-        Index the policy content for search.
+        Index the policy content for search. Documents are buffered and committed in batches.
         """
         try:
-            cleaned_text = clean_html(item.get("content", ""))
-            writer = AsyncWriter(self.index)
-
-            writer.add_document(
-                id=slugify(item.get("title", "default_policy")),
-                title=item.get("title", "Untitled"),
-                content=cleaned_text,
-                url=item.get("url", "Unknown URL")
+            committed_before = self.index_writer.commits
+            self.index_writer.update_document(
+                id=doc.slug,
+                title=doc.title,
+                content=doc.cleaned_text,
+                url=doc.url or "Unknown URL"
             )
-            writer.commit()
-            spider.logger.info(f"📦 Indexed policy: {item.get('title')}")
+            spider.logger.info(f"📦 Indexed policy: {doc.title}")
+            if self.index_writer.commits > committed_before:
+                spider.logger.info("💾 Committed index batch.")
         except Exception as e:
             spider.logger.error(f"❌ Error indexing policy: {e}")
 
     def close_spider(self, spider):
         """
-        Called when the spider is closed. Triggers data consolidation.
+        Called when the spider is closed. Commits the search index and triggers data consolidation.
         """
+        self.tokenizer.close()
+        self.extractor.close()
+        if self.state is not None:
+            self.state.close()
+        spider.logger.info(
+            f"🔎 Tokenized {self.tokenizer.docs_done} documents in {self.tokenizer.batches_done} batches "
+            f"({self.tokenizer.docs_per_second:.1f} docs/sec)."
+        )
+        spider.crawler.stats.set_value("policy_pipeline/tokenize_docs_per_second", self.tokenizer.docs_per_second)
+
+        try:
+            committed = self.index_writer.close()
+            spider.logger.info(f"💾 Final optimized index commit ({committed} pending documents).")
+        except Exception as e:
+            self.index_writer.cancel()
+            spider.logger.error(f"❌ Error committing search index: {e}")
+
         try:
             spider.logger.info("🔄 Starting data consolidation...")
+            arrow_dir = None
+            if spider.settings.getbool("CONSOLIDATION_ARROW"):
+                arrow_dir = os.path.join(self.base_dir, "data", "processed", "consolidated_arrow")
 
-            consolidate_data(
-                clean_dir=self.clean_files_dir,
-                tokenized_dir=self.tokenized_files_dir,
-                output_file=os.path.join(self.base_dir, "data", "processed", "consolidated_data.json")
-            )
+            if spider.settings.get("CONSOLIDATION_MODE", "full") == "incremental":
+                consolidate_incremental(
+                    clean_dir=self.clean_files_dir,
+                    tokenized_dir=self.tokenized_files_dir,
+                    output_dir=os.path.join(self.base_dir, "data", "processed", "consolidated"),
+                    num_shards=spider.settings.getint("CONSOLIDATION_SHARDS", 16),
+                    arrow_dir=arrow_dir,
+                )
+            else:
+                consolidate_data(
+                    clean_dir=self.clean_files_dir,
+                    tokenized_dir=self.tokenized_files_dir,
+                    output_file=os.path.join(self.base_dir, "data", "processed", "consolidated_data.json"),
+                    arrow_dir=arrow_dir,
+                )
 
             spider.logger.info("✅ Data consolidation completed successfully.")
         except Exception as e:
             spider.logger.error(f"❌ Error consolidating data: {e}")
 
-
-class BytesToBase64Pipeline:
-    """
-    Converts byte fields in items to base64-encoded strings.
-    """
-    def process_item(self, item, spider):
-        for key, value in item.items():
-            if isinstance(value, bytes):
-                item[key] = base64.b64encode(value).decode("utf-8")
-        return item
@@ -0,0 +1,112 @@
+import os
+import time
+import hashlib
+from slugify import slugify
+from .cleaning import clean_html
+
+
+class ProcessedPolicy:
+    """
+    A scraped policy page with all derived data computed exactly once.
+
+    Every sink in the item pipeline (raw HTML, cleaned JSON, tokenized JSON,
+    search index) reads from this object instead of re-parsing the HTML.
+    """
+
+    def __init__(self, title, url, raw_html, cleaned_text):
+        self.title = title
+        self.url = url
+        # Untitled pages are stored under a default name; their records keep the title they had
+        self.slug = slugify(title or "default_policy")
+        self.raw_html = raw_html
+        self.cleaned_text = cleaned_text
+        self.content_hash = hashlib.sha256(cleaned_text.encode("utf-8")).hexdigest()
+        self.tokens = None
+        self.timings = {}
+
+    def set_tokens(self, tokens, seconds):
+        """
+        Stores the packed token record from the tokenizer and the time it took.
+        """
+        self.tokens = tokens
+        self.timings["tokenize"] = seconds
+
+    @property
+    def total_time(self):
+        """Total seconds spent processing this document."""
+        return sum(self.timings.values())
+
+    def cleaned_record(self):
+        """Returns the record written to the cleaned JSON sink."""
+        return {
+            "title": self.title,
+            "url": self.url,
+            "cleaned_content": self.cleaned_text,
+        }
+
+    def tokenized_record(self):
+        """
+        Returns the record written to the tokenized JSON sink.
+
+        Tokens are stored as offsets into the cleaned text, and content_hash
+        ties the record to the exact text the offsets refer to.
+        """
+        return {
+            "title": self.title,
+            "url": self.url,
+            "content_hash": self.content_hash,
+            **self.tokens,
+        }
+
+    def feed_record(self):
+        """Returns the metadata exported to the crawl feed in place of the content."""
+        return {
+            "slug": self.slug,
+            "content_hash": self.content_hash,
+            "html_size": len(self.raw_html.encode("utf-8")) if self.raw_html is not None else None,
+            "text_size": len(self.cleaned_text),
+            "word_count": self.tokens["num_tokens"] if self.tokens else 0,
+            "sentence_count": self.tokens["num_sentences"] if self.tokens else 0,
+        }
+
+
+def prepare_policy(item, cleaner=clean_html):
+    """
+    Cleans a scraped policy item and derives its slug and metadata once.
+
+    Args:
+        item (dict): A policy item yielded by the spider.
+        cleaner (callable): Turns raw HTML into plain text (see cleaning.CLEANERS).
+
+    Returns:
+        ProcessedPolicy: The document without tokens, with the cleaning time recorded.
+    """
+    start = time.perf_counter()
+    title = item.get("title")
+    raw_html = item.get("content", "")
+    cleaned_text = cleaner(raw_html)
+    doc = ProcessedPolicy(title, item.get("url"), raw_html, cleaned_text)
+    doc.timings["clean"] = time.perf_counter() - start
+    return doc
+
+
+def prepare_attachment(item, text, seconds):
+    """
+    Wraps the text extracted from a stored attachment as a processed document.
+
+    The file name is used as the title, so the slug keeps the extension and
+    does not collide with the HTML page that links to the attachment.
+
+    Args:
+        item (dict): An attachment item, after the AttachmentPipeline stored it.
+        text (str): The extracted, whitespace-normalised text.
+        seconds (float): Time spent extracting the text.
+
+    Returns:
+        ProcessedPolicy: The document without tokens. raw_html is None.
+    """
+    title = item.get("file_name") or os.path.basename(item["path"])
+    doc = ProcessedPolicy(title, item.get("url"), None, text)
+    doc.timings["extract"] = seconds
+    return doc
+
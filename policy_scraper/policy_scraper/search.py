@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import OrderedDict
+from whoosh import index, highlight
+from whoosh.qparser import MultifieldParser
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_INDEX_DIR = os.path.join(BASE_DIR, "output", "index")
+DEFAULT_CLEAN_DIR = os.path.join(BASE_DIR, "data", "processed", "clean_json_files")
+
+
+class SearcherPool:
+    """
+    Long-lived Whoosh searchers for ranked queries over the policy index.
+
+    Searchers are not thread-safe, so each query checks one out of the pool
+    and returns it afterwards. A searcher is only reopened when the index has
+    been committed to since it was opened. Results are kept in an LRU cache
+    that is cleared whenever the index generation changes.
+
+    When the index does not store "content", snippets are highlighted from
+    the cleaned JSON file of each hit.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, size=4, cache_size=256,
+                 clean_dir=DEFAULT_CLEAN_DIR, check_interval=1.0):
+        self.ix = index.open_dir(index_dir)
+        self.size = size
+        self.cache_size = cache_size
+        self.clean_dir = clean_dir
+        self.check_interval = check_interval
+        self.parser = MultifieldParser(["title", "content"], schema=self.ix.schema)
+        self.content_stored = self.ix.schema["content"].stored
+
+        self._searchers = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._generation = self.ix.latest_generation()
+        self._last_check = time.monotonic()
+
+    def _check_generation(self):
+        """Clears the result cache if the index was committed to since the last check."""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        generation = self.ix.latest_generation()
+        if generation != self._generation:
+            with self._lock:
+                self._generation = generation
+                self._cache.clear()
+
+    def _checkout(self):
+        try:
+            searcher = self._searchers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            searcher = self.ix.searcher() if create else self._searchers.get()
+
+        if not searcher.up_to_date():
+            refreshed = searcher.refresh()
+            if refreshed is not searcher:
+                # refresh() opens the new segments in a new searcher; release the old one's files
+                searcher.close()
+            searcher = refreshed
+        return searcher
+
+    def _load_content(self, doc_id):
+        path = os.path.join(self.clean_dir, f"{doc_id}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["cleaned_content"]
+        except (OSError, ValueError, KeyError):
+            return ""
+
+    def search(self, query_string, limit=10, use_cache=True):
+        """
+        Runs a ranked (BM25F) query over policy titles and content.
+
+        Args:
+            query_string (str): The query, in Whoosh query syntax.
+            limit (int): Maximum number of hits.
+            use_cache (bool): Serve repeated queries from the result cache.
+
+        Returns:
+            list[dict]: Hits with id, title, url, score and a highlighted snippet.
+        """
+        self._check_generation()
+        key = (query_string, limit)
+        if use_cache:
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+
+        searcher = self._checkout()
+        try:
+            results = searcher.search(self.parser.parse(query_string), limit=limit, terms=True)
+            results.fragmenter = highlight.ContextFragmenter(maxchars=200, surround=40)
+            results.formatter = highlight.UppercaseFormatter()
+            hits = []
+            for hit in results:
+                if self.content_stored:
+                    snippet = hit.highlights("content")
+                else:
+                    snippet = hit.highlights("content", text=self._load_content(hit["id"]))
+                hits.append({
+                    "id": hit["id"],
+                    "title": hit["title"],
+                    "url": hit["url"],
+                    "score": hit.score,
+                    "snippet": snippet,
+                })
+        finally:
+            self._searchers.put(searcher)
+
+        if use_cache and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = hits
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return hits
+
+    def close(self):
+        """
+        Closes every pooled searcher.
+        """
+        while True:
+            try:
+                self._searchers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+def benchmark(pool, queries, repeat=20, use_cache=False):
+    """
+    Measures query latency over the pool.
+
+    Returns:
+        dict: Number of queries run and p50/p99/max latency in milliseconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        for query_string in queries:
+            start = time.perf_counter()
+            pool.search(query_string, use_cache=use_cache)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+    return {
+        "queries": len(latencies),
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "max_ms": latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the policy index.")
+    parser.add_argument("query", nargs="+", help="Query string(s), in Whoosh query syntax")
+    parser.add_argument("--limit", type=int, default=10, help="Maximum number of hits")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Whoosh index directory")
+    parser.add_argument("--bench", action="store_true", help="Report p50/p99 latency instead of results")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per query when benchmarking")
+    parser.add_argument("--cached", action="store_true", help="Benchmark with the result cache enabled")
+    args = parser.parse_args()
+
+    pool = SearcherPool(args.index_dir)
+    try:
+        if args.bench:
+            stats = benchmark(pool, args.query, repeat=args.repeat, use_cache=args.cached)
+            print(f"⏱️ {stats['queries']} queries: p50 {stats['p50_ms']:.2f} ms, "
+                  f"p99 {stats['p99_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+            return
+
+        for query_string in args.query:
+            hits = pool.search(query_string, limit=args.limit)
+            print(f"🔎 {query_string}: {len(hits)} hits")
+            for rank, hit in enumerate(hits, 1):
+                print(f"{rank:>3}. [{hit['score']:.2f}] {hit['title']} — {hit['url']}")
+                if hit["snippet"]:
+                    print(f"     {hit['snippet']}")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
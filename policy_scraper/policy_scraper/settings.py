@@ -34,12 +34,13 @@ SPIDER_MIDDLEWARES = {
 # Enable or disable downloader middlewares
 DOWNLOADER_MIDDLEWARES = {
     "scrapy.downloadermiddlewares.retry.RetryMiddleware": 550,
+    "policy_scraper.middlewares.ConditionalRequestMiddleware": 560,  # Only active when INCREMENTAL_CRAWL is on
     "scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware": 590,
 }
 
 # Configure item pipelines
 ITEM_PIPELINES = {
-    "policy_scraper.pipelines.BytesToBase64Pipeline": 300,  # Pipeline to handle bytes conversion
+    "policy_scraper.attachments.AttachmentPipeline": 300,  # Streams PDF/Word attachments to disk
     "policy_scraper.pipelines.PolicyScraperPipeline": 400,  # Custom pipeline for saving files
 }
 
@@ -50,6 +51,11 @@ AUTOTHROTTLE_MAX_DELAY = 60
 AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
 AUTOTHROTTLE_DEBUG = False
 
+# Incremental crawls: send conditional requests for policy pages and skip pages whose
+# cleaned text has not changed. State is kept per URL in CRAWL_STATE_PATH. Policy pages
+# then bypass the HTTP cache and are revalidated with the server instead.
+INCREMENTAL_CRAWL = False
+
 # Enable and configure HTTP caching
 HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 0
@@ -70,15 +76,36 @@ FILES_STORE = os.path.join(BASE_DIR, "data", "raw", "files")        # Directory
 PDF_STORE = os.path.join(BASE_DIR, "data", "raw", "pdfs")           # Directory specifically for PDFs
 POLICY_STORE = os.path.join(BASE_DIR, "data", "raw", "policies")   
 
-# JSON output settings
-FEEDS = {
-    "output.json": {
-        "format": "json",
-        "encoding": "utf8",
-        "store_empty": False,
-        "indent": 4,
-    },
-}
+# Attachment downloads go through the Scrapy downloader and are written to PDF_STORE /
+# FILES_STORE as <sha256>.<ext> as they arrive
+ATTACHMENT_CONCURRENCY = 2
+# Bytes. Scrapy buffers each response while it downloads, so this is also the most memory
+# one attachment holds; larger attachments are dropped
+ATTACHMENT_MAX_SIZE = 20 * 1024 * 1024
+ATTACHMENT_TIMEOUT = 60.0  # Seconds
+
+# Text extraction from stored PDF/.docx attachments, cached per file hash in EXTRACTED_DIR
+EXTRACTION_WORKERS = 2
+EXTRACTION_TIMEOUT = 60.0  # Seconds per file
+EXTRACTED_DIR = os.path.join(BASE_DIR, "data", "processed", "extracted_text")
+
+CRAWL_STATE_PATH = os.path.join(BASE_DIR, "data", "state", "crawl_state.sqlite3")
+
+# Crawl feed. "metadata" streams compact JSONL with only the fields below to
+# output/feed/, which can be tailed during the crawl. "full" is the old
+# pretty-printed output.json, including each page's raw HTML. The spider builds
+# FEEDS from these (feeds.build_feeds), so they can be overridden with -s on the
+# command line; -o still replaces the feed altogether.
+FEED_MODE = "metadata"
+FEED_COMPRESSION = None  # None, "gzip" or "zstd" (needs the zstandard package)
+FEED_FLUSH_ITEMS = 1  # Flush the feed file every N items; raise this when compressing
+FEED_ROTATE_ITEMS = 0  # Start a new feed file every N items (0 keeps a single file)
+FEED_FIELDS = [
+    "type", "url", "title", "file_name", "source_url",
+    "slug", "content_hash", "sha256", "content_type",
+    "html_size", "size", "text_size", "word_count", "sentence_count",
+    "html_path", "path", "clean_path", "tokenized_path",
+]
 
 # Logging
 LOG_LEVEL = "INFO"  # Set to "DEBUG" for more detailed output during development
@@ -91,3 +118,31 @@ TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
 # Export encoding for consistent file formats
 FEED_EXPORT_ENCODING = "utf-8"
+
+# HTML cleaner: "lxml" keeps only the main content region and drops menus, breadcrumbs
+# and other repeated site chrome; "bs4" is the original BeautifulSoup full-page text.
+# Switching changes the cleaned_content of every document, so compare both with
+# benchmarks/bench_cleaning.py first.
+# The crawl state records the cleaner of every page, so after a change the next incremental
+# crawl fetches every page in full instead of accepting 304 Not Modified, and re-cleans it.
+HTML_CLEANER = "bs4"
+
+# Whoosh indexing: one writer per crawl, committed every N documents or T seconds
+WHOOSH_BATCH_SIZE = 500
+WHOOSH_COMMIT_INTERVAL = 60.0  # Seconds
+WHOOSH_WRITER_LIMITMB = 256
+WHOOSH_STORE_CONTENT = True  # False keeps only positions/offsets for "content" (delete output/index to rebuild)
+
+# Tokenization worker pool (0 workers tokenizes inline on the reactor thread)
+TOKENIZER_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Leave a core for the reactor
+TOKENIZER_BATCH_SIZE = 16
+TOKENIZER_BATCH_TIMEOUT = 0.25  # Seconds to wait for a batch to fill before sending it
+
+# Consolidation: "full" rewrites data/processed/consolidated_data.json on every crawl,
+# "incremental" only re-merges changed documents into data/processed/consolidated/*.jsonl.
+# Every corpus reader accepts both layouts.
+CONSOLIDATION_MODE = "full"
+CONSOLIDATION_SHARDS = 16
+# Also export data/processed/consolidated_arrow (datasets.load_from_disk). Incremental mode
+# re-exports only when the corpus changed; full mode rebuilds the export on every crawl.
+CONSOLIDATION_ARROW = False
@@ -2,6 +2,7 @@ import scrapy
 import os  # Ensure os is imported
 from urllib.parse import urljoin
 from scrapy.utils.response import get_base_url
+from policy_scraper.feeds import build_feeds
 
 
 class PolicySpider(scrapy.Spider):
@@ -9,6 +10,13 @@ class PolicySpider(scrapy.Spider):
     allowed_domains = ["otago.ac.nz"]
     start_urls = ["https://www.otago.ac.nz/staff/policies"]
 
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        # Built from the final settings rather than in settings.py, so -s FEED_MODE=... works.
+        # At project priority, so feeds given with -o/-O on the command line still win
+        settings.set("FEEDS", build_feeds(settings), priority="project")
+
     def parse(self, response):
         """
         Parse the main policy page and extract links to individual policies.
@@ -26,8 +34,8 @@ class PolicySpider(scrapy.Spider):
                 self.logger.info(f"Ignoring unsupported link: {absolute_url}")
                 continue
 
-            # Send request to parse individual policy pages
-            yield scrapy.Request(url=absolute_url, callback=self.parse_policy)
+            # Send request to parse individual policy pages (conditional on incremental crawls)
+            yield scrapy.Request(url=absolute_url, callback=self.parse_policy, meta={"conditional": True})
 
     def parse_policy(self, response):
         """
@@ -52,39 +60,19 @@ class PolicySpider(scrapy.Spider):
             "url": response.url,
             "title": policy_title,
             "content": response.body.decode("utf-8"),
+            # ETag/Last-Modified, stored by the pipeline once the page is written (incremental crawls)
+            "validators": response.meta.get("validators"),
         }
 
-        # Extract downloadable links for files
+        # Extract downloadable links for files. They are streamed to disk by the
+        # AttachmentPipeline, so only their metadata travels through the item pipeline.
         file_links = response.css("a::attr(href)").getall()
         for file_link in file_links:
             absolute_file_url = urljoin(get_base_url(response), file_link)
             if any(absolute_file_url.endswith(ext) for ext in [".pdf", ".doc", ".docx"]):
-                yield scrapy.Request(
-                    url=absolute_file_url,
-                    callback=self.save_file,
-                    meta={"file_name": os.path.basename(file_link)},
-                )
-
-    def save_file(self, response):
-        """
-        Save downloadable files like PDFs or Word documents.
-        """
-        file_name = response.meta.get("file_name", "downloaded_file")
-        content_type = response.headers.get("Content-Type", b"").decode("utf-8")
-
-        # Determine the type of file and yield it for saving via pipeline
-        if "application/pdf" in content_type:
-            file_type = "pdf"
-        elif "application/msword" in content_type or "application/vnd.openxmlformats-officedocument" in content_type:
-            file_type = "file"
-        else:
-            self.logger.info(f"Skipping unsupported file type: {response.url}")
-            return
-
-        yield {
-            "type": file_type,
-            "url": response.url,
-            "file_name": file_name,
-            "content_type": content_type,
-            "content": response.body,
-        }
+                yield {
+                    "type": "attachment",
+                    "url": absolute_file_url,
+                    "file_name": os.path.basename(file_link),
+                    "source_url": response.url,
+                }
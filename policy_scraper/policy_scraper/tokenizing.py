@@ -1,29 +1,183 @@
-import spacy
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .tokenstore import pack_doc, TokenizedDocument
+
+# Only token text and sentence boundaries are kept, so every trainable component
+# of en_core_web_sm is excluded and a rule-based sentencizer splits sentences.
+SPACY_MODEL = "en_core_web_sm"
+EXCLUDED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"]
+
+_nlp = None
+
+
+def get_nlp():
+    """
+    Returns the trimmed SpaCy pipeline (tokenizer and sentencizer), loading it on first use.
+    """
+    global _nlp
+    if _nlp is None:
+        # Imported here: importing spacy alone takes seconds, and only workers need it
+        import spacy
+        _nlp = spacy.load(SPACY_MODEL, exclude=EXCLUDED_COMPONENTS)
+        _nlp.add_pipe("sentencizer")
+    return _nlp
 
-# Load the SpaCy language model
-nlp = spacy.load("en_core_web_sm")
 
 def tokenize_text(text):
     """
     Tokenizes a given text into words and sentences using SpaCy.
-    
+
     Args:
         text (str): The input text to tokenize.
-        
+
     Returns:
-        dict: A dictionary containing word tokens and sentence tokens.
+        dict: The packed token record, with word and sentence offsets into text
+        (read it with tokenstore.TokenizedDocument).
+    """
+    return pack_doc(get_nlp()(text))
+
+
+def tokenize_batch(texts):
+    """
+    Tokenizes a batch of texts with nlp.pipe.
+
+    Args:
+        texts (list[str]): The input texts to tokenize.
+
+    Returns:
+        list[dict]: One packed token record per input text. Workers return
+        offsets rather than strings, so results are cheap to send back.
+    """
+    nlp = get_nlp()
+    return [pack_doc(doc) for doc in nlp.pipe(texts, batch_size=len(texts) or 1)]
+
+
+class TokenizationService:
     """
-    doc = nlp(text)
-    word_tokens = [token.text for token in doc]  # Extract individual words
-    sentence_tokens = [sent.text for sent in doc.sents]  # Extract sentences
-    return {
-        "word_tokens": word_tokens,
-        "sentence_tokens": sentence_tokens,
-    }
+    Tokenizes documents in a process pool without blocking the Twisted reactor.
+
+    Texts passed to tokenize() are grouped into batches of batch_size (or
+    whatever has arrived after batch_timeout seconds) and sent to a worker
+    process, which runs them through nlp.pipe. tokenize() returns a Deferred
+    that fires on the reactor thread with the tokens once the batch is done,
+    so downloads continue while documents are being tokenized.
+
+    With workers=0 tokenization runs inline, which is useful for debugging.
+    Batches are scheduled on the global reactor unless another one (e.g. a
+    twisted.internet.task.Clock in tests) is passed as reactor.
+    """
+
+    def __init__(self, workers=None, batch_size=16, batch_timeout=0.25, reactor=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        self._reactor = reactor
+        self.executor = None
+        self.pending = []
+        self.flush_call = None
+        self.docs_done = 0
+        self.batches_done = 0
+        self.first_submit = None
+        self.last_delivery = None
+
+    @property
+    def reactor(self):
+        if self._reactor is None:
+            # Imported here so that importing this module never installs a reactor
+            # before Scrapy installs the one configured in TWISTED_REACTOR.
+            from twisted.internet import reactor
+            self._reactor = reactor
+        return self._reactor
+
+    def start(self):
+        """
+        Starts the worker processes. Each worker loads the SpaCy pipeline once.
+        """
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=get_nlp,
+            )
+
+    def tokenize(self, text):
+        """
+        Queues a text for tokenization.
+
+        Args:
+            text (str): The input text to tokenize.
+
+        Returns:
+            Deferred: Fires with the packed token record of the text.
+        """
+        from twisted.internet import defer
+
+        if self.executor is None:
+            tokens = tokenize_text(text)
+            self.docs_done += 1
+            return defer.succeed(tokens)
+
+        d = defer.Deferred()
+        self.pending.append((text, d))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.flush_call is None:
+            self.flush_call = self.reactor.callLater(self.batch_timeout, self.flush)
+        return d
+
+    def flush(self):
+        """
+        Sends all queued texts to the worker pool as one batch.
+        """
+        if self.flush_call is not None and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        if self.first_submit is None:
+            self.first_submit = time.perf_counter()
+        future = self.executor.submit(tokenize_batch, [text for text, _ in batch])
+        future.add_done_callback(lambda f: self.reactor.callFromThread(self._deliver, batch, f))
+
+    def _deliver(self, batch, future):
+        try:
+            results = future.result()
+        except Exception as e:
+            for _, d in batch:
+                d.errback(e)
+            return
+
+        self.docs_done += len(batch)
+        self.batches_done += 1
+        self.last_delivery = time.perf_counter()
+        for (_, d), tokens in zip(batch, results):
+            d.callback(tokens)
+
+    @property
+    def docs_per_second(self):
+        """Documents tokenized per second of wall time since the first batch was submitted."""
+        if self.first_submit is None or self.last_delivery is None:
+            return 0.0
+        elapsed = self.last_delivery - self.first_submit
+        return self.docs_done / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        """
+        Flushes queued texts and shuts the worker pool down.
+        """
+        if self.executor is not None:
+            self.flush()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
 
 # Example usage for testing
 if __name__ == "__main__":
     sample_text = "This is a test sentence. SpaCy makes NLP easy!"
-    tokens = tokenize_text(sample_text)
-    print("Word Tokens:", tokens["word_tokens"])
-    print("Sentence Tokens:", tokens["sentence_tokens"])
+    tokens = TokenizedDocument(sample_text, tokenize_text(sample_text))
+    print("Word Tokens:", list(tokens.word_tokens))
+    print("Sentence Tokens:", list(tokens.sentence_tokens))
@@ -0,0 +1,178 @@
+import base64
+
+# Tokenized records store token and sentence boundaries as offsets into the
+# cleaned text instead of copies of the strings. Each list of (start, end)
+# spans is delta-encoded as (gap since the previous end, length) pairs,
+# packed as unsigned varints and base64-encoded, which is typically two or
+# three characters per token.
+FORMAT = "offsets-v1"
+
+
+def encode_spans(spans):
+    """
+    Packs an ordered list of non-overlapping (start, end) character spans into a string.
+    """
+    out = bytearray()
+    prev = 0
+    for start, end in spans:
+        if start < prev or end < start:
+            raise ValueError(f"Spans must be ordered and non-overlapping, got ({start}, {end}) after {prev}")
+        for value in (start - prev, end - start):
+            while value >= 0x80:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        prev = end
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+
+def decode_spans(data):
+    """
+    Unpacks a string written by encode_spans into a list of (start, end) spans.
+    """
+    spans = []
+    pos = 0
+    gap = None
+    value = shift = 0
+    for byte in base64.b64decode(data):
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if gap is None:
+            gap = value
+        else:
+            start = pos + gap
+            pos = start + value
+            spans.append((start, pos))
+            gap = None
+        value = shift = 0
+    return spans
+
+
+def pack_doc(doc):
+    """
+    Builds the packed token record of a SpaCy Doc.
+
+    Returns:
+        dict: format, token and sentence counts, and the packed offsets.
+    """
+    return {
+        "format": FORMAT,
+        "num_tokens": len(doc),
+        "num_sentences": sum(1 for _ in doc.sents),
+        "token_offsets": encode_spans((token.idx, token.idx + len(token.text)) for token in doc),
+        "sentence_offsets": encode_spans((sent.start_char, sent.end_char) for sent in doc.sents),
+    }
+
+
+def _align(text, strings):
+    spans = []
+    pos = 0
+    for string in strings:
+        start = text.find(string, pos)
+        if start < 0:
+            return None
+        pos = start + len(string)
+        spans.append((start, pos))
+    return spans
+
+
+def pack_strings(text, word_tokens, sentence_tokens):
+    """
+    Converts a legacy record of token and sentence strings to the packed format.
+
+    Returns:
+        dict: The packed record, or None if the strings can't be found in order in text.
+    """
+    token_spans = _align(text, word_tokens)
+    sentence_spans = _align(text, sentence_tokens)
+    if token_spans is None or sentence_spans is None:
+        return None
+    return {
+        "format": FORMAT,
+        "num_tokens": len(token_spans),
+        "num_sentences": len(sentence_spans),
+        "token_offsets": encode_spans(token_spans),
+        "sentence_offsets": encode_spans(sentence_spans),
+    }
+
+
+class SpanSequence:
+    """
+    A read-only sequence of substrings of a text, decoded on first access.
+
+    Behaves like the list of strings it replaces: supports len(), indexing,
+    slicing and iteration, but only slices the text for the items read.
+    """
+
+    def __init__(self, text, packed, length=None):
+        self.text = text
+        self._packed = packed
+        self._spans = None
+        self._length = length
+
+    @property
+    def spans(self):
+        """The (start, end) character offsets of every item."""
+        if self._spans is None:
+            self._spans = decode_spans(self._packed)
+        return self._spans
+
+    def __len__(self):
+        if self._length is None:
+            self._length = len(self.spans)
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.text[start:end] for start, end in self.spans[index]]
+        start, end = self.spans[index]
+        return self.text[start:end]
+
+    def __iter__(self):
+        text = self.text
+        for start, end in self.spans:
+            yield text[start:end]
+
+
+class TokenizedDocument:
+    """
+    Lazy reader for a tokenized record.
+
+    Takes the cleaned text and a tokenized record (or consolidated entry) in
+    either the packed offset format or the legacy format with
+    "word_tokens"/"sentence_tokens" string lists, and exposes both through
+    word_tokens and sentence_tokens.
+    """
+
+    def __init__(self, text, record):
+        self.text = text
+        if record.get("format") == FORMAT:
+            self.word_tokens = SpanSequence(text, record["token_offsets"], record.get("num_tokens"))
+            self.sentence_tokens = SpanSequence(text, record["sentence_offsets"], record.get("num_sentences"))
+        else:
+            self.word_tokens = record.get("word_tokens") or []
+            self.sentence_tokens = record.get("sentence_tokens") or []
+
+    @property
+    def num_tokens(self):
+        return len(self.word_tokens)
+
+    @property
+    def num_sentences(self):
+        return len(self.sentence_tokens)
+
+
+def sentence_tokens(entry):
+    """
+    Returns the sentences of a consolidated entry, whichever token format it uses.
+    """
+    return TokenizedDocument(entry.get("cleaned_content", ""), entry).sentence_tokens
+
+
+def word_tokens(entry):
+    """
+    Returns the word tokens of a consolidated entry, whichever token format it uses.
+    """
+    return TokenizedDocument(entry.get("cleaned_content", ""), entry).word_tokens
@@ -0,0 +1,344 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+from .corpus import iter_documents
+from .tokenstore import sentence_tokens
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_CORPUS = os.path.join(BASE_DIR, "data", "processed", "consolidated")
+LEGACY_CORPUS = os.path.join(BASE_DIR, "data", "processed", "consolidated_data.json")
+DEFAULT_VECTOR_DIR = os.path.join(BASE_DIR, "output", "vector_index")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+VECTORS_NAME = "vectors.npy"
+PASSAGES_NAME = "passages.jsonl"
+OFFSETS_NAME = "offsets.npy"
+MANIFEST_NAME = "manifest.json"
+
+# Corpus fields read per document: packed sentence offsets, or legacy sentence strings
+DOC_FIELDS = ["id", "title", "url", "cleaned_content", "format", "num_sentences", "sentence_offsets", "sentence_tokens"]
+
+
+def chunk_passages(sentences, max_words=120):
+    """
+    Groups consecutive sentences into passages of at most max_words words.
+
+    A single sentence longer than max_words becomes a passage of its own.
+    """
+    passages = []
+    current, count = [], 0
+    for sentence in sentences:
+        words = len(sentence.split())
+        if current and count + words > max_words:
+            passages.append(" ".join(current))
+            current, count = [], 0
+        current.append(sentence)
+        count += words
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _load_model(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _doc_id(doc):
+    if doc.get("id"):
+        return doc["id"]
+    from slugify import slugify
+    return slugify(doc.get("title") or "default_policy")
+
+
+def build_vector_index(corpus_path=DEFAULT_CORPUS, index_dir=DEFAULT_VECTOR_DIR, model_name=DEFAULT_MODEL,
+                       dtype="float16", batch_size=64, max_words=120, model=None):
+    """
+    Builds or incrementally updates the dense passage index.
+
+    Documents are split into passages along their sentence boundaries and
+    embedded in batches. Vectors are stored as a (passages x dim) matrix in
+    vectors.npy, with passage metadata in passages.jsonl. A manifest records
+    the content hash of every document, so on later runs only added or
+    changed documents are embedded again; rows of unchanged documents are
+    copied from the previous matrix.
+
+    Args:
+        corpus_path (str): Consolidated corpus (JSON array, JSONL file or shard directory).
+        index_dir (str): Output directory.
+        model_name (str): SentenceTransformer model.
+        dtype (str): "float16" or "float32" storage for the vectors.
+        batch_size (int): Passages per encoding batch.
+        max_words (int): Maximum words per passage.
+        model (optional): A loaded SentenceTransformer, to avoid loading it again.
+
+    Returns:
+        dict: Counts of embedded, reused and removed documents, and total passages.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+    vectors_path = os.path.join(index_dir, VECTORS_NAME)
+    passages_path = os.path.join(index_dir, PASSAGES_NAME)
+
+    old_docs, old_vectors, old_passages = {}, None, None
+    if os.path.exists(manifest_path) and os.path.exists(vectors_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # A different model or dtype invalidates every vector
+        if manifest["model"] == model_name and manifest["dtype"] == dtype:
+            old_docs = manifest["documents"]
+            old_vectors = np.load(vectors_path, mmap_mode="r")
+            old_passages = PassageStore(index_dir)
+
+    # Plan the new layout: reuse rows of unchanged documents, collect passages to embed
+    plan, new_passages = [], []
+    for doc in iter_documents(corpus_path, fields=DOC_FIELDS):
+        doc_id = _doc_id(doc)
+        content_hash = hashlib.sha256(doc["cleaned_content"].encode("utf-8")).hexdigest()
+        old = old_docs.get(doc_id)
+        if old is not None and old["sha256"] == content_hash:
+            plan.append((doc_id, content_hash, "reuse", old))
+            continue
+
+        sentences = list(sentence_tokens(doc)) or [doc["cleaned_content"]]
+        passages = [
+            {"doc_id": doc_id, "title": doc.get("title"), "url": doc.get("url"), "text": text}
+            for text in chunk_passages(sentences, max_words=max_words)
+        ]
+        plan.append((doc_id, content_hash, "embed", (len(new_passages), len(passages))))
+        new_passages.extend(passages)
+
+    if not plan:
+        print(f"No documents found in {corpus_path}; vector index left unchanged")
+        return {"embedded": 0, "reused": 0, "removed": 0, "passages": 0}
+
+    new_vectors = None
+    if new_passages:
+        model = model or _load_model(model_name)
+        new_vectors = model.encode(
+            [passage["text"] for passage in new_passages],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(dtype)
+
+    dim = new_vectors.shape[1] if new_vectors is not None else (
+        old_vectors.shape[1] if old_vectors is not None else 0)
+    total = sum(entry[3]["count"] if entry[2] == "reuse" else entry[3][1] for entry in plan)
+
+    # Write the new matrix, sidecar and manifest next to the old ones, then swap them in
+    tmp_vectors = os.path.join(index_dir, "vectors.tmp.npy")
+    tmp_passages = passages_path + ".tmp"
+    vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=dtype, shape=(total, dim))
+    offsets = np.zeros(total, dtype=np.int64)
+    documents = {}
+    row = 0
+    with open(tmp_passages, "wb") as out:
+        for doc_id, content_hash, action, source in plan:
+            if action == "reuse":
+                start, count = source["start"], source["count"]
+                vectors[row:row + count] = old_vectors[start:start + count]
+                passages = (old_passages.get(i) for i in range(start, start + count))
+            else:
+                start, count = source
+                vectors[row:row + count] = new_vectors[start:start + count]
+                passages = new_passages[start:start + count]
+            for i, passage in enumerate(passages):
+                offsets[row + i] = out.tell()
+                out.write((json.dumps(passage, ensure_ascii=False) + "\n").encode("utf-8"))
+            documents[doc_id] = {"sha256": content_hash, "start": row, "count": count}
+            row += count
+    vectors.flush()
+    del vectors
+
+    if old_passages is not None:
+        old_passages.close()
+    del old_vectors
+    tmp_offsets = os.path.join(index_dir, "offsets.tmp.npy")
+    np.save(tmp_offsets, offsets)
+    os.replace(tmp_vectors, vectors_path)
+    os.replace(tmp_passages, passages_path)
+    os.replace(tmp_offsets, os.path.join(index_dir, OFFSETS_NAME))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "dtype": dtype, "dim": dim, "documents": documents}, f)
+
+    summary = {
+        "embedded": sum(1 for entry in plan if entry[2] == "embed"),
+        "reused": sum(1 for entry in plan if entry[2] == "reuse"),
+        "removed": len(old_docs.keys() - documents.keys()),
+        "passages": total,
+    }
+    print(f"Vector index updated in {index_dir}: {summary['embedded']} documents embedded, "
+          f"{summary['reused']} reused, {summary['removed']} removed, {summary['passages']} passages")
+    return summary
+
+
+class PassageStore:
+    """
+    Random access to passage metadata by row, without loading the whole sidecar.
+    """
+
+    def __init__(self, index_dir):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_NAME), mmap_mode="r")
+        self.file = open(os.path.join(index_dir, PASSAGES_NAME), "rb")
+
+    def get(self, row):
+        self.file.seek(int(self.offsets[row]))
+        return json.loads(self.file.readline())
+
+    def close(self):
+        self.file.close()
+
+
+class VectorIndex:
+    """
+    Top-k semantic search over the memory-mapped passage vectors.
+
+    The matrix is scanned in chunks: each chunk is scored with one matrix-vector
+    product and only its best k rows (found with argpartition) are kept, so a
+    query touches every vector once without materialising all scores.
+    """
+
+    def __init__(self, index_dir=DEFAULT_VECTOR_DIR, model=None, chunk_rows=65536):
+        with open(os.path.join(index_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_NAME), mmap_mode="r")
+        self.passages = PassageStore(index_dir)
+        self.model = model
+        self.chunk_rows = chunk_rows
+
+    def embed(self, text):
+        if self.model is None:
+            self.model = _load_model(self.manifest["model"])
+        return self.model.encode([text], normalize_embeddings=True, convert_to_numpy=True)[0].astype(np.float32)
+
+    def top_k(self, query_vector, k=10):
+        """
+        Returns the rows and scores of the k passages closest to query_vector, best first.
+        """
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            chunk = np.asarray(self.vectors[start:start + self.chunk_rows], dtype=np.float32)
+            scores = chunk @ query_vector
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        return best_rows[order], best_scores[order]
+
+    def search(self, query, k=10):
+        """
+        Returns the k passages most similar to the query.
+
+        Returns:
+            list[dict]: Passages (doc_id, title, url, text) with their cosine score.
+        """
+        rows, scores = self.top_k(self.embed(query), k=k)
+        hits = []
+        for row, score in zip(rows, scores):
+            hit = self.passages.get(row)
+            hit["score"] = float(score)
+            hits.append(hit)
+        return hits
+
+    def hybrid_search(self, query, k=10, alpha=0.5, searcher_pool=None, candidates=50):
+        """
+        Ranks documents by a mix of dense similarity and Whoosh BM25 scores.
+
+        Each document's dense score is its best passage score. Both scores are
+        scaled by the best score of their kind, then combined as
+        alpha * dense + (1 - alpha) * bm25.
+
+        Args:
+            query (str): The query.
+            k (int): Number of documents to return.
+            alpha (float): Weight of the dense score.
+            searcher_pool (SearcherPool, optional): Pool over the Whoosh index. Opens the default index if omitted.
+            candidates (int): Candidates taken from each ranking before combining.
+
+        Returns:
+            list[dict]: Documents with combined, dense and bm25 scores and their best passage.
+        """
+        from .search import SearcherPool
+
+        pool = searcher_pool or SearcherPool()
+        docs = {}
+        for hit in self.search(query, k=candidates):
+            doc = docs.setdefault(hit["doc_id"], {
+                "doc_id": hit["doc_id"], "title": hit["title"], "url": hit["url"],
+                "dense": 0.0, "bm25": 0.0, "passage": hit["text"],
+            })
+            if hit["score"] > doc["dense"]:
+                doc["dense"], doc["passage"] = hit["score"], hit["text"]
+        try:
+            for hit in pool.search(query, limit=candidates):
+                doc = docs.setdefault(hit["id"], {
+                    "doc_id": hit["id"], "title": hit["title"], "url": hit["url"],
+                    "dense": 0.0, "bm25": 0.0, "passage": hit["snippet"],
+                })
+                doc["bm25"] = hit["score"]
+        finally:
+            if searcher_pool is None:
+                pool.close()
+
+        max_dense = max((doc["dense"] for doc in docs.values()), default=0.0) or 1.0
+        max_bm25 = max((doc["bm25"] for doc in docs.values()), default=0.0) or 1.0
+        for doc in docs.values():
+            doc["score"] = alpha * doc["dense"] / max_dense + (1 - alpha) * doc["bm25"] / max_bm25
+        return sorted(docs.values(), key=lambda doc: doc["score"], reverse=True)[:k]
+
+    def close(self):
+        self.passages.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the dense policy passage index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build or update the index from the consolidated corpus")
+    build.add_argument("--corpus", help="Defaults to the sharded corpus, or consolidated_data.json without one")
+    build.add_argument("--index-dir", default=DEFAULT_VECTOR_DIR)
+    build.add_argument("--model", default=DEFAULT_MODEL)
+    build.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    query = subparsers.add_parser("query", help="Find the passages closest to a query")
+    query.add_argument("query")
+    query.add_argument("-k", type=int, default=10)
+    query.add_argument("--index-dir", default=DEFAULT_VECTOR_DIR)
+    query.add_argument("--hybrid", action="store_true", help="Combine with Whoosh BM25 scores")
+    query.add_argument("--alpha", type=float, default=0.5, help="Weight of the dense score in hybrid mode")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        corpus = args.corpus or (DEFAULT_CORPUS if os.path.isdir(DEFAULT_CORPUS) else LEGACY_CORPUS)
+        build_vector_index(corpus, args.index_dir, model_name=args.model, dtype=args.dtype)
+        return
+
+    vector_index = VectorIndex(args.index_dir)
+    try:
+        if args.hybrid:
+            for rank, doc in enumerate(vector_index.hybrid_search(args.query, k=args.k, alpha=args.alpha), 1):
+                print(f"{rank:>3}. [{doc['score']:.3f} = dense {doc['dense']:.3f} / bm25 {doc['bm25']:.2f}] "
+                      f"{doc['title']} — {doc['url']}")
+                print(f"     {doc['passage'][:200]}")
+        else:
+            for rank, hit in enumerate(vector_index.search(args.query, k=args.k), 1):
+                print(f"{rank:>3}. [{hit['score']:.3f}] {hit['title']} — {hit['url']}")
+                print(f"     {hit['text'][:200]}")
+    finally:
+        vector_index.close()
+
+
+if __name__ == "__main__":
+    main()
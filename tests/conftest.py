@@ -0,0 +1,59 @@
+from concurrent.futures import Future
+import pytest
+from twisted.internet.task import Clock
+
+
+class FakeReactor(Clock):
+    """A Clock that also takes callFromThread, running such calls at the next advance()."""
+
+    def callFromThread(self, f, *args, **kwargs):
+        self.callLater(0, f, *args, **kwargs)
+
+
+class ManualExecutor:
+    """
+    Executor that runs submitted jobs inline, when the test calls run().
+
+    Attributes:
+        jobs (list): (function, args, future) of every job not yet run.
+        shutdowns (list): Keyword arguments of every shutdown() call.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.shutdowns = []
+
+    def submit(self, function, *args):
+        future = Future()
+        self.jobs.append((function, args, future))
+        return future
+
+    def run(self, index=0):
+        function, args, future = self.jobs.pop(index)
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def run_all(self):
+        while self.jobs:
+            self.run()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns.append({"wait": wait, "cancel_futures": cancel_futures})
+        if cancel_futures:
+            for _, _, future in self.jobs:
+                future.cancel()
+            self.jobs = []
+        if wait:
+            self.run_all()
+
+
+@pytest.fixture
+def reactor():
+    return FakeReactor()
+
+
+@pytest.fixture
+def executor():
+    return ManualExecutor()
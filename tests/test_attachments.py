@@ -0,0 +1,112 @@
+import os
+import pytest
+from twisted.internet import defer
+from scrapy import Spider
+from scrapy.exceptions import DropItem, StopDownload
+from scrapy.http import Headers, Response
+from scrapy.utils.test import get_crawler
+from policy_scraper.policy_scraper.attachments import AttachmentPipeline, AttachmentStore
+
+PDF = {"Content-Type": "application/pdf"}
+
+
+class FakeEngine:
+    """
+    Answers attachment requests from a dict of url -> (status, headers, body chunks),
+    firing the same signals as the download handler. As there, StopDownload(fail=False)
+    from a signal handler ends the download early with the body received so far.
+    """
+
+    def __init__(self, pipeline, spider, responses):
+        self.pipeline = pipeline
+        self.spider = spider
+        self.responses = responses
+        self.requests = []
+
+    def download(self, request):
+        self.requests.append(request)
+        status, headers, chunks = self.responses[request.url]
+        headers = Headers(headers)
+        received = []
+        try:
+            self.pipeline.headers_received(headers, None, request, self.spider)
+            for chunk in chunks:
+                received.append(chunk)
+                self.pipeline.bytes_received(chunk, request, self.spider)
+        except StopDownload:
+            pass
+        return defer.succeed(Response(request.url, status=status, headers=headers, body=b"".join(received), request=request))
+
+
+@pytest.fixture
+def crawl(tmp_path):
+    def start(responses):
+        crawler = get_crawler(Spider, {"PDF_STORE": str(tmp_path / "pdf"), "FILES_STORE": str(tmp_path / "files")})
+        spider = Spider("test", allowed_domains=["example.com"])
+        spider.crawler = crawler
+        pipeline = AttachmentPipeline.from_crawler(crawler)
+        pipeline.open_spider(spider)
+        crawler.engine = FakeEngine(pipeline, spider, responses)
+        return pipeline, spider
+    return start
+
+
+def process(pipeline, spider, url):
+    results = []
+    pipeline.process_item({"type": "attachment", "url": url}, spider).addBoth(results.append)
+    return results[0]
+
+
+def stored_files(tmp_path):
+    return sorted(os.listdir(tmp_path / "pdf"))
+
+
+def test_store_keeps_one_copy_per_hash(tmp_path):
+    store = AttachmentStore(str(tmp_path / "pdf"), str(tmp_path / "files"))
+    results = []
+    for _ in range(2):
+        pending = store.open("pdf")
+        pending.write(b"%PDF-1.4 ")
+        pending.write(b"same content")
+        results.append(pending.commit(".pdf"))
+    assert [result["duplicate"] for result in results] == [False, True]
+    assert results[0]["path"] == results[1]["path"] and results[0]["size"] == 21
+    assert stored_files(tmp_path) == [results[0]["sha256"] + ".pdf"]
+
+
+def test_same_content_at_two_urls_is_stored_once(crawl, tmp_path):
+    body = [b"%PDF-1.4 ", b"policy"]
+    pipeline, spider = crawl({
+        "https://example.com/a.pdf": (200, PDF, body),
+        "https://example.com/copy/a.pdf": (200, PDF, body),
+    })
+    first = process(pipeline, spider, "https://example.com/a.pdf")
+    second = process(pipeline, spider, "https://example.com/copy/a.pdf")
+    assert first["sha256"] == second["sha256"] and first["path"] == second["path"]
+    assert first["type"] == "pdf" and first["size"] == 15
+    assert stored_files(tmp_path) == [first["sha256"] + ".pdf"]
+    stats = spider.crawler.stats
+    assert stats.get_value("attachments/stored") == 1 and stats.get_value("attachments/duplicate") == 1
+
+
+def test_same_url_is_downloaded_once(crawl):
+    pipeline, spider = crawl({"https://example.com/a.pdf": (200, PDF, [b"%PDF"])})
+    process(pipeline, spider, "https://example.com/a.pdf")
+    with pytest.raises(DropItem, match="Duplicate"):
+        pipeline.process_item({"type": "attachment", "url": "https://example.com/a.pdf"}, spider)
+    assert len(spider.crawler.engine.requests) == 1
+
+
+def test_failed_download_leaves_no_partial_file(crawl, tmp_path):
+    pipeline, spider = crawl({"https://example.com/gone.pdf": (404, PDF, [b"Not found"])})
+    dropped = process(pipeline, spider, "https://example.com/gone.pdf")
+    assert dropped.check(DropItem)
+    assert stored_files(tmp_path) == []
+    assert spider.crawler.stats.get_value("attachments/failed") == 1
+
+
+def test_unsupported_type_is_dropped(crawl, tmp_path):
+    pipeline, spider = crawl({"https://example.com/page": (200, {"Content-Type": "text/html"}, [b"<html>"])})
+    dropped = process(pipeline, spider, "https://example.com/page")
+    assert dropped.check(DropItem) and "Unsupported" in str(dropped.value)
+    assert stored_files(tmp_path) == []
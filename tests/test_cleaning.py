@@ -0,0 +1,55 @@
+import pytest
+from policy_scraper.policy_scraper.cleaning import clean_html_lxml, get_cleaner
+
+POLICY = "Staff are entitled to annual leave as set out in their employment agreement. " * 10
+
+
+def page(main):
+    return (
+        "<html><head><title>Leave</title><script>var x = 1;</script></head><body>"
+        "<header>Site header</header><nav><a href='/'>Home</a> <a href='/staff'>Staff</a></nav>"
+        f"<main>{main}</main><footer>Site footer</footer></body></html>"
+    )
+
+
+def test_keeps_only_the_main_region():
+    text = clean_html_lxml(page(f"<h1>Leave Policy</h1><p>{POLICY}</p>"))
+    assert text == f"Leave Policy {POLICY}".strip()
+
+
+def test_layout_wrapper_named_like_chrome_is_kept():
+    html = page(f'<div class="layout--has-sidebar"><div id="content-menu-wrapper"><p>{POLICY}</p></div></div>')
+    assert clean_html_lxml(html) == POLICY.strip()
+
+
+def test_small_or_link_heavy_chrome_is_dropped():
+    links = " ".join(f"<a href='/p{i}'>Policy number {i}</a>" for i in range(40))
+    html = page(
+        "<div class='breadcrumbs'><a href='/'>Home</a> &gt; <a href='/policies'>Policies</a></div>"
+        f"<p>{POLICY}</p>"
+        "<div class='share-links'><a href='#'>Share</a></div>"
+        f"<div class='related-menu'>{links}</div>"
+        "<aside>Related documents</aside>"
+    )
+    assert clean_html_lxml(html) == POLICY.strip()
+
+
+def test_falls_back_to_the_whole_region():
+    # Everything is inside a navigation landmark: keep it rather than return nothing
+    html = page(f"<nav><p>{POLICY}</p></nav>")
+    assert clean_html_lxml(html) == POLICY.strip()
+
+
+def test_body_without_main_region_drops_page_chrome():
+    html = f"<html><body><header>Site header</header><div><p>{POLICY}</p></div><footer>Footer</footer></body></html>"
+    assert clean_html_lxml(html) == POLICY.strip()
+
+
+@pytest.mark.parametrize("html", ["", "   ", "<html></html>"])
+def test_empty_documents(html):
+    assert clean_html_lxml(html) == ""
+
+
+def test_unknown_cleaner():
+    with pytest.raises(ValueError):
+        get_cleaner("html5lib")
@@ -0,0 +1,158 @@
+import os
+import json
+import zlib
+import pytest
+from policy_scraper.policy_scraper.consolidator import MANIFEST_NAME, consolidate_incremental
+from policy_scraper.policy_scraper.corpus import iter_documents
+from policy_scraper.policy_scraper.tokenstore import FORMAT, TokenizedDocument
+
+
+def write_policy(clean_dir, tokenized_dir, slug, text, mtime=None):
+    """Writes the cleaned and legacy tokenized files of one policy, as the crawler does."""
+    paths = [os.path.join(clean_dir, slug + ".json"), os.path.join(tokenized_dir, slug + ".json")]
+    with open(paths[0], "w", encoding="utf-8") as f:
+        json.dump({"title": slug.replace("-", " ").title(), "url": f"https://example.com/{slug}",
+                   "cleaned_content": text}, f, ensure_ascii=False)
+    with open(paths[1], "w", encoding="utf-8") as f:
+        json.dump({"word_tokens": text.split(), "sentence_tokens": [text] if text else []}, f, ensure_ascii=False)
+    if mtime is not None:
+        for path in paths:
+            os.utime(path, ns=(mtime, mtime))
+
+
+def shard_entries(output_dir):
+    """Returns {shard file: [ids]} for every JSONL shard."""
+    shards = {}
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(output_dir, name), "r", encoding="utf-8") as f:
+                shards[name] = [json.loads(line)["id"] for line in f if line.strip()]
+    return shards
+
+
+def snapshot(output_dir):
+    """Returns {file name: (mtime_ns, contents)} of the output directory."""
+    files = {}
+    for name in os.listdir(output_dir):
+        with open(os.path.join(output_dir, name), "rb") as f:
+            files[name] = (os.stat(os.path.join(output_dir, name)).st_mtime_ns, f.read())
+    return files
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    clean_dir, tokenized_dir, output_dir = (tmp_path / name for name in ("clean", "tokenized", "consolidated"))
+    clean_dir.mkdir()
+    tokenized_dir.mkdir()
+    return str(clean_dir), str(tokenized_dir), str(output_dir)
+
+
+def consolidate(dirs, num_shards=4):
+    clean_dir, tokenized_dir, output_dir = dirs
+    return consolidate_incremental(clean_dir, tokenized_dir, output_dir, num_shards=num_shards)
+
+
+def test_empty_input(dirs):
+    assert consolidate(dirs) == {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    output_dir = dirs[2]
+    assert shard_entries(output_dir) == {}
+    with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        assert json.load(f) == {"num_shards": 4, "documents": {}}
+    assert list(iter_documents(output_dir)) == []
+
+
+def test_entries_are_sharded_by_crc32_and_packed(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    texts = {f"policy-{i}": f"Policy number {i} applies." for i in range(10)}
+    for slug, text in texts.items():
+        write_policy(clean_dir, tokenized_dir, slug, text)
+
+    assert consolidate(dirs)["added"] == 10
+    for name, ids in shard_entries(output_dir).items():
+        for doc_id in ids:
+            assert name == f"part-{zlib.crc32(doc_id.encode('utf-8')) % 4:03d}.jsonl"
+
+    docs = {doc["id"]: doc for doc in iter_documents(output_dir)}
+    assert docs.keys() == texts.keys()
+    for slug, doc in docs.items():
+        assert doc["cleaned_content"] == texts[slug]
+        assert doc["format"] == FORMAT
+        tokens = TokenizedDocument(doc["cleaned_content"], doc)
+        assert list(tokens.word_tokens) == texts[slug].split()
+        assert list(tokens.sentence_tokens) == [texts[slug]]
+
+
+def test_unchanged_changed_and_removed_across_runs(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    mtime = 1_700_000_000_000_000_000
+    write_policy(clean_dir, tokenized_dir, "kept", "Kept as is.", mtime)
+    write_policy(clean_dir, tokenized_dir, "edited", "First version.", mtime)
+    write_policy(clean_dir, tokenized_dir, "dropped", "Removed later.", mtime)
+    assert consolidate(dirs) == {"added": 3, "changed": 0, "removed": 0, "unchanged": 0}
+
+    write_policy(clean_dir, tokenized_dir, "edited", "Second, longer version.", mtime + 1)
+    os.remove(os.path.join(clean_dir, "dropped.json"))
+    write_policy(clean_dir, tokenized_dir, "new", "A new policy.", mtime)
+    assert consolidate(dirs) == {"added": 1, "changed": 1, "removed": 1, "unchanged": 1}
+
+    docs = {doc["id"]: doc["cleaned_content"] for doc in iter_documents(output_dir)}
+    assert docs == {"kept": "Kept as is.", "edited": "Second, longer version.", "new": "A new policy."}
+    # Every document appears in exactly one shard, once
+    ids = [doc_id for shard in shard_entries(output_dir).values() for doc_id in shard]
+    assert sorted(ids) == sorted(docs)
+    with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        assert sorted(json.load(f)["documents"]) == ["edited.json", "kept.json", "new.json"]
+
+
+def test_idle_run_leaves_outputs_untouched(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    for i in range(5):
+        write_policy(clean_dir, tokenized_dir, f"policy-{i}", f"Text {i}.")
+    consolidate(dirs)
+    before = snapshot(output_dir)
+
+    assert consolidate(dirs) == {"added": 0, "changed": 0, "removed": 0, "unchanged": 5}
+    assert snapshot(output_dir) == before
+
+
+def test_touched_but_identical_file_is_unchanged(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    write_policy(clean_dir, tokenized_dir, "policy", "Same text.", 1_700_000_000_000_000_000)
+    consolidate(dirs)
+    shards = shard_entries(output_dir)
+
+    write_policy(clean_dir, tokenized_dir, "policy", "Same text.", 1_800_000_000_000_000_000)
+    assert consolidate(dirs) == {"added": 0, "changed": 0, "removed": 0, "unchanged": 1}
+    assert shard_entries(output_dir) == shards
+    with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        assert json.load(f)["documents"]["policy.json"]["stat"][0] == 1_800_000_000_000_000_000
+
+
+def test_changing_the_shard_count_rebuilds(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    for i in range(8):
+        write_policy(clean_dir, tokenized_dir, f"policy-{i}", f"Text {i}.")
+    consolidate(dirs, num_shards=4)
+
+    assert consolidate(dirs, num_shards=2)["added"] == 8
+    assert set(shard_entries(output_dir)) <= {"part-000.jsonl", "part-001.jsonl"}
+    assert sorted(doc["id"] for doc in iter_documents(output_dir)) == [f"policy-{i}" for i in range(8)]
+
+
+def test_unpaired_files_are_ignored(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    write_policy(clean_dir, tokenized_dir, "paired", "Both files.")
+    os.remove(os.path.join(tokenized_dir, "paired.json"))
+    assert consolidate(dirs)["added"] == 0
+    assert list(iter_documents(output_dir)) == []
+
+
+def test_escapes_and_unicode_survive(dirs):
+    clean_dir, tokenized_dir, output_dir = dirs
+    text = 'Quotes " and \\ backslashes, a tab\tand “curly” text — in Māori: whānau.'
+    write_policy(clean_dir, tokenized_dir, "escapes", text)
+    consolidate(dirs)
+
+    (doc,) = iter_documents(output_dir)
+    assert doc["cleaned_content"] == text
+    assert list(TokenizedDocument(text, doc).word_tokens) == text.split()
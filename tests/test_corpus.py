@@ -0,0 +1,117 @@
+import json
+import pytest
+from policy_scraper.policy_scraper import corpus
+from policy_scraper.policy_scraper.corpus import iter_documents
+
+DOCS = [
+    {
+        "id": "escapes",
+        "title": 'Quotes " and \\ and braces } ] { [ in a title',
+        "url": "https://example.com/a?b=1&c=\"2\"",
+        "cleaned_content": "Line one.\nLine two with a tab\tand unicode “quotes” — ā.",
+        "word_tokens": ["Line", "one", ".", '"}', "]\\"],
+        "sentence_tokens": [],
+        "nested": {"list": [1, 2.5, -3e-2, True, False, None, {"deep": ["]", "}"]}], "empty": {}},
+        "num_tokens": 5,
+    },
+    {"id": "empty-values", "title": "", "url": None, "cleaned_content": "", "word_tokens": [], "nested": {}},
+    {},
+    {"id": "last", "title": "Last", "cleaned_content": "x" * 300, "num_tokens": 0},
+]
+
+
+def write_array(path, docs, indent=4):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False, indent=indent)
+
+
+def write_lines(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+
+def project(docs, fields):
+    return [{key: value for key, value in doc.items() if key in fields} for doc in docs]
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_json_array_round_trip(tmp_path, indent):
+    path = tmp_path / "consolidated_data.json"
+    write_array(path, DOCS, indent)
+    assert list(iter_documents(str(path))) == DOCS
+
+
+@pytest.mark.parametrize("fields", [["id"], ["title", "cleaned_content"], ["nested", "num_tokens"], ["missing"]])
+def test_field_projection_skips_other_values(tmp_path, fields):
+    path = tmp_path / "consolidated_data.json"
+    write_array(path, DOCS)
+    assert list(iter_documents(str(path), fields=fields)) == project(DOCS, fields)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64, 257])
+@pytest.mark.parametrize("fields", [None, ["id", "word_tokens"]])
+def test_chunk_boundaries(tmp_path, monkeypatch, chunk_size, fields):
+    # Small reads split keys, strings, escapes, numbers and literals across chunks
+    monkeypatch.setattr(corpus, "CHUNK_SIZE", chunk_size)
+    path = tmp_path / "consolidated_data.json"
+    write_array(path, DOCS, indent=None)
+    expected = DOCS if fields is None else project(DOCS, fields)
+    assert list(iter_documents(str(path), fields=fields)) == expected
+
+
+def test_escape_split_at_chunk_boundary(tmp_path, monkeypatch):
+    doc = {"id": "a", "text": 'ab\\"c\\\\'}
+    text = json.dumps([doc])
+    path = tmp_path / "corpus.json"
+    path.write_text(text, encoding="utf-8")
+    for chunk_size in range(1, len(text) + 1):
+        monkeypatch.setattr(corpus, "CHUNK_SIZE", chunk_size)
+        assert list(iter_documents(str(path), fields=["id"])) == [{"id": "a"}]
+        assert list(iter_documents(str(path))) == [doc]
+
+
+@pytest.mark.parametrize("content", ["[]", "  [ \n ]  ", "[\n]\n"])
+def test_empty_array(tmp_path, content):
+    path = tmp_path / "consolidated_data.json"
+    path.write_text(content, encoding="utf-8")
+    assert list(iter_documents(str(path))) == []
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("", encoding="utf-8")
+    assert list(iter_documents(str(path))) == []
+
+
+def test_jsonl_skips_blank_lines(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    write_lines(path, DOCS)
+    path.write_text("\n" + path.read_text(encoding="utf-8").replace("\n", "\n\n"), encoding="utf-8")
+    assert list(iter_documents(str(path), fields=["id"])) == project(DOCS, ["id"])
+
+
+def test_shard_directory_in_name_order(tmp_path):
+    write_lines(tmp_path / "part-001.jsonl", DOCS[2:])
+    write_lines(tmp_path / "part-000.jsonl", DOCS[:2])
+    (tmp_path / "manifest.json").write_text('{"num_shards": 2, "documents": {}}', encoding="utf-8")
+    assert list(iter_documents(str(tmp_path))) == DOCS
+
+
+def test_empty_shard_directory(tmp_path):
+    assert list(iter_documents(str(tmp_path))) == []
+
+
+@pytest.mark.parametrize("content", ['[{"id": "a"}, {"id": ', '[{"id" "a"}]', '[{"id": "a",}]'])
+def test_malformed_array_raises(tmp_path, content):
+    path = tmp_path / "broken.json"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_documents(str(path), fields=["id"]))
+
+
+def test_top_level_object_is_read_as_a_json_line(tmp_path):
+    path = tmp_path / "object.json"
+    path.write_text('{"id": "a"}', encoding="utf-8")
+    # Not an array, so it is read as a single JSON line
+    assert list(iter_documents(str(path))) == [{"id": "a"}]
@@ -0,0 +1,41 @@
+import sqlite3
+from policy_scraper.policy_scraper.crawl_state import CrawlState
+
+
+def test_unknown_url(tmp_path):
+    state = CrawlState(str(tmp_path / "state.sqlite3"))
+    assert state.get("https://example.com/a") is None
+    state.close()
+
+
+def test_set_processed_round_trip(tmp_path):
+    path = str(tmp_path / "state" / "crawl_state.sqlite3")
+    state = CrawlState(path)
+    state.set_processed("https://example.com/a", "hash-1", "a", "lxml", etag='"v1"', last_modified=None)
+    state.set_processed("https://example.com/a", "hash-2", "a", "bs4", etag=None, last_modified="Mon, 01 Jan 2024")
+    state.close()
+
+    state = CrawlState(path)
+    assert state.get("https://example.com/a") == {
+        "etag": None, "last_modified": "Mon, 01 Jan 2024", "content_hash": "hash-2", "slug": "a", "cleaner": "bs4",
+    }
+    state.close()
+
+
+def test_state_without_cleaner_column_is_migrated(tmp_path):
+    path = str(tmp_path / "crawl_state.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+        "content_hash TEXT, slug TEXT, updated_at REAL)"
+    )
+    conn.execute("INSERT INTO pages VALUES ('https://example.com/a', '\"v1\"', NULL, 'hash', 'a', 0)")
+    conn.commit()
+    conn.close()
+
+    state = CrawlState(path)
+    # Pages from before the migration have no cleaner, so they never match the current one
+    assert state.get("https://example.com/a")["cleaner"] is None
+    state.set_processed("https://example.com/a", "hash", "a", "lxml", etag='"v1"')
+    assert state.get("https://example.com/a")["cleaner"] == "lxml"
+    state.close()
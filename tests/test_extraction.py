@@ -0,0 +1,106 @@
+import os
+import time
+import pytest
+from twisted.internet import defer
+from policy_scraper.policy_scraper import extraction
+from policy_scraper.policy_scraper.extraction import ExtractionService, ExtractionTimeout, extract_text
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Replaces extract_text in the service, returning what each path maps to."""
+    outcomes = {}
+
+    def fake_extract_text(path, timeout=None):
+        return outcomes[path]
+
+    monkeypatch.setattr(extraction, "extract_text", fake_extract_text)
+    return outcomes
+
+
+def make_service(tmp_path, reactor, executor, workers=1, timeout=1.0):
+    service = ExtractionService(str(tmp_path / "extracted"), workers=workers, timeout=timeout, reactor=reactor)
+    service.executor = executor
+    service.slots = defer.DeferredSemaphore(workers)
+    return service
+
+
+def result_of(d):
+    results = []
+    d.addBoth(results.append)
+    return results
+
+
+def test_result_is_cached_by_hash(tmp_path, reactor, executor, extracted):
+    extracted["a.pdf"] = {"text": "Policy text", "error": None}
+    service = make_service(tmp_path, reactor, executor)
+    first = result_of(service.extract("a.pdf", "hash-a"))
+    executor.run()
+    reactor.advance(0)
+    assert first == [{"text": "Policy text", "error": None}]
+    assert reactor.getDelayedCalls() == []  # The backstop timer was cancelled
+
+    # The same content under another path is never sent to the pool again
+    second = result_of(service.extract("copy-of-a.pdf", "hash-a"))
+    assert second == first and executor.jobs == []
+
+
+def test_transient_failure_is_not_cached(tmp_path, reactor, executor, extracted):
+    extracted["a.pdf"] = {"text": None, "error": "Timed out after 1.0s", "transient": True}
+    service = make_service(tmp_path, reactor, executor)
+    service.extract("a.pdf", "hash-a")
+    executor.run()
+    reactor.advance(0)
+    service.extract("a.pdf", "hash-a")
+    assert len(executor.jobs) == 1
+
+
+def test_backstop_timeout_keeps_the_slot_until_the_worker_is_done(tmp_path, reactor, executor, extracted):
+    extracted["slow.pdf"] = {"text": "late", "error": None}
+    extracted["next.pdf"] = {"text": "next", "error": None}
+    service = make_service(tmp_path, reactor, executor, workers=1, timeout=1.0)
+    slow = result_of(service.extract("slow.pdf", "hash-slow"))
+    following = result_of(service.extract("next.pdf", "hash-next"))
+    assert len(executor.jobs) == 1  # One file per worker is handed to the pool
+
+    reactor.advance(1.9)
+    assert slow == []
+    reactor.advance(0.1)
+    assert slow[0].check(ExtractionTimeout) and service.timed_out == 1
+    assert len(executor.jobs) == 1 and following == []
+
+    # The late result is dropped, not cached, and frees the slot for the next file
+    executor.run()
+    reactor.advance(0)
+    assert len(slow) == 1
+    assert not os.path.exists(service._cache_path("hash-slow"))
+    executor.run()
+    reactor.advance(0)
+    assert following == [{"text": "next", "error": None}]
+
+    service.close()
+    assert executor.shutdowns == [{"wait": False, "cancel_futures": True}]
+
+
+def test_close_cancels_files_not_started(tmp_path, reactor, executor, extracted):
+    service = make_service(tmp_path, reactor, executor)
+    result = result_of(service.extract("a.pdf", "hash-a"))
+    service.close()
+    assert executor.shutdowns == [{"wait": True, "cancel_futures": True}]
+    assert service.executor is None
+    # Its Deferred still fires, so the item waiting on it isn't left hanging
+    reactor.advance(0)
+    assert len(result) == 1 and result[0].check(Exception)
+
+
+def test_worker_side_timeout(monkeypatch):
+    monkeypatch.setitem(extraction.EXTRACTORS, ".pdf", lambda path: time.sleep(2))
+    start = time.perf_counter()
+    result = extract_text("slow.pdf", timeout=0.05)
+    assert time.perf_counter() - start < 1
+    assert result["text"] is None and result["transient"]
+
+
+def test_unsupported_format_is_reported():
+    result = extract_text("legacy.doc", timeout=1)
+    assert result["text"] is None and "Unsupported" in result["error"] and not result.get("transient")
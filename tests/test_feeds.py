@@ -0,0 +1,38 @@
+import pytest
+from scrapy.settings import Settings
+from policy_scraper.policy_scraper.feeds import build_feeds
+
+
+def feed_settings(**overrides):
+    settings = Settings({
+        "BASE_DIR": "/project",
+        "FEED_MODE": "metadata",
+        "FEED_COMPRESSION": None,
+        "FEED_FLUSH_ITEMS": 1,
+        "FEED_ROTATE_ITEMS": 0,
+        "FEED_FIELDS": ["url", "title"],
+    })
+    # Command line overrides arrive as strings
+    settings.setdict(overrides, priority="cmdline")
+    return settings
+
+
+def test_metadata_feed():
+    (uri, options), = build_feeds(feed_settings()).items()
+    assert uri == "/project/output/feed/crawl-%(batch_time)s-%(batch_id)03d.jsonl"
+    assert options["fields"] == ["url", "title"]
+    assert options["postprocessing"] == ["policy_scraper.feeds.FlushingPlugin"]
+
+
+def test_command_line_overrides():
+    (uri, options), = build_feeds(feed_settings(FEED_COMPRESSION="gzip", FEED_FLUSH_ITEMS="50")).items()
+    assert uri.endswith(".jsonl.gz")
+    assert options["postprocessing"] == ["policy_scraper.feeds.GzipPlugin"]
+    assert options["flush_items"] == 50
+    assert list(build_feeds(feed_settings(FEED_MODE="full"))) == ["output.json"]
+    assert list(build_feeds(feed_settings(FEED_COMPRESSION="None")))[0].endswith(".jsonl")
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        build_feeds(feed_settings(FEED_COMPRESSION="bz2"))
@@ -0,0 +1,62 @@
+import json
+from fine_tuning.incremental import corpus_hashes, select_documents
+from policy_scraper.policy_scraper.consolidator import consolidate_data, consolidate_incremental
+
+POLICIES = {
+    "Leave Policy": "Staff are entitled to annual leave.",
+    "Health & Safety (2024)": "Report every incident.",
+    "Café Opening Hours": "The café opens at eight.",
+}
+
+
+def write_policies(tmp_path):
+    from slugify import slugify
+    clean_dir, tokenized_dir = tmp_path / "clean", tmp_path / "tokenized"
+    clean_dir.mkdir()
+    tokenized_dir.mkdir()
+    for title, text in POLICIES.items():
+        name = slugify(title) + ".json"
+        (clean_dir / name).write_text(json.dumps({"title": title, "url": None, "cleaned_content": text}), "utf-8")
+        (tokenized_dir / name).write_text(json.dumps({"word_tokens": text.split(), "sentence_tokens": [text]}), "utf-8")
+    return str(clean_dir), str(tokenized_dir)
+
+
+def test_document_ids_match_across_corpus_formats(tmp_path):
+    clean_dir, tokenized_dir = write_policies(tmp_path)
+    array_path = str(tmp_path / "consolidated_data.json")
+    shard_dir = str(tmp_path / "consolidated")
+    consolidate_data(clean_dir, tokenized_dir, array_path)
+    consolidate_incremental(clean_dir, tokenized_dir, shard_dir, num_shards=2)
+
+    from_array = corpus_hashes(array_path)
+    from_shards = corpus_hashes(shard_dir)
+    assert from_array == from_shards
+    assert sorted(from_array) == ["cafe-opening-hours", "health-safety-2024", "leave-policy"]
+
+    # Switching formats doesn't look like removing and re-adding every document
+    selection = select_documents(from_shards, from_array)
+    assert selection["added"] == selection["changed"] == selection["removed"] == []
+
+
+def test_select_documents():
+    trained = {"a": "1", "b": "2", "c": "3", "d": "4"}
+    current = {"a": "1", "b": "changed", "c": "3", "e": "5"}
+    selection = select_documents(current, trained, replay_ratio=0.5, seed=0)
+    assert selection["added"] == ["e"]
+    assert selection["changed"] == ["b"]
+    assert selection["removed"] == ["d"]
+    assert len(selection["replayed"]) == 1 and selection["replayed"][0] in ("a", "c")
+    assert select_documents(current, trained, replay_ratio=0.5, seed=0) == selection
+
+
+def test_select_documents_replays_for_a_single_change():
+    trained = {"a": "1", "b": "2", "c": "3"}
+    current = {"a": "1", "b": "changed", "c": "3"}
+    selection = select_documents(current, trained, replay_ratio=0.5)
+    assert selection["changed"] == ["b"]
+    assert len(selection["replayed"]) == 1
+
+    assert select_documents(current, trained, replay_ratio=0)["replayed"] == []
+    assert select_documents(trained, trained, replay_ratio=0.5)["replayed"] == []
+    # Never more than the unchanged documents there are
+    assert len(select_documents(current, trained, replay_ratio=5)["replayed"]) == 2
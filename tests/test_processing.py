@@ -0,0 +1,15 @@
+import pytest
+from policy_scraper.policy_scraper.processing import prepare_policy
+
+
+@pytest.mark.parametrize("item", [{"title": None}, {"title": ""}, {}])
+def test_untitled_policy_keeps_its_title(item):
+    doc = prepare_policy(dict(item, content="<p>Text</p>"), cleaner=lambda html: "Text")
+    assert doc.slug == "default-policy"
+    assert doc.cleaned_record()["title"] == item.get("title")
+
+
+def test_titled_policy():
+    doc = prepare_policy({"title": "Leave Policy", "content": "<p>Text</p>"}, cleaner=lambda html: "Text")
+    assert doc.slug == "leave-policy"
+    assert doc.cleaned_record()["title"] == "Leave Policy"
@@ -0,0 +1,82 @@
+import pytest
+from policy_scraper.policy_scraper import tokenizing
+from policy_scraper.policy_scraper.tokenizing import TokenizationService
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replaces the SpaCy batch tokenizer, recording the batches it gets."""
+    seen = []
+
+    def tokenize_batch(texts):
+        seen.append(list(texts))
+        if "fail" in texts:
+            raise RuntimeError("worker died")
+        return [{"text": text} for text in texts]
+
+    monkeypatch.setattr(tokenizing, "tokenize_batch", tokenize_batch)
+    return seen
+
+
+def make_service(reactor, executor, **kwargs):
+    service = TokenizationService(workers=1, reactor=reactor, **kwargs)
+    service.executor = executor
+    return service
+
+
+def results_of(deferreds):
+    results = []
+    for d in deferreds:
+        d.addBoth(results.append)
+    return results
+
+
+def test_full_batch_is_sent_at_once(reactor, executor, batches):
+    service = make_service(reactor, executor, batch_size=2, batch_timeout=1.0)
+    results = results_of([service.tokenize(text) for text in ("a", "b", "c")])
+    assert len(executor.jobs) == 1 and service.pending[0][0] == "c"
+
+    executor.run()
+    reactor.advance(0)
+    assert batches == [["a", "b"]]
+    assert results == [{"text": "a"}, {"text": "b"}]
+    assert service.docs_done == 2 and service.batches_done == 1
+
+
+def test_partial_batch_is_sent_after_the_timeout(reactor, executor, batches):
+    service = make_service(reactor, executor, batch_size=16, batch_timeout=0.25)
+    results = results_of([service.tokenize("a"), service.tokenize("b")])
+    reactor.advance(0.2)
+    assert executor.jobs == []
+
+    reactor.advance(0.05)
+    assert len(executor.jobs) == 1 and service.flush_call is None
+    executor.run()
+    reactor.advance(0)
+    assert results == [{"text": "a"}, {"text": "b"}]
+
+    # The next text starts a new timer
+    service.tokenize("c")
+    assert len(reactor.getDelayedCalls()) == 1
+
+
+def test_close_sends_pending_texts(reactor, executor, batches):
+    service = make_service(reactor, executor, batch_size=16, batch_timeout=0.25)
+    results = results_of([service.tokenize("a"), service.tokenize("b")])
+    service.close()
+    assert executor.shutdowns == [{"wait": True, "cancel_futures": False}]
+    assert service.executor is None
+    # The flush timer was cancelled and the batch went to the pool before it shut down
+    assert batches == [["a", "b"]]
+    reactor.advance(0)
+    assert results == [{"text": "a"}, {"text": "b"}]
+    assert reactor.getDelayedCalls() == []
+
+
+def test_failed_batch_fails_every_text(reactor, executor, batches):
+    service = make_service(reactor, executor, batch_size=2)
+    results = results_of([service.tokenize("ok"), service.tokenize("fail")])
+    executor.run()
+    reactor.advance(0)
+    assert [failure.value.args for failure in results] == [("worker died",)] * 2
+    assert service.docs_done == 0
@@ -0,0 +1,99 @@
+import base64
+import pytest
+from policy_scraper.policy_scraper.tokenstore import (
+    FORMAT, SpanSequence, TokenizedDocument, decode_spans, encode_spans, pack_strings, sentence_tokens, word_tokens,
+)
+
+
+@pytest.mark.parametrize("spans", [
+    [],
+    [(0, 0)],
+    [(0, 1), (1, 2), (2, 2)],
+    [(5, 9), (10, 10), (200, 330)],
+    # Gaps and lengths on each side of the one, two and three byte varint limits
+    [(127, 254), (382, 510), (16_894, 33_278), (33_279, 33_279 + 2_097_151)],
+    [(2 ** 35, 2 ** 35 + 2 ** 21)],
+])
+def test_round_trip(spans):
+    packed = encode_spans(spans)
+    assert packed.isascii()
+    assert decode_spans(packed) == spans
+
+
+def test_encoding_is_compact():
+    spans = [(i * 6, i * 6 + 5) for i in range(1000)]
+    assert len(base64.b64decode(encode_spans(spans))) == 2 * len(spans)
+
+
+def test_empty_string_decodes_to_no_spans():
+    assert encode_spans([]) == ""
+    assert decode_spans("") == []
+
+
+def test_generator_input():
+    assert decode_spans(encode_spans((i, i + 1) for i in range(0, 10, 2))) == [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)]
+
+
+@pytest.mark.parametrize("spans", [[(5, 3)], [(0, 5), (4, 6)], [(3, 4), (0, 1)]])
+def test_unordered_or_overlapping_spans_raise(spans):
+    with pytest.raises(ValueError):
+        encode_spans(spans)
+
+
+def test_pack_strings_aligns_tokens():
+    text = 'He said "stop" — then left.\nNext line.'
+    words = ["He", "said", '"', "stop", '"', "—", "then", "left", ".", "Next", "line", "."]
+    sentences = ['He said "stop" — then left.', "Next line."]
+    record = pack_strings(text, words, sentences)
+    assert record["format"] == FORMAT
+    assert (record["num_tokens"], record["num_sentences"]) == (len(words), len(sentences))
+    doc = TokenizedDocument(text, record)
+    assert list(doc.word_tokens) == words
+    assert list(doc.sentence_tokens) == sentences
+
+
+def test_pack_strings_empty_text():
+    record = pack_strings("", [], [])
+    assert record["token_offsets"] == record["sentence_offsets"] == ""
+    doc = TokenizedDocument("", record)
+    assert (doc.num_tokens, doc.num_sentences) == (0, 0)
+
+
+@pytest.mark.parametrize("words", [["missing"], ["b", "a"]])
+def test_pack_strings_returns_none_when_tokens_do_not_align(words):
+    assert pack_strings("a b", words, []) is None
+
+
+def test_span_sequence_behaves_like_a_list():
+    text = "alpha beta gamma delta"
+    words = text.split()
+    sequence = SpanSequence(text, pack_strings(text, words, [])["token_offsets"])
+    assert len(sequence) == 4
+    assert sequence[0] == "alpha"
+    assert sequence[-1] == "delta"
+    assert sequence[1:3] == ["beta", "gamma"]
+    assert sequence[::-2] == words[::-2]
+    assert list(sequence) == words
+    with pytest.raises(IndexError):
+        sequence[4]
+
+
+def test_span_sequence_decodes_lazily():
+    sequence = SpanSequence("abc", "not valid base64!", length=1)
+    assert len(sequence) == 1
+    with pytest.raises(ValueError):
+        sequence[0]
+
+
+def test_legacy_records_are_read_as_is():
+    entry = {"cleaned_content": "One. Two.", "word_tokens": ["One", ".", "Two", "."], "sentence_tokens": ["One.", "Two."]}
+    assert word_tokens(entry) == ["One", ".", "Two", "."]
+    assert sentence_tokens(entry) == ["One.", "Two."]
+    assert list(word_tokens({"cleaned_content": "no tokens"})) == []
+
+
+def test_packed_entry_helpers():
+    text = "One. Two."
+    entry = {"cleaned_content": text, **pack_strings(text, ["One", ".", "Two", "."], ["One.", "Two."])}
+    assert list(word_tokens(entry)) == ["One", ".", "Two", "."]
+    assert sentence_tokens(entry)[1] == "Two."
@@ -0,0 +1,341 @@
+"""
+Stage-cached runner for the PolicyAnalyzAI pipeline.
+
+The pipeline is a dependency graph:
+
+    scrape → consolidate → prepare → fine_tune → evaluate
+                         ↘ eda
+
+fine_tune depends on consolidate as well as prepare, since it trains on the
+corpus itself and not only on the pre-tokenized cache.
+
+Each stage is fingerprinted from its configuration, its code, and the
+outputs of the stages it depends on. After a successful run the
+fingerprint and a fingerprint of the stage's own outputs are recorded in
+data/state/pipeline_state.json. A stage is skipped while its fingerprint
+is unchanged and its outputs are still as it left them, so a run where
+nothing changed only stats files and hashes a few source files. Stages
+whose dependencies are done run concurrently (EDA alongside fine-tuning
+and evaluation).
+
+Scraping hits the network, so once it has run it is only repeated when
+its code changes or it is forced (python main.py run --scrape).
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STATE_PATH = os.path.join(BASE_DIR, "data", "state", "pipeline_state.json")
+
+
+def _path(*parts):
+    return os.path.join(BASE_DIR, *parts)
+
+
+def fingerprint_paths(paths, content=False):
+    """
+    Fingerprints files and directory trees.
+
+    Args:
+        paths (list[str]): Files or directories. Missing paths are recorded as missing.
+        content (bool): Hash file contents (for source code) instead of size and mtime.
+
+    Returns:
+        str: A hex digest that changes when any file is added, removed or modified.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if not os.path.exists(path):
+            digest.update(f"{path}\0missing\0".encode("utf-8"))
+            continue
+        files = [path]
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        for file_path in files:
+            digest.update(f"{os.path.relpath(file_path, BASE_DIR)}\0".encode("utf-8"))
+            if content:
+                with open(file_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(chunk)
+            else:
+                stat = os.stat(file_path)
+                digest.update(f"{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): Stage name, used on the command line.
+        run (callable): Runs the stage. May return a list of output paths,
+            which then replace outputs for this run.
+        deps (list[str]): Names of the stages this one reads from.
+        code (list[str]): Source files and directories whose contents are part of the fingerprint.
+        outputs (list[str]): Files and directories the stage writes.
+        config (dict, optional): Settings that change what the stage produces.
+        check_outputs (bool): Rerun the stage when its outputs were changed by
+            something else. Off for scraping, whose outputs are also written
+            by crawls started outside the runner.
+    """
+
+    def __init__(self, name, run, deps=(), code=(), outputs=(), config=None, check_outputs=True):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.code = list(code)
+        self.outputs = list(outputs)
+        self.config = config or {}
+        self.check_outputs = check_outputs
+
+
+class PipelineRunner:
+    """
+    Runs a set of stages in dependency order, skipping those whose outputs are still valid.
+    """
+
+    def __init__(self, stages, state_path=STATE_PATH, max_workers=2):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    def select(self, targets=None):
+        """
+        Returns the names of the target stages and everything they depend on, in dependency order.
+        """
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name!r}, expected one of {list(self.stages)}")
+            seen.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for name in targets or self.stages:
+            visit(name)
+        return order
+
+    def output_paths(self, stage):
+        """Returns the outputs of a stage's last run, or its declared outputs if it never ran."""
+        with self.lock:
+            record = self.state.get(stage.name)
+        return record["output_paths"] if record else stage.outputs
+
+    def fingerprint(self, stage):
+        """
+        Fingerprints a stage from its config, its code and the current outputs of its dependencies.
+        """
+        upstream = {dep: fingerprint_paths(self.output_paths(self.stages[dep])) for dep in stage.deps}
+        payload = {
+            "stage": stage.name,
+            "config": stage.config,
+            "code": fingerprint_paths(stage.code, content=True),
+            "upstream": upstream,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def is_valid(self, stage, fingerprint):
+        """
+        Returns True if the stage last ran with this fingerprint and its outputs are untouched since.
+        """
+        with self.lock:
+            record = self.state.get(stage.name)
+        return (
+            record is not None
+            and record["fingerprint"] == fingerprint
+            and (not stage.check_outputs or record["outputs"] == fingerprint_paths(record["output_paths"]))
+        )
+
+    def _run_stage(self, stage, force, dry_run):
+        fingerprint = self.fingerprint(stage)
+        if not force and self.is_valid(stage, fingerprint):
+            return "skipped", 0.0
+        if dry_run:
+            return "would run", 0.0
+
+        print(f"▶️ [{stage.name}] running...")
+        start = time.perf_counter()
+        output_paths = stage.run() or stage.outputs
+        seconds = time.perf_counter() - start
+        record = {
+            "fingerprint": fingerprint,
+            "output_paths": output_paths,
+            "outputs": fingerprint_paths(output_paths),
+            "finished_at": time.time(),
+            "seconds": seconds,
+        }
+        with self.lock:
+            self.state[stage.name] = record
+            self._save_state()
+        return "ran", seconds
+
+    def run(self, targets=None, force=(), dry_run=False):
+        """
+        Runs the target stages (all by default) and their dependencies.
+
+        Args:
+            targets (list[str], optional): Stages to bring up to date.
+            force (collection[str]): Stages to run even if their outputs are valid.
+            dry_run (bool): Only report which stages would run.
+
+        Returns:
+            dict: The result of every selected stage: "ran", "skipped",
+            "would run", "failed" or "blocked" (a dependency failed).
+        """
+        order = self.select(targets)
+        results = {}
+        pending = list(order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(results.get(dep) in ("failed", "blocked") for dep in stage.deps):
+                        results[name] = "blocked"
+                        pending.remove(name)
+                        print(f"⏭️ [{name}] blocked by a failed dependency")
+                    elif all(dep in results for dep in stage.deps if dep in order):
+                        pending.remove(name)
+                        running[executor.submit(self._run_stage, stage, name in force, dry_run)] = name
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name], seconds = future.result()
+                    except Exception as e:
+                        results[name] = "failed"
+                        print(f"❌ [{name}] failed: {e}")
+                        continue
+                    if results[name] == "ran":
+                        print(f"✅ [{name}] done in {seconds:.1f} s")
+                    else:
+                        print(f"⏭️ [{name}] {results[name]}")
+        return results
+
+    def status(self):
+        """
+        Returns, for every stage, whether its recorded outputs are still valid.
+
+        Stages downstream of a stale one are reported by their own fingerprint
+        only; they will rerun anyway if the upstream run changes its outputs.
+        """
+        return {
+            name: "valid" if self.is_valid(stage, self.fingerprint(stage)) else "stale"
+            for name, stage in self.stages.items()
+        }
+
+
+def _run_module(module, *args):
+    subprocess.run([sys.executable, "-m", module, *args], cwd=BASE_DIR, check=True)
+
+
+def _scrape():
+    subprocess.run(["scrapy", "crawl", "policy_spider"], cwd=_path("policy_scraper"), check=True)
+
+
+def _consolidate():
+    from policy_scraper.policy_scraper.consolidator import consolidate_incremental
+    arrow_dir = _path("data", "processed", "consolidated_arrow")
+    consolidate_incremental(
+        clean_dir=_path("data", "processed", "clean_json_files"),
+        tokenized_dir=_path("data", "processed", "tokenized_json_files"),
+        output_dir=_path("data", "processed", "consolidated"),
+        arrow_dir=arrow_dir,
+    )
+    # consolidate_incremental logs errors instead of raising; the stage must not pass without its export
+    if not os.path.isdir(arrow_dir):
+        raise RuntimeError(f"Arrow export missing after consolidation: {arrow_dir}")
+
+
+def _prepare():
+    from fine_tuning.token_cache import build_token_cache
+    dataset_path = _path("data", "processed", "consolidated_arrow")
+    if not os.path.isdir(dataset_path):
+        raise RuntimeError(f"No Arrow export to pre-tokenize at {dataset_path}; run the consolidate stage")
+    # Same cache location fine_tune_model uses for full runs, so fine-tuning finds the tokens
+    meta = build_token_cache(dataset_path, os.path.join(os.path.dirname(dataset_path), "token_cache"))
+    return [meta["path"]]
+
+
+EDA_OUTPUTS = [
+    "loaded_data.csv", "dataset_overview.csv", "top_common_words.csv",
+    "top_longest_policies.csv", "readability_scores.csv", "top_bigrams.csv",
+]
+EVALUATION_OUTPUTS = [
+    "model_test_final_evaluation.csv", "model_test_word_count_distribution.png",
+    "model_test_readability_score_distribution.png", "model_test_sentiment_analysis.png",
+]
+
+
+def default_stages():
+    """
+    Returns the stages of the PolicyAnalyzAI pipeline.
+    """
+    return [
+        Stage(
+            "scrape", _scrape,
+            code=[_path("policy_scraper", "policy_scraper")],
+            outputs=[_path("data", "processed", "clean_json_files"), _path("data", "processed", "tokenized_json_files")],
+            check_outputs=False,
+        ),
+        Stage(
+            "consolidate", _consolidate, deps=["scrape"],
+            code=[_path("policy_scraper", "policy_scraper", name)
+                  for name in ("consolidator.py", "tokenstore.py", "corpus.py")],
+            outputs=[_path("data", "processed", "consolidated"), _path("data", "processed", "consolidated_arrow")],
+        ),
+        Stage(
+            "prepare", _prepare, deps=["consolidate"],
+            code=[_path("fine_tuning", "token_cache.py")],
+            config={"tokenizer": "gpt2"},
+        ),
+        Stage(
+            "fine_tune", lambda: _run_module("fine_tuning.llm_fine_tuning"), deps=["consolidate", "prepare"],
+            code=[_path("fine_tuning", name) for name in ("llm_fine_tuning.py", "cpu_training.py", "incremental.py")],
+            outputs=[_path("models", "fine_tuned_model")],
+        ),
+        Stage(
+            "evaluate", lambda: _run_module("fine_tuning.test_fine_tuned_model"), deps=["fine_tune"],
+            code=[_path("fine_tuning", name)
+                  for name in ("test_fine_tuned_model.py", "loaders.py", "generation.py", "embedding_cache.py")],
+            outputs=[_path("output", name) for name in EVALUATION_OUTPUTS],
+        ),
+        Stage(
+            "eda", lambda: _run_module("analysis.eda"), deps=["consolidate"],
+            code=[_path("analysis", "eda.py")],
+            outputs=[_path("output", name) for name in EDA_OUTPUTS],
+        ),
+    ]